@@ -0,0 +1,47 @@
+from argparse import ArgumentParser
+from datetime import datetime
+import calendar
+
+from trading import Backtest, load_candles, load_trade_history
+
+import tradingbot
+
+
+def parse_date(value):
+    return calendar.timegm(datetime.strptime(value, '%Y-%m-%d').timetuple()) if value else None
+
+
+# runs the pairs and settings of config.cfg over the recorded market data of its [SIMULATOR] section
+def main():
+    parser = ArgumentParser(description='Backtest the trading bot on recorded candles')
+    parser.add_argument('--start', help='first day to trade (YYYY-MM-DD, UTC), defaults to the start of the data')
+    parser.add_argument('--end', help='day to stop trading (YYYY-MM-DD, UTC), defaults to the end of the data')
+    parser.add_argument('--value-currency', default='BTC', help='currency to value the account in')
+    parser.add_argument('--config', default='config.cfg', help='config file to read, defaults to config.cfg')
+    parser.add_argument('--data', help='folder with the recorded candles, defaults to data_dir of [SIMULATOR]')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 if there were errors, for automated tests')
+    args = parser.parse_args()
+
+    tradingbot.load_config(args.config)
+    data_dir = args.data if args.data else tradingbot.simulator_data_dir
+    backtest = Backtest(load_candles(data_dir), tradingbot.simulator_balances,
+                        tradingbot.trade_currencies, trade_history=load_trade_history(data_dir),
+                        update_interval=tradingbot.update_interval, fee=tradingbot.simulator_fee,
+                        spread=tradingbot.simulator_spread, order_timeout=tradingbot.order_timeout,
+                        history_max_orders=tradingbot.history_max_orders,
+                        history_max_age=tradingbot.history_max_age, value_currency=args.value_currency)
+
+    missing = [tc.currency_pair for tc in tradingbot.trade_currencies if tc.currency_pair not in backtest.candles]
+    if len(missing) > 0:
+        print('No candles for ' + ', '.join(missing) + ', skipping them')
+
+    result = backtest.run(parse_date(args.start), parse_date(args.end))
+    print(result.report())
+
+    if args.check and result.errors > 0:
+        print(str(result.errors) + ' errors, the last one: ' + result.last_error)
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
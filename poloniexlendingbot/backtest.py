@@ -0,0 +1,68 @@
+# coding=utf-8
+import argparse
+import calendar
+import os
+import sys
+from datetime import datetime
+
+from modules.Simulator import load_loan_books, parse_balances
+import modules.Backtest as Backtest
+import modules.Configuration as Config
+import modules.Data as Data
+
+try:
+    open('default.cfg.example', 'r')
+except IOError:
+    os.chdir(os.path.dirname(sys.argv[0]))  # Allow relative paths
+
+
+def parse_date(value):
+    return calendar.timegm(datetime.strptime(value, '%Y-%m-%d').timetuple()) if value else None
+
+
+def parse_settings(value):
+    """Parses 'spreadlend=5 gaptop=300' into a dict of [BOT] options."""
+    settings = {}
+    for item in value.split():
+        option, setting = item.split('=', 1)
+        settings[option] = setting
+    return settings
+
+
+parser = argparse.ArgumentParser(description='Backtest the lending settings on recorded loan order books')
+parser.add_argument("-cfg", "--config", help="Location of custom configuration file, overrides settings below")
+parser.add_argument("-data", "--datadir", help="Folder with the recorded books, defaults to dataDir in [SIMULATOR]")
+parser.add_argument("-start", "--start", help="First day to lend (YYYY-MM-DD, UTC), defaults to the start of the data")
+parser.add_argument("-end", "--end", help="Day to stop lending (YYYY-MM-DD, UTC), defaults to the end of the data")
+parser.add_argument("-run", "--run", action="append", default=[],
+                    help="[BOT] settings to compare against the config, e.g. -run \"spreadlend=5 gaptop=300\". "
+                         "Can be given several times")
+parser.add_argument("-check", "--check", help="Exit with status 1 if any run had errors, for automated tests",
+                    action="store_true")
+args = parser.parse_args()
+
+config_location = args.config if args.config else 'default.cfg'
+Config.init(config_location, Data)
+data_dir = args.datadir if args.datadir else Config.get('SIMULATOR', 'dataDir', 'market_data')
+loan_books = load_loan_books(data_dir)
+if len(loan_books) == 0:
+    print "No recorded loan order books in " + data_dir
+    exit(1)
+balances = dict((cur, amount) for cur, amount in parse_balances(Config.get('SIMULATOR', 'balances', 'BTC:1')).items()
+                if cur in loan_books)
+
+results = []
+for name, settings in [('config', {})] + [(run, parse_settings(run)) for run in args.run]:
+    result = Backtest.run(Config, loan_books, balances, settings, name, parse_date(args.start), parse_date(args.end))
+    print "{0}: {1} cycles over {2:.1f} days in {3:.1f} seconds".format(name, result.cycles, result.days(),
+                                                                        result.elapsed)
+    results.append(result)
+print
+print Backtest.report(results)
+
+if args.check:
+    failed = [result for result in results if result.errors > 0]
+    for result in failed:
+        print result.name + ": " + str(result.errors) + " errors, the last one: " + result.last_error
+    if len(failed) > 0:
+        exit(1)
@@ -5,8 +5,11 @@ import sys
 import time
 import traceback
 
+from modules.LoanBooks import LoanBookCache
 from modules.Logger import Logger
+from modules.Nonce import NonceAllocator
 from modules.Poloniex import Poloniex
+from modules.RateLimiter import RequestScheduler
 import modules.Configuration as Config
 import modules.MaxToLend as MaxToLend
 import modules.Data as Data
@@ -40,16 +43,24 @@ json_output_enabled = Config.has_option('BOT', 'jsonfile') and Config.has_option
 
 
 log = Logger(Config.get('BOT', 'jsonfile', ''), Config.get('BOT', 'jsonlogsize', -1))
-api = Poloniex(Config.get("API", "apikey", None), Config.get("API", "secret", None))
+rate_limiter = RequestScheduler(float(Config.get('BOT', 'publicRequestRate', 6, 0.1, 100)),
+                                float(Config.get('BOT', 'privateRequestRate', 6, 0.1, 100)))
+nonces = NonceAllocator(Config.get('API', 'nonceFile', None) if Config.has_option('API', 'nonceFile') else None)
+if Config.getboolean('SIMULATOR', 'enabled', False):
+    import modules.Simulator as Simulator
+    api = Simulator.create(Config, rate_limiter, nonces)
+else:
+    api = Poloniex(Config.get("API", "apikey", None), Config.get("API", "secret", None), rate_limiter, nonces)
+loan_books = LoanBookCache(api, float(Config.get('BOT', 'loanBookMaxAge', 10, 1, 300)))
 MaxToLend.init(Config, log)
 Data.init(api, log)
 Config.init(config_location, Data)
 if Config.has_option('BOT', 'analyseCurrencies'):
     import modules.MarketAnalysis as Analysis
-    Analysis.init(Config, api, Data)
+    Analysis.init(Config, api, Data, loan_books)
 else:
     Analysis = None
-Lending.init(Config, api, log, Data, MaxToLend, dry_run, Analysis)
+Lending.init(Config, api, log, Data, MaxToLend, dry_run, Analysis, loan_books)
 
 
 print 'Welcome to Poloniex Lending Bot'
@@ -65,8 +76,8 @@ while True:
     try:
         Data.update_conversion_rates(output_currency, json_output_enabled)
         Lending.transfer_balances()
-        Lending.cancel_all()
         Lending.lend_all()
+        log.log(rate_limiter.summary())
         log.refreshStatus(Data.stringify_total_lended(*Data.get_total_lended()), Data.get_max_duration(
             end_date, "status"))
         log.persistStatus()
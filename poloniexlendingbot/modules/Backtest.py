@@ -0,0 +1,208 @@
+# coding=utf-8
+"""
+Replays recorded loan order books through the lending logic of Lending, MaxToLend and Data, the same modules the bot
+runs, against a simulated account. Settings are applied to the loaded config before each run and the modules are
+initialised again, so several variants can be compared on the same recording.
+"""
+import time
+
+from LoanBooks import LoanBookCache
+from Poloniex import PoloniexApiError
+from RateWindow import RateWindow
+from Simulator import SimulatedPoloniex, SimulatedClock
+
+import Data
+import Lending
+import MaxToLend
+
+PUBLIC_COMMANDS = ["returnTicker", "return24hVolume", "returnOrderBook", "returnMarketTradeHistory",
+                   "returnLoanOrders"]
+
+
+class DirectSimulatedPoloniex(SimulatedPoloniex):
+    """The lending counterpart of DirectSimulatedPoloniex in the trading bot's trading/backtest.py, see why there."""
+    def api_query(self, command, req=None):
+        req = dict(req) if req is not None else {}
+        req['command'] = command
+        with self._lock:
+            if command in PUBLIC_COMMANDS:
+                ret = self._public_command(req)
+            else:
+                req['nonce'] = self._last_nonce + 1
+                ret = self._private_command(req)
+        if isinstance(ret, dict) and 'error' in ret:
+            raise PoloniexApiError(ret['error'] + ' Requesting %s' % command)
+        return ret
+
+
+class SilentLogger(object):
+    """Takes the place of Logger and drops everything, a backtest would spend most of its time printing."""
+    def __getattr__(self, name):
+        return self._ignore
+
+    @staticmethod
+    def _ignore(*args, **kwargs):
+        return ''
+
+
+class ReplayAnalysis(object):
+    """
+    Takes the place of MarketAnalysis: the rate suggestion is the lendingStyle percentile of the lowest offer rate over
+    the last analyseMaxAge days of the replayed books, sampled every analyseUpdateInterval seconds.
+    """
+    def __init__(self, simulator, currencies, max_age_days, update_interval, lending_style):
+        self.simulator = simulator
+        self.currencies = currencies
+        self.update_interval = update_interval
+        self.lending_style = lending_style
+        self._windows = dict((cur, RateWindow(max_age_days * 24 * 60 * 60)) for cur in currencies)
+        self._next_sample = dict((cur, 0) for cur in currencies)
+
+    def update(self):
+        now = self.simulator.market_time()
+        for cur in self.currencies:
+            if now >= self._next_sample[cur]:
+                offers = self.simulator.loan_book(cur)['offers']
+                if len(offers) > 0:
+                    self._windows[cur].add(now, float(offers[0]['rate']))
+                self._next_sample[cur] = now + self.update_interval
+            self._windows[cur].expire(now)
+
+    def get_rate_suggestion(self, cur):
+        if cur not in self._windows:
+            return 0
+        result = self._windows[cur].percentile(self.lending_style)
+        if result is None:
+            return 0
+        return float(int(result * 1000000) / 1000000.0)
+
+
+class CurrencyResult(object):
+    def __init__(self, currency, balance):
+        self.currency = currency
+        self.start_balance = balance
+        self.earned = 0.0  # interest after fees, including what the loans still running have earned so far
+        self.amount_lent = 0.0  # sum of all filled offers
+        self.lent_seconds = 0.0  # amount lent integrated over time
+        self.idle_seconds = 0.0  # amount not lent integrated over time
+
+    def annual_yield(self, days):
+        return self.earned / self.start_balance * 365 / days if self.start_balance > 0 and days > 0 else 0.0
+
+    def utilisation(self):
+        total = self.lent_seconds + self.idle_seconds
+        return self.lent_seconds / total if total > 0 else 0.0
+
+    def time_to_lend(self):
+        """Average seconds a coin waits between loans."""
+        return self.idle_seconds / self.amount_lent if self.amount_lent > 0 else 0.0
+
+
+class BacktestResult(object):
+    def __init__(self, name, start, end):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.cycles = 0
+        self.errors = 0
+        self.last_error = None  # the message of the last error
+        self.elapsed = 0.0  # wall clock seconds the backtest took
+        self.offers_created = 0
+        self.offers_cancelled = 0
+        self.currencies = {}  # currency -> CurrencyResult
+
+    def days(self):
+        return (self.end - self.start) / (24 * 60 * 60)
+
+
+def apply_settings(Config, settings):
+    """Sets [BOT] options on the loaded config and returns the previous values, None where an option was unset."""
+    previous = {}
+    for option, value in settings.items():
+        previous[option] = Config.config.get('BOT', option) if Config.has_option('BOT', option) else None
+        if value is None:
+            Config.config.remove_option('BOT', option)
+        else:
+            Config.config.set('BOT', option, str(value))
+    return previous
+
+
+def run(Config, loan_books, balances, settings=None, name='', start=None, end=None):
+    """
+    Lends balances (currency -> amount) over the recorded books from start to end (timestamps, the whole recording by
+    default) with the config plus the [BOT] settings given, and returns a BacktestResult. The bot's cycle is replayed
+    as it runs in lendingbot.py: lend everything, then sleep for Lending.get_sleep_time().
+    """
+    first = min(float(snapshots[0]['timestamp']) for snapshots in loan_books.values() if len(snapshots) > 0)
+    last = max(float(snapshots[-1]['timestamp']) for snapshots in loan_books.values() if len(snapshots) > 0)
+    start = first if start is None else max(start, first)
+    end = last if end is None else min(end, last)
+
+    # offers are placed one at a time, the simulated exchange has nothing to gain from threads
+    previous = apply_settings(Config, dict({'offerConcurrency': 1}, **(settings if settings is not None else {})))
+    try:
+        clock = SimulatedClock(start)
+        api = DirectSimulatedPoloniex(dict((cur, [s for s in snapshots if float(s['timestamp']) >= start])
+                                           for cur, snapshots in loan_books.items()), balances, clock=clock)
+        log = SilentLogger()
+        Data.init(api, log)
+        MaxToLend.init(Config, log)
+        analysis = None
+        if Config.has_option('BOT', 'analyseCurrencies'):
+            analysis = ReplayAnalysis(api, [cur for cur in Config.get_currencies_list('analyseCurrencies')
+                                            if cur in loan_books],
+                                      int(Config.get('BOT', 'analyseMaxAge', 30, 1, 365)),
+                                      int(Config.get('BOT', 'analyseUpdateInterval', 60, 10, 3600)),
+                                      int(Config.get('BOT', 'lendingStyle', 50, 1, 99)))
+        Lending.init(Config, api, log, Data, MaxToLend, False, analysis,
+                     LoanBookCache(api, float(Config.get('BOT', 'loanBookMaxAge', 10, 1, 300)), 1, clock))
+        Lending.loanOrdersRequestLimit.clear()
+
+        result = BacktestResult(name, start, end)
+        for cur, amount in balances.items():
+            result.currencies[cur] = CurrencyResult(cur, amount)
+
+        wall_start = time.time()
+        while clock.time() < end:
+            if analysis is not None:
+                analysis.update()
+            try:
+                Lending.lend_all()
+            except Exception as ex:
+                result.errors += 1
+                result.last_error = str(ex)
+            result.cycles += 1
+
+            sleep_time = min(Lending.get_sleep_time(), end - clock.time())
+            for cur, currency_result in result.currencies.items():
+                lent = sum(loan['amount'] for loan in api.active_loans.values() if loan['currency'] == cur)
+                idle = api.lending_balances.get(cur, 0.0) + sum(offer['amount'] for offer in api.open_offers.values()
+                                                               if offer['currency'] == cur)
+                currency_result.lent_seconds += lent * sleep_time
+                currency_result.idle_seconds += idle * sleep_time
+            clock.advance(sleep_time)
+        result.elapsed = time.time() - wall_start
+
+        api.match_offers()
+        api.expire_loans()
+        result.offers_created = api.offers_created
+        result.offers_cancelled = api.offers_cancelled
+        for cur, currency_result in result.currencies.items():
+            currency_result.earned = api.earnings.get(cur, 0.0) + api.accrued_interest(cur)
+            currency_result.amount_lent = api.amount_lent.get(cur, 0.0)
+        return result
+    finally:
+        apply_settings(Config, previous)
+
+
+def report(results):
+    lines = ['{0:<20} {1:<5} {2:>8} {3:>10} {4:>14} {5:>9} {6:>10} {7:>8} {8:>7}'.format(
+        'run', 'coin', 'days', 'yield %/y', 'earned', 'lent %', 'wait h', 'offers', 'errors')]
+    for result in results:
+        for cur in sorted(result.currencies):
+            currency_result = result.currencies[cur]
+            lines.append('{0:<20} {1:<5} {2:>8.1f} {3:>10.2f} {4:>14.8f} {5:>9.1f} {6:>10.2f} {7:>8} {8:>7}'.format(
+                result.name[:20], cur, result.days(), currency_result.annual_yield(result.days()) * 100,
+                currency_result.earned, currency_result.utilisation() * 100, currency_result.time_to_lend() / 3600,
+                result.offers_created, result.errors))
+    return '\n'.join(lines)
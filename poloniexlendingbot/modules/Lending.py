@@ -1,13 +1,20 @@
 # coding=utf-8
-from decimal import Decimal
+import sys
+from decimal import Decimal, ROUND_FLOOR
+
+from Parallel import run_all
+from SpreadPlanner import plan_spread
+
 Config = None
 api = None
 log = None
 Data = None
 MaxToLend = None
 Analysis = None
+loan_books = None
 
 SATOSHI = Decimal(10) ** -8
+SATOSHIS = 10 ** 8  # amounts and rates in the spread walk are whole numbers of 0.00000001
 
 sleep_time_active = 0
 sleep_time_inactive = 0
@@ -26,24 +33,31 @@ dry_run = 0
 transferable_currencies = []
 keep_stuck_orders = True
 hide_coins = True
+offer_concurrency = 1
+offer_batch = None  # offers that lend_all collects to place together, None while they are placed right away
+offer_rate_tolerance = 0
+offer_amount_tolerance = 0
+own_offers = {}  # currency -> our open offers that lend_all works around
 
 # limit of orders to request
 loanOrdersRequestLimit = {}
 defaultLoanOrdersRequestLimit = 200
 
 
-def init(cfg, api1, log1, data, maxtolend, dry_run1, analysis):
-    global Config, api, log, Data, MaxToLend, Analysis
+def init(cfg, api1, log1, data, maxtolend, dry_run1, analysis, loan_books1):
+    global Config, api, log, Data, MaxToLend, Analysis, loan_books
     Config = cfg
     api = api1
     log = log1
     Data = data
     MaxToLend = maxtolend
     Analysis = analysis
+    loan_books = loan_books1
 
     global sleep_time, sleep_time_active, sleep_time_inactive, min_daily_rate, max_daily_rate, spread_lend, \
         gap_bottom, gap_top, xday_threshold, xdays, min_loan_size, end_date, coin_cfg, dry_run, \
-        transferable_currencies, keep_stuck_orders, hide_coins
+        transferable_currencies, keep_stuck_orders, hide_coins, offer_concurrency, offer_rate_tolerance, \
+        offer_amount_tolerance
 
     sleep_time_active = float(Config.get("BOT", "sleeptimeactive", None, 1, 3600))
     sleep_time_inactive = float(Config.get("BOT", "sleeptimeinactive", None, 1, 3600))
@@ -61,6 +75,10 @@ def init(cfg, api1, log1, data, maxtolend, dry_run1, analysis):
     transferable_currencies = Config.get_currencies_list('transferableCurrencies')
     keep_stuck_orders = Config.getboolean('BOT', "keepstuckorders", True)
     hide_coins = Config.getboolean('BOT', 'hideCoins', True)
+    offer_concurrency = int(Config.get('BOT', 'offerConcurrency', 1, 1, 20))
+    # percent of the daily rate like mindailyrate, read as a string so it is not rounded through a float on its way in
+    offer_rate_tolerance = Decimal(Config.get('BOT', 'offerRateTolerance', '0.0005', 0, 5)) / 100
+    offer_amount_tolerance = Decimal(Config.get('BOT', 'offerAmountTolerance', '5', 0, 100)) / 100
 
     sleep_time = sleep_time_active  # Start with active mode
 
@@ -69,14 +87,25 @@ def get_sleep_time():
     return sleep_time
 
 
-def create_lend_offer(currency, amt, rate):
+def to_satoshis(value):
+    """value (a string, Decimal or float) in whole 0.00000001, rounded down."""
+    return int((Decimal(value) * SATOSHIS).to_integral_value(ROUND_FLOOR))
+
+
+def from_satoshis(satoshis):
+    """satoshis as a decimal string, the sign kept apart so -5 is -0.00000005 and not -1.99999995."""
+    return ("-" if satoshis < 0 else "") + "%d.%08d" % divmod(abs(satoshis), SATOSHIS)
+
+
+def create_lend_offer(currency, amount, rate):
+    """Offers amount just below rate, both in satoshis."""
     days = '2'
     # if (min_daily_rate - 0.000001) < rate and Decimal(amt) > min_loan_size:
-    if float(amt) > min_loan_size:
-        if float(rate) > 0.0001:
-            rate = float(rate) - 0.000001  # lend offer just bellow the competing one
-        amt = "%.8f" % Decimal(amt)
-        if float(rate) > xday_threshold:
+    if amount > to_satoshis(min_loan_size):
+        if rate > 10000:  # 0.0001
+            rate -= 100  # lend offer just bellow the competing one
+        amt = from_satoshis(amount)
+        if rate > to_satoshis(xday_threshold):
             days = xdays
         if xday_threshold == 0:
             days = '2'
@@ -91,9 +120,116 @@ def create_lend_offer(currency, amt, rate):
                 exit(0)
             if int(days) > days_remaining:
                 days = str(days_remaining)
+        rate = from_satoshis(rate)
         if not dry_run:
-            msg = api.create_loan_offer(currency, amt, days, 0, rate)
+            if offer_batch is not None:
+                offer_batch.append((currency, amt, days, rate))
+            else:
+                msg = api.create_loan_offer(currency, amt, days, 0, rate)
+                log.offer(amt, currency, rate, days, msg)
+
+
+def place_offers(offers):
+    """Places [(currency, amount, days, rate)] with up to offer_concurrency requests at a time."""
+    results = run_all(lambda offer: api.create_loan_offer(offer[0], offer[1], offer[2], 0, offer[3]), offers,
+                      offer_concurrency)
+    error = None
+    for (currency, amt, days, rate), (msg, exc_info) in zip(offers, results):
+        if exc_info is None:
             log.offer(amt, currency, rate, days, msg)
+        elif offer_concurrency > 1 and 'Nonce must be greater' in str(exc_info[1]):
+            # an offer sent at the same time with a higher nonce got there first, the next round makes this one
+            # again if it is not among our open offers
+            log.log("Loan offer refused for its nonce: " + str(exc_info[1]))
+        elif error is None:
+            error = exc_info
+        else:
+            log.log("Error creating loan offer: " + str(exc_info[1]))
+    if error is not None:
+        raise error[0], error[1], error[2]
+
+
+def get_own_offers(lending_balances):
+    """
+    Our open offers that lend_all may replace, by currency. Their amounts are added to lending_balances, so the offers
+    are worked out as if they had been cancelled like cancel_all does, and the same ones are left alone.
+    """
+    loan_offers = api.return_open_loan_offers()
+    offers = {}
+    for CUR in loan_offers:
+        if CUR in coin_cfg and coin_cfg[CUR]['maxactive'] == 0:
+            # don't cancel disabled coin
+            continue
+        cur_sum = Decimal(lending_balances.get(CUR, 0)) + sum(Decimal(offer['amount']) for offer in loan_offers[CUR])
+        if keep_stuck_orders and cur_sum < min_loan_size:
+            print "Not enough " + CUR + " to lend if bot canceled open orders. Not cancelling."
+            continue
+        offers[CUR] = loan_offers[CUR]
+        lending_balances[CUR] = str(cur_sum)
+    return offers
+
+
+def without_own_offers(active_cur, loans):
+    """The book of active_cur less our own offers, which lend_cur should not count as competition."""
+    if active_cur not in own_offers:
+        return loans
+    own_amounts = {}
+    for offer in own_offers[active_cur]:
+        rate = Decimal(offer['rate']).quantize(SATOSHI)
+        own_amounts[rate] = own_amounts.get(rate, Decimal(0)) + Decimal(offer['amount'])
+    offers = []
+    for offer in loans['offers']:
+        rate = Decimal(offer['rate']).quantize(SATOSHI)
+        if rate in own_amounts:
+            amount = Decimal(offer['amount']) - own_amounts.pop(rate)
+            if amount < SATOSHI:
+                continue
+            offer = dict(offer, amount="%.8f" % amount)
+        offers.append(offer)
+    return {'offers': offers, 'demands': loans['demands']}
+
+
+def reconcile_offers(offers, available_balances, currencies):
+    """
+    Turns our open offers of currencies into offers, [(currency, amount, days, rate)] as lend_cur works them out: an
+    open offer for the same days within offerRateTolerance and offerAmountTolerance of a wanted one stays, the other
+    open offers are cancelled and the wanted offers left over are created from what that frees up.
+    """
+    to_cancel = dict((cur, list(own_offers[cur])) for cur in currencies if cur in own_offers)
+    to_create = []
+    for currency, amt, days, rate in offers:
+        kept = None
+        for offer in to_cancel.get(currency, []):
+            if int(offer['duration']) == int(days) and \
+                    abs(Decimal(offer['rate']) - Decimal(rate)) <= offer_rate_tolerance and \
+                    abs(Decimal(offer['amount']) - Decimal(amt)) <= offer_amount_tolerance * Decimal(amt):
+                kept = offer
+                break
+        if kept is not None:
+            to_cancel[currency].remove(kept)
+        else:
+            to_create.append((currency, amt, days, rate))
+
+    cancels = [(cur, offer) for cur in sorted(to_cancel) for offer in to_cancel[cur]]
+    results = run_all(lambda cancel: api.cancel_loan_offer(cancel[0], cancel[1]['id']), cancels, offer_concurrency)
+    free = dict((cur, Decimal(amount)) for cur, amount in available_balances.items())
+    for (cur, offer), (msg, exc_info) in zip(cancels, results):
+        if exc_info is None:
+            log.cancelOrders(cur, msg)
+            free[cur] = free.get(cur, Decimal(0)) + Decimal(offer['amount'])
+        else:
+            log.log("Error canceling loan offer: " + str(exc_info[1]))
+    for cur in set(cur for cur, offer in cancels) | set(offer[0] for offer in to_create):
+        loan_books.forget(cur)  # the cached book no longer has our offers right
+
+    # the offers kept can be a little larger than the ones they stand for, the last offers get what is left
+    offers = []
+    for currency, amt, days, rate in to_create:
+        amount = min(Decimal(amt), free.get(currency, Decimal(0)))
+        if amount > min_loan_size:
+            free[currency] -= amount
+            offers.append((currency, "%.8f" % amount, days, rate))
+    place_offers(offers)
 
 
 def cancel_all():
@@ -114,6 +250,7 @@ def cancel_all():
         else:
             cur_sum = float(min_loan_size) + 1
         if cur_sum >= float(min_loan_size):
+            loan_books.forget(CUR)  # the cached book still has the offers
             for offer in loan_offers[CUR]:
                 if not dry_run:
                     try:
@@ -130,15 +267,41 @@ def lend_all():
     lending_balances = api.return_available_account_balances("lending")['lending']
     if dry_run:  # just fake some numbers, if dryrun (testing)
         lending_balances.update(Data.get_on_order_balances())
+    available_balances = dict(lending_balances)
+    global own_offers
+    own_offers = {} if dry_run else get_own_offers(lending_balances)
 
     # Fill the (maxToLend) balances on the botlog.json for display it on the web
     for key in sorted(total_lended):
         if len(lending_balances) == 0 or key not in lending_balances:
             MaxToLend.amount_to_lend(total_lended[key], key, 0, 0)
+    # fetch every book at once rather than one after the other in lend_cur
+    loan_books.prefetch(dict((cur, book_depth(cur)) for cur in lending_balances))
     usable_currencies = 0
-    global sleep_time  # We need global var to edit sleeptime
+    global sleep_time, offer_batch  # We need global var to edit sleeptime
+    # work out the offers of every currency first, then only change the ones that differ from those on the book
+    offer_batch = []
+    completed = []
+    error = None
     for cur in lending_balances:
-        usable_currencies += lend_cur(cur, total_lended, lending_balances)
+        try:
+            usable_currencies += lend_cur(cur, total_lended, lending_balances)
+        except Exception:
+            # the open offers of this currency and the ones after it are left as they are
+            error = sys.exc_info()
+            break
+        completed.append(cur)
+    offers, offer_batch = offer_batch, None
+    offers = [offer for offer in offers if offer[0] in completed]
+    # the currencies before one that failed still get their offers, then the error that stopped them is raised
+    try:
+        reconcile_offers(offers, available_balances, completed)
+    except Exception as ex:
+        if error is None:
+            raise
+        log.log_error("Error replacing loan offers: " + str(ex))
+    if error is not None:
+        raise error[0], error[1], error[2]
     if usable_currencies == 0:  # After loop, if no currencies had enough to lend, use inactive sleep time.
         sleep_time = sleep_time_inactive
     else:  # Else, use active sleep time.
@@ -167,73 +330,116 @@ def lend_cur(active_cur, total_lended, lending_balances):
     # log total coin
     log.updateStatusValue(active_cur, "totalCoins", (Decimal(active_cur_test_balance)))
 
-    # make sure we have a request limit for this currency
-    if active_cur not in loanOrdersRequestLimit:
-        loanOrdersRequestLimit[active_cur] = defaultLoanOrdersRequestLimit
-
-    loans = api.return_loan_orders(active_cur, loanOrdersRequestLimit[active_cur])
+    depth = book_depth(active_cur)
+    loans = loan_books.get(active_cur, depth)
+    book_length = len(loans['offers'])
+    loans = without_own_offers(active_cur, loans)
     loans_length = len(loans['offers'])
-    if hide_coins and Decimal(loans['offers'][0]['rate']) < Decimal(cur_min_daily_rate):
+    # a book with nothing but our own offers is lent at max below, like an empty one
+    lowest_rate = Decimal(loans['offers'][0]['rate']) if loans_length > 0 else max_daily_rate
+    if hide_coins and lowest_rate < Decimal(cur_min_daily_rate):
         log.log("Not lending " + active_cur + " due to low rate.")
         return 0
 
     active_bal = MaxToLend.amount_to_lend(active_cur_test_balance, active_cur,
-                                          Decimal(lending_balances[active_cur]),
-                                          Decimal(loans['offers'][0]['rate']))
+                                          Decimal(lending_balances[active_cur]), lowest_rate)
 
     if float(active_bal) > min_loan_size:  # Make sure sleeptimer is set to active if any currencies can lend.
         currency_usable = 1
     else:
         return currency_usable  # Return early to end function.
 
-    lower_sum = Decimal(0)  # sum
-    order_num = int(0)  # offer book iterator
-    spread_steps = int(0)  # spread step count
-    lent = Decimal(0)
-    # in case of empty lendbook, lend at max
-    cur_spread_lend = int(spread_lend)  # Checks if active_bal can't be spread that many times, and may go down to 1.
-    while active_bal < (cur_spread_lend * min_loan_size):
-        cur_spread_lend -= 1
-    step_pct = (gap_top - gap_bottom) / cur_spread_lend
-
     active_plus_lended = Decimal(active_bal)
     if active_cur in total_lended:
         active_plus_lended += Decimal(total_lended[active_cur])
+    rates, amounts = parse_offers(loans['offers'])
+    walker = SpreadWalker(active_cur, active_bal, active_plus_lended, cur_min_daily_rate)
+    cut_off = False
     if loans_length == 0:
-        create_lend_offer(active_cur, Decimal(active_bal) - lent, max_daily_rate)
-    for offer in loans['offers']:
-        lower_sum += Decimal(offer['amount'])
-        upper_sum = lower_sum
-        while True:
-            sum_diff = upper_sum - lower_sum
-            gap_multiplier = gap_bottom / 100 + (step_pct / 100 * spread_steps)
-            if upper_sum > active_plus_lended * gap_multiplier and Decimal(offer['rate']) > cur_min_daily_rate:
-                spread_steps += 1
-                upper_sum += Decimal(active_bal) / cur_spread_lend
-            else:
-                create_lend_offer(active_cur, sum_diff, offer['rate'])
-                lent += sum_diff.quantize(SATOSHI)
-                break
-            if spread_steps == cur_spread_lend:
-                create_lend_offer(active_cur, Decimal(active_bal) - lent, offer['rate'])
+        # in case of empty lendbook, lend at max
+        walker.finish(to_satoshis(max_daily_rate))
+    else:
+        while not walker.walk(rates, amounts):  # end of the offers
+            if book_length != depth:
+                # the whole book, lend at max
+                walker.finish(to_satoshis(max_daily_rate))
                 break
-        if spread_steps == cur_spread_lend:
-            break
-        order_num += 1
-        if order_num == loans_length:  # end of the offers
-            if loans_length < loanOrdersRequestLimit[active_cur]:
-                # lend at max
-                create_lend_offer(active_cur, Decimal(active_bal) - lent, max_daily_rate)
-            else:
-                # increase limit for currency to get a more accurate response
-                loanOrdersRequestLimit[active_cur] += defaultLoanOrdersRequestLimit
-                log.log(active_cur + ': Not enough offers in response, adjusting request limit to ' + str(
-                    loanOrdersRequestLimit[active_cur]))
-                # repeat currency
-                lend_cur(active_cur, total_lended, lending_balances)
+            # the book was cut off, fetch it deeper and walk on from the first offer the walk has not seen
+            cut_off = True
+            depth *= 2
+            loans = loan_books.get(active_cur, depth)
+            book_length = len(loans['offers'])
+            loans = without_own_offers(active_cur, loans)
+            loans_length = len(loans['offers'])
+            rates, amounts = parse_offers(loans['offers'][walker.walked:])
+    update_book_depth(active_cur, walker.walked + book_length - loans_length, cut_off)
     return currency_usable
 
 
+def parse_offers(offers):
+    """The rates and the amounts of the offers of a book in satoshis, for the spread walk."""
+    return [to_satoshis(offer['rate']) for offer in offers], [to_satoshis(offer['amount']) for offer in offers]
+
+
+class SpreadWalker(object):
+    """
+    Spreads a balance over a loan book with plan_spread, lower_sum being the depth of the book walked so far. It keeps
+    its place between calls of walk(), so more of the book can be walked without starting over. Everything is in
+    satoshis, so the walk compares whole numbers and the offers add up to the balance exactly.
+    """
+    def __init__(self, currency, active_bal, active_plus_lended, min_rate):
+        self.currency = currency
+        self.active_bal = to_satoshis(active_bal)
+        self.active_plus_lended = to_satoshis(active_plus_lended)
+        self.min_rate = to_satoshis(min_rate)
+        self.lower_sum = 0  # sum
+        self.walked = 0  # offer book iterator
+        self.spread_steps = 0  # spread step count
+        self.lent = 0
+        # Checks if active_bal can't be spread that many times, and may go down to 1.
+        self.spread_lend = int(spread_lend)
+        while self.active_bal < (self.spread_lend * to_satoshis(min_loan_size)):
+            self.spread_lend -= 1
+        self.gap_bottom = to_satoshis(gap_bottom)  # in satoshis of a percent
+        self.gap_top = to_satoshis(gap_top)
+
+    def done(self):
+        return self.spread_steps == self.spread_lend
+
+    def walk(self, rates, amounts):
+        """Walks on through the offers of rates and amounts, returns True once the whole balance is offered."""
+        offers, walked, self.spread_steps = plan_spread(rates, amounts, self.active_bal, self.active_plus_lended,
+                                                        self.min_rate, self.spread_lend, self.gap_bottom, self.gap_top,
+                                                        self.lower_sum, self.spread_steps, self.lent)
+        for amount, rate in offers:
+            create_lend_offer(self.currency, amount, rate)
+            self.lent += amount
+        self.lower_sum += sum(amounts[:walked])
+        self.walked += walked
+        return self.done()
+
+    def finish(self, rate):
+        """Offers the rest of the balance at rate."""
+        create_lend_offer(self.currency, self.active_bal - self.lent, rate)
+        self.spread_steps = self.spread_lend
+
+
+def book_depth(currency):
+    """How many offers of the book of currency to fetch, enough for how deep lend_cur had to walk it last time."""
+    return loanOrdersRequestLimit.get(currency, defaultLoanOrdersRequestLimit)
+
+
+def update_book_depth(currency, walked, cut_off):
+    """
+    Keeps twice the walked depth of the book for the next round, walked counting our own offers in it as well.
+    cut_off is whether lend_cur had to fetch the book again because the balance was not spread by the end of it.
+    """
+    depth = max(defaultLoanOrdersRequestLimit, walked * 2)
+    if cut_off:
+        log.log(currency + ': Not enough offers in response, adjusting request limit to ' + str(depth))
+    loanOrdersRequestLimit[currency] = depth
+
+
 def transfer_balances():
     # Transfers all balances on the included list to Lending.
     if len(transferable_currencies) > 0:
@@ -0,0 +1,78 @@
+# coding=utf-8
+import threading
+import time
+
+from Parallel import run_all
+
+
+class LoanBookCache(object):
+    """
+    The returnLoanOrders books of every currency, shared by the lending loop and the market analysis. A book is fetched
+    with the limit it is asked for and reused for max_age seconds, also for smaller limits. The analysis samples on its
+    own timer, so it only reuses a book of the lending loop when it asks within max_age of the lending loop's fetch.
+    """
+    def __init__(self, api, max_age=10, workers=4, clock=time):
+        self.api = api
+        self.max_age = max_age
+        self.workers = workers
+        self.clock = clock
+        self._books = {}  # currency -> (time fetched, limit fetched with, book)
+        self._locks = {}  # currency -> lock held while the book is fetched
+        self._lock = threading.Lock()
+
+    def get(self, currency, limit=0):
+        """
+        The book of currency for limit offers and demands (0 for no limit), fetched if it is too old. A side the exchange
+        cut off is cut to limit, a complete one is handed over whole even if it is longer, so only a side of exactly
+        limit entries may be missing some.
+        """
+        with self._currency_lock(currency):
+            cached = self._books.get(currency)
+            if cached is None or not self._fresh(cached, limit):
+                cached = self._fetch(currency, limit)
+        fetched, fetched_limit, book = cached
+        if limit > 0 and fetched_limit != limit:
+            book = {'offers': self._cut(book['offers'], limit, fetched_limit),
+                    'demands': self._cut(book['demands'], limit, fetched_limit)}
+        return book
+
+    def forget(self, currency):
+        """Drops the cached book of currency, for when it no longer matches the exchange after our offers changed."""
+        with self._currency_lock(currency):
+            self._books.pop(currency, None)
+
+    def prefetch(self, limits):
+        """Fetches the books of {currency: limit} that are too old side by side, with up to workers at a time."""
+        stale = []
+        for currency, limit in limits.items():
+            cached = self._books.get(currency)
+            if cached is None or not self._fresh(cached, limit):
+                stale.append((currency, limit))
+        # errors are left for get() to raise to whoever needs the book
+        run_all(lambda request: self.get(*request), stale, self.workers)
+
+    def _fresh(self, cached, limit):
+        fetched, fetched_limit, book = cached
+        if self.clock.time() - fetched > self.max_age:
+            return False
+        # a book that came back with fewer entries than its limit is complete for any limit
+        return fetched_limit == 0 or 0 < limit <= fetched_limit or \
+            (len(book['offers']) < fetched_limit and len(book['demands']) < fetched_limit)
+
+    @staticmethod
+    def _cut(entries, limit, fetched_limit):
+        if 0 < fetched_limit <= len(entries):
+            return entries[:limit]
+        return entries
+
+    def _fetch(self, currency, limit):
+        book = self.api.return_loan_orders(currency, limit if limit > 0 else '')
+        cached = (self.clock.time(), limit, book)
+        self._books[currency] = cached
+        return cached
+
+    def _currency_lock(self, currency):
+        with self._lock:
+            if currency not in self._locks:
+                self._locks[currency] = threading.Lock()
+            return self._locks[currency]
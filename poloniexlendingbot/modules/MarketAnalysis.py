@@ -1,33 +1,34 @@
-import csv
+import os
 import threading
 import time
-import datetime
-from cStringIO import StringIO
-try:
-    import numpy
-    use_numpy = True
-except Exception as ex:
-    print "WARNING: Module Numpy not found, using manual percentile method. " \
-          "It is recommended to install Numpy. Error: " + str(ex)
-    use_numpy = False
+from RateStore import RateStore, import_csv, import_file
+from RateWindow import RateWindow
+
+# the windows get_analytics covers by default, (name, seconds)
+analytics_windows = [('1h', 60 * 60), ('24h', 24 * 60 * 60), ('7d', 7 * 24 * 60 * 60), ('30d', 30 * 24 * 60 * 60)]
+analytics_percentiles = [25, 50, 75, 90]
 
 currencies_to_analyse = []
-open_files = {}
+open_files = {}  # currency -> RateStore
+rate_windows = {}  # currency -> RateWindow of the last max_age days
 max_age = 0
 update_interval = 0
 api = None
 Data = None
+loan_books = None
 lending_style = 0
 
 
-def init(config, api1, data1):
-    global currencies_to_analyse, open_files, max_age, update_interval, api, Data, lending_style
+def init(config, api1, data1, loan_books1):
+    global currencies_to_analyse, open_files, rate_windows, max_age, update_interval, api, Data, lending_style, \
+        loan_books
     currencies_to_analyse = config.get_currencies_list('analyseCurrencies')
     max_age = int(config.get('BOT', 'analyseMaxAge', 30, 1, 365))
     update_interval = int(config.get('BOT', 'analyseUpdateInterval', 60, 10, 3600))
     lending_style = int(config.get('BOT', 'lendingStyle', 50, 1, 99))
     api = api1
     Data = data1
+    loan_books = loan_books1
     if len(currencies_to_analyse) != 0:
         for currency in currencies_to_analyse:
 
@@ -39,8 +40,10 @@ def init(config, api1, data1):
                 exit(1)
 
             else:
-                path = "market_data/" + currency + "_market_data.csv"
-                open_files[currency] = path
+                open_files[currency] = open_store(currency)
+                rate_windows[currency] = RateWindow(max_age * 24 * 60 * 60)
+                for timestamp, rate in zip(*open_files[currency].read(time.time() - max_age * 24 * 60 * 60)):
+                    rate_windows[currency].add(timestamp, rate)
 
         thread = threading.Thread(target=update_market_loop)
         thread.deamon = True
@@ -54,71 +57,67 @@ def update_market_loop():
         time.sleep(update_interval)
 
 
+def open_store(currency):
+    store = RateStore("market_data/" + currency)
+    for old_path, import_old in [("market_data/" + currency + "_market_data.bin", import_file),
+                                 ("market_data/" + currency + "_market_data.csv", import_csv)]:
+        if len(store) == 0 and os.path.exists(old_path):  # data recorded by older versions
+            print "Importing " + old_path + "..."
+            print "Imported " + str(import_old(old_path, store)) + " rates, " + old_path + " can be deleted."
+    return store
+
+
 def update_markets():
+    loan_books.prefetch(dict((cur, 5) for cur in open_files))
     for cur in open_files:
-        with open(open_files[cur], 'a') as f:
-            writer = csv.writer(f, lineterminator='\n')
-            raw_data = api.return_loan_orders(cur, 5)['offers'][0]
-            market_data = [Data.timestamp(), raw_data['rate']]
-            writer.writerow(market_data)
+        raw_data = loan_books.get(cur, 5)['offers'][0]
+        now = time.time()
+        open_files[cur].append(now, raw_data['rate'])
+        rate_windows[cur].add(now, float(raw_data['rate']))
 
 
 def delete_old_data():
+    oldest = time.time() - max_age * 24 * 60 * 60
     for cur in open_files:
-        with open(open_files[cur], 'rb') as file_a:
-            new_a_buf = StringIO()
-            writer = csv.writer(new_a_buf)
-            reader2 = csv.reader(file_a)
-            for row in reader2:
-                if get_day_difference(row[0]) < max_age:
-                    writer.writerow(row)
-
-        # At this point, the contents (new_a_buf) exist in memory
-        with open(open_files[cur], 'wb') as file_b:
-            file_b.write(new_a_buf.getvalue())
-
-
-def get_day_difference(date_time):  # Will be in format '%Y-%m-%d %H:%M:%S'
-    date1 = datetime.datetime.strptime(date_time, '%Y-%m-%d %H:%M:%S')
-    now = datetime.datetime.now()
-    diff_days = (now - date1).days
-    return diff_days
+        open_files[cur].delete_before(oldest)
+        rate_windows[cur].expire(time.time())
 
 
 def get_rate_list(cur='all'):
+    oldest = time.time() - max_age * 24 * 60 * 60
     if cur == 'all':
         all_rates = {}
         for cur in open_files:
-            with open(open_files[cur], 'r') as f:
-                reader = csv.reader(f)
-                rates = []
-                for row in reader:
-                    rates.append(row[1])
-                rates = map(float, rates)
-                all_rates[cur] = rates
+            all_rates[cur] = open_files[cur].rates(oldest)
         return all_rates
 
     else:
         if cur not in open_files:
             return []
-        with open(open_files[cur], 'r') as f:
-            reader = csv.reader(f)
-            rates = []
-            for row in reader:
-                rates.append(row[1])
-            rates = map(float, rates)
-        return rates
+        return open_files[cur].rates(oldest)
 
 
-def get_rate_suggestion(cur, percentile=lending_style):
-    if cur not in open_files:
+def get_rate_suggestion(cur, percentile=None):
+    if cur not in rate_windows:
+        return 0
+    if percentile is None:
+        percentile = lending_style
+    rate_windows[cur].expire(time.time())
+    result = rate_windows[cur].percentile(percentile)
+    if result is None:
         return 0
-    rates = get_rate_list(cur)
-    if use_numpy:
-        result = numpy.percentile(rates, int(percentile), interpolation='linear')
-    else:
-        rates.sort()
-        index = int(percentile * len(rates))
-        result = rates[index]
     result = float(int(result * 1000000) / 1000000.0)
     return result
+
+
+def get_analytics(cur, percentiles=None, windows=None):
+    """
+    Percentiles, time-weighted mean and volatility of the recorded rates of cur for several windows at once, see
+    RateWindow.statistics. Windows longer than analyseMaxAge only cover analyseMaxAge. Returns {} if cur is not analysed.
+    """
+    if cur not in rate_windows:
+        return {}
+    now = time.time()
+    rate_windows[cur].expire(now)
+    return rate_windows[cur].statistics(now, windows if windows is not None else analytics_windows,
+                                        percentiles if percentiles is not None else analytics_percentiles)
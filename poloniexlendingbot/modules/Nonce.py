@@ -0,0 +1,44 @@
+# coding=utf-8
+import os
+import threading
+import time
+
+
+class NonceAllocator(object):
+    """
+    Hands out strictly increasing nonces to any number of threads, so that two private calls made in the same
+    millisecond (e.g. by the lending loop and the market analysis thread) never share one.
+    With a path it persists a high-water mark that is a block of nonces ahead of the last one handed out,
+    so a restarted bot never reuses a nonce without writing the file on every call.
+    """
+    def __init__(self, path=None, reserve=10000):
+        self.path = path
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._last = 0
+        self._reserved = 0
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                content = f.read().strip()
+            if content:
+                self._last = self._reserved = int(content)
+
+    def next(self):
+        with self._lock:
+            nonce = max(self._last + 1, int(time.time() * 1000))
+            self._last = nonce
+
+            if self.path and nonce >= self._reserved:
+                self._reserved = nonce + self.reserve
+                self._persist(self._reserved)
+
+            return nonce
+
+    def _persist(self, value):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(str(value))
+        if os.name == 'nt' and os.path.exists(self.path):  # rename does not replace files on Windows
+            os.remove(self.path)
+        os.rename(temp_path, self.path)
@@ -0,0 +1,34 @@
+# coding=utf-8
+import sys
+import threading
+from Queue import Queue, Empty
+
+
+def run_all(function, items, workers):
+    """
+    Calls function(item) for every item on up to workers threads, the calling thread being one of them, and returns
+    [(result, exc_info)] in the order of items, with exc_info None for the calls that did not raise.
+    """
+    results = [None] * len(items)
+    queue = Queue()
+    for index, item in enumerate(items):
+        queue.put((index, item))
+
+    def work():
+        while True:
+            try:
+                index, item = queue.get_nowait()
+            except Empty:
+                return
+            try:
+                results[index] = (function(item), None)
+            except Exception:
+                results[index] = (None, sys.exc_info())
+
+    threads = [threading.Thread(target=work) for i in range(min(workers, len(items)) - 1)]
+    for thread in threads:
+        thread.start()
+    work()
+    for thread in threads:
+        thread.join()
+    return results
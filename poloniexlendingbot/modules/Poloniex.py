@@ -7,6 +7,18 @@ import time
 import urllib
 import urllib2
 
+from Nonce import NonceAllocator
+from RateLimiter import RequestScheduler, PRIORITY_ORDER, PRIORITY_ACCOUNT, PRIORITY_MARKET_DATA
+
+# loan offers and their cancels jump the queue of the rate limiter, ahead of balance and loan list downloads
+ORDER_COMMANDS = ['createLoanOffer', 'cancelLoanOffer', 'buy', 'sell', 'cancelOrder']
+
+# Attempts for the read-only return... commands when Poloniex refuses the nonce, as it does when offers are sent
+# concurrently (see offerConcurrency) and one with a higher nonce arrived first. A command that changes the account,
+# like createLoanOffer or transferBalance, is never sent again: its PoloniexApiError is raised, and the next round
+# finds the offer in returnOpenLoanOffers if it was made after all.
+NONCE_ATTEMPTS = 3
+
 
 class PoloniexApiError(Exception):
     pass
@@ -17,9 +29,11 @@ def create_time_stamp(datestr, formatting="%Y-%m-%d %H:%M:%S"):
 
 
 class Poloniex:
-    def __init__(self, api_key, secret):
+    def __init__(self, api_key, secret, rate_limiter=None, nonces=None):
         self.APIKey = api_key
         self.Secret = secret
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RequestScheduler()
+        self.nonces = nonces if nonces is not None else NonceAllocator()
         socket.setdefaulttimeout(30)
 
     def post_process(self, before):
@@ -47,15 +61,19 @@ class Poloniex:
             return data
 
         try:
+            if command in ["returnTicker", "return24hVolume", "returnOrderBook", "returnMarketTradeHistory",
+                           "returnLoanOrders"]:
+                self.rate_limiter.acquire('public', PRIORITY_MARKET_DATA)
+
             if command == "returnTicker" or command == "return24hVolume":
-                ret = urllib2.urlopen(urllib2.Request('https://poloniex.com/public?command=' + command))
+                ret = self._urlopen(urllib2.Request('https://poloniex.com/public?command=' + command))
                 return _read_response(ret)
             elif command == "returnOrderBook":
-                ret = urllib2.urlopen(urllib2.Request(
+                ret = self._urlopen(urllib2.Request(
                     'https://poloniex.com/public?command=' + command + '&currencyPair=' + str(req['currencyPair'])))
                 return _read_response(ret)
             elif command == "returnMarketTradeHistory":
-                ret = urllib2.urlopen(urllib2.Request(
+                ret = self._urlopen(urllib2.Request(
                     'https://poloniex.com/public?command=' + "returnTradeHistory" + '&currencyPair=' + str(
                         req['currencyPair'])))
                 return _read_response(ret)
@@ -63,28 +81,41 @@ class Poloniex:
                 req_url = 'https://poloniex.com/public?command=' + "returnLoanOrders" + '&currency=' + str(req['currency'])
                 if req['limit'] != '':
                     req_url += '&limit=' + str(req['limit'])
-                ret = urllib2.urlopen(urllib2.Request(req_url))
+                ret = self._urlopen(urllib2.Request(req_url))
                 return _read_response(ret)
             else:
                 req['command'] = command
-                req['nonce'] = int(time.time() * 1000)
-                post_data = urllib.urlencode(req)
-
-                sign = hmac.new(self.Secret, post_data, hashlib.sha512).hexdigest()
-                headers = {
-                    'Sign': sign,
-                    'Key': self.APIKey
-                }
-
-                ret = urllib2.urlopen(urllib2.Request('https://poloniex.com/tradingApi', post_data, headers))
-                json_ret = _read_response(ret)
-                return self.post_process(json_ret)
+                attempts = NONCE_ATTEMPTS if command.startswith('return') else 1
+                for attempt in range(attempts):
+                    # every attempt is a request of its own to the exchange
+                    self.rate_limiter.acquire('private', PRIORITY_ORDER if command in ORDER_COMMANDS else PRIORITY_ACCOUNT)
+                    req['nonce'] = self.nonces.next()
+                    post_data = urllib.urlencode(req)
+
+                    sign = hmac.new(self.Secret, post_data, hashlib.sha512).hexdigest()
+                    headers = {
+                        'Sign': sign,
+                        'Key': self.APIKey
+                    }
+
+                    ret = self._urlopen(urllib2.Request('https://poloniex.com/tradingApi', post_data, headers))
+                    try:
+                        json_ret = _read_response(ret)
+                    except PoloniexApiError as ex:
+                        if 'Nonce must be greater' in str(ex) and attempt < attempts - 1:
+                            continue
+                        raise
+                    return self.post_process(json_ret)
         except Exception as ex:
             # add command information to exception
             # (this isn't compatible with python 3)
             import sys
             raise type(ex), type(ex)(ex.message + ' Requesting %s' % command), sys.exc_info()[2]
 
+    def _urlopen(self, request):
+        # the only place that talks to the exchange
+        return urllib2.urlopen(request)
+
     def return_ticker(self):
         return self.api_query("returnTicker")
 
@@ -111,6 +142,8 @@ class Poloniex:
         balances = self.api_query('returnAvailableAccountBalances', {"account": account})
         if isinstance(balances, list):  # silly api wrapper, empty dict returns a list, which breaks the code later.
             balances = {}
+        # Poloniex leaves out an account without balances, lend_all and cancel_all look theirs up by name
+        balances.setdefault(account, {})
         return balances
 
     # Returns your open orders for a given market, specified by the "currencyPair" POST parameter, e.g. "BTC_XCP"
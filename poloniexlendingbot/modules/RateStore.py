@@ -0,0 +1,129 @@
+# coding=utf-8
+import calendar
+import csv
+import datetime
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import insort
+
+RECORD = struct.Struct('<qd')  # epoch seconds, rate
+SEGMENT_SECONDS = 24 * 60 * 60
+
+
+class RateStore(object):
+    """
+    The recorded rates of one currency, in a folder with one file of fixed width (timestamp, rate) records per UTC day.
+    Records are appended in the order they were taken and read through a memory map, unpacked in one call instead of
+    being parsed row by row. Old records expire a whole day at a time by deleting its file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()  # the recording thread writes while the lending loop reads
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._segments = sorted(_segment_of_name(name) for name in os.listdir(path) if name.endswith('.bin'))
+
+    def __len__(self):
+        return sum(os.path.getsize(self._segment_path(segment)) // RECORD.size for segment in self._segments)
+
+    def append(self, timestamp, rate):
+        self.extend([(timestamp, rate)])
+
+    def extend(self, records):
+        with self._lock:
+            segment, data = None, []
+            for timestamp, rate in records:
+                if int(timestamp) // SEGMENT_SECONDS != segment:
+                    self._write(segment, data)
+                    segment, data = int(timestamp) // SEGMENT_SECONDS, []
+                data.append(RECORD.pack(int(timestamp), float(rate)))
+            self._write(segment, data)
+
+    def _write(self, segment, data):
+        if len(data) == 0:
+            return
+        with open(self._segment_path(segment), 'ab') as f:
+            f.write(''.join(data))
+        if segment not in self._segments:
+            insort(self._segments, segment)
+
+    def read(self, since=None):
+        """Returns the lists (timestamps, rates) of the records taken at or after since, or of all of them."""
+        timestamps, rates = [], []
+        with self._lock:
+            for segment in self._segments:
+                if since is None or (segment + 1) * SEGMENT_SECONDS > since:
+                    segment_timestamps, segment_rates = read_file(self._segment_path(segment), since)
+                    timestamps += segment_timestamps
+                    rates += segment_rates
+        return timestamps, rates
+
+    def rates(self, since=None):
+        return self.read(since)[1]
+
+    def delete_before(self, timestamp):
+        """Deletes the days that ended before timestamp, read() leaves out the older records of the day it is in."""
+        with self._lock:
+            while len(self._segments) > 0 and (self._segments[0] + 1) * SEGMENT_SECONDS <= timestamp:
+                os.remove(self._segment_path(self._segments.pop(0)))
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, datetime.datetime.utcfromtimestamp(segment * SEGMENT_SECONDS)
+                            .strftime('%Y-%m-%d') + '.bin')
+
+
+def _segment_of_name(name):
+    return calendar.timegm(time.strptime(name[:-len('.bin')], '%Y-%m-%d')) // SEGMENT_SECONDS
+
+
+def read_file(path, since=None):
+    """Returns the lists (timestamps, rates) of the records in a file at or after since, or of all of them."""
+    count = os.path.getsize(path) // RECORD.size
+    if count == 0:
+        return [], []
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), count * RECORD.size, access=mmap.ACCESS_READ)
+    try:
+        first = _find(data, count, since) if since is not None else 0
+        values = struct.unpack_from('<' + 'qd' * (count - first), data, first * RECORD.size)
+    finally:
+        data.close()
+    return list(values[0::2]), list(values[1::2])
+
+
+def _find(data, count, timestamp):
+    """Index of the first record at or after timestamp, the records are in time order."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if RECORD.unpack_from(data, middle * RECORD.size)[0] < timestamp:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def import_csv(csv_path, store):
+    """
+    Adds the rows of a market data csv file of older versions, 'YYYY-MM-DD HH:MM:SS,rate' in local time, to store and
+    returns how many there were.
+    """
+    records = []
+    with open(csv_path, 'r') as f:
+        for row in csv.reader(f):
+            if len(row) >= 2:
+                date = datetime.datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
+                records.append((time.mktime(date.timetuple()), float(row[1])))
+    records.sort()
+    store.extend(records)
+    return len(records)
+
+
+def import_file(path, store):
+    """Adds the records of a single file store of older versions to store and returns how many there were."""
+    timestamps, rates = read_file(path)
+    store.extend(zip(timestamps, rates))
+    return len(timestamps)
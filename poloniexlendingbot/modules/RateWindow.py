@@ -0,0 +1,89 @@
+# coding=utf-8
+import math
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+
+
+class RateWindow(object):
+    """
+    The rates of the last max_age seconds, kept sorted as they are added and expire, so a percentile is a lookup
+    instead of a sort of the whole history.
+    """
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self._samples = deque()  # (timestamp, rate), oldest first
+        self._sorted = []  # the rates of the samples, sorted
+        self._lock = threading.Lock()  # the recording thread adds while the lending loop reads
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def add(self, timestamp, rate):
+        with self._lock:
+            self._samples.append((timestamp, rate))
+            insort(self._sorted, rate)
+
+    def expire(self, now):
+        """Drops the rates older than max_age at now."""
+        with self._lock:
+            while len(self._samples) > 0 and self._samples[0][0] < now - self.max_age:
+                rate = self._samples.popleft()[1]
+                del self._sorted[bisect_left(self._sorted, rate)]
+
+    def percentile(self, percentile):
+        """The percentile (0-100) of the rates with linear interpolation, like numpy.percentile. None when empty."""
+        with self._lock:
+            return percentile_of(self._sorted, percentile)
+
+    def statistics(self, now, windows, percentiles):
+        """
+        Statistics of the rates in each (name, seconds) window up to now, from one pass over the samples:
+        {name: {'samples': count, 'percentiles': {percentile: rate}, 'mean': rate, 'volatility': rate}}. The mean and
+        the volatility, the standard deviation of the rate, weigh each rate by how long it held until the next sample.
+        They are None for a window without samples.
+        """
+        with self._lock:
+            samples = list(self._samples)
+            all_sorted = list(self._sorted)
+        timestamps = [sample[0] for sample in samples]
+
+        # running totals of rate and rate squared times the seconds each rate held
+        held_sums, square_sums = [0.0], [0.0]
+        for i in range(len(samples)):
+            held = (timestamps[i + 1] if i + 1 < len(samples) else now) - timestamps[i]
+            held_sums.append(held_sums[-1] + samples[i][1] * held)
+            square_sums.append(square_sums[-1] + samples[i][1] * samples[i][1] * held)
+
+        result = {}
+        for name, seconds in windows:
+            first = bisect_left(timestamps, now - seconds)
+            if first == 0:
+                rates = all_sorted
+            else:
+                rates = sorted(sample[1] for sample in samples[first:])
+            statistics = {'samples': len(rates), 'percentiles': {}, 'mean': None, 'volatility': None}
+            if len(rates) > 0:
+                for percentile in percentiles:
+                    statistics['percentiles'][percentile] = percentile_of(rates, percentile)
+                duration = now - timestamps[first]
+                if duration > 0:
+                    mean = (held_sums[-1] - held_sums[first]) / duration
+                    variance = (square_sums[-1] - square_sums[first]) / duration - mean * mean
+                    statistics['mean'] = mean
+                    statistics['volatility'] = math.sqrt(max(variance, 0.0))
+                else:
+                    statistics['mean'] = rates[-1]
+                    statistics['volatility'] = 0.0
+            result[name] = statistics
+        return result
+
+
+def percentile_of(sorted_rates, percentile):
+    """The percentile (0-100) of sorted_rates with linear interpolation, like numpy.percentile. None when empty."""
+    if len(sorted_rates) == 0:
+        return None
+    position = (len(sorted_rates) - 1) * percentile / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_rates) - 1)
+    return sorted_rates[lower] + (sorted_rates[upper] - sorted_rates[lower]) * (position - lower)
@@ -0,0 +1,301 @@
+# coding=utf-8
+import itertools
+import json
+import os
+import random
+import socket
+import threading
+import time
+import urlparse
+from StringIO import StringIO
+from bisect import bisect_right
+from datetime import datetime
+
+from Poloniex import Poloniex
+
+LENDING_FEE = 0.15  # share of the interest that Poloniex keeps
+
+
+def load_loan_books(data_dir):
+    """
+    Reads recorded loan order books, one <CURRENCY>_loan_orders.jsonl file per currency with a
+    {"timestamp": ..., "offers": [...], "demands": [...]} line for every returnLoanOrders response.
+    """
+    loan_books = {}
+    for file_name in sorted(os.listdir(data_dir)):
+        if file_name.endswith('_loan_orders.jsonl'):
+            snapshots = []
+            with open(os.path.join(data_dir, file_name), 'r') as f:
+                for line in f:
+                    if line.strip():
+                        snapshots.append(json.loads(line))
+            snapshots.sort(key=lambda s: float(s['timestamp']))
+            loan_books[file_name[:-len('_loan_orders.jsonl')]] = snapshots
+    return loan_books
+
+
+class SimulatedClock(object):
+    """A clock that only moves when it is told to."""
+    def __init__(self, current=0.0):
+        self.current = float(current)
+
+    def time(self):
+        return self.current
+
+    def advance(self, seconds):
+        self.current += seconds
+
+
+class SimulatedPoloniex(Poloniex):
+    """
+    An in-process stand-in for poloniex.com that replays recorded loan order books. Only the transport of the Poloniex
+    client is replaced, so rate limiting and nonces run exactly like they do against the exchange.
+
+    The replay starts at the first recorded book when the simulator is created and runs `speed` times faster than the
+    clock. An offer is taken once a recorded demand bids at least its rate or the cheapest recorded offer is above it,
+    and it then runs as a loan until its duration has passed in replay time.
+    """
+    def __init__(self, loan_books, balances, ticker=None, speed=1.0, latency=(0.0, 0.0), error_rate=0.0,
+                 failure_rate=0.0, clock=time, rate_limiter=None, nonces=None):
+        Poloniex.__init__(self, 'simulator', 'simulator', rate_limiter, nonces)
+        self.loan_books = loan_books
+        self.ticker = ticker if ticker is not None else {}
+        self.speed = float(speed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.clock = clock
+
+        self.exchange_balances = {}
+        self.lending_balances = dict((cur, float(amount)) for cur, amount in balances.items())
+        self.open_offers = {}  # id -> offer
+        self.active_loans = {}  # id -> loan
+        self.earnings = {}  # currency -> interest after fees
+        self.amount_lent = {}  # currency -> sum of all filled offers
+        self.offers_created = 0
+        self.offers_cancelled = 0
+        self.offers_filled = 0
+
+        self._timestamps = dict((cur, [float(s['timestamp']) for s in snapshots])
+                                for cur, snapshots in loan_books.items())
+        self.replay_start = min(stamps[0] for stamps in self._timestamps.values() if len(stamps) > 0)
+        self.clock_start = self.clock.time()
+        self._ids = itertools.count(1)
+        self._last_nonce = 0
+        self._extremes = {}  # currency -> (book index, best demand rate, lowest offer rate)
+        self._lock = threading.RLock()
+
+    def market_time(self):
+        return self.replay_start + (self.clock.time() - self.clock_start) * self.speed
+
+    def loan_book(self, currency):
+        index = self._book_index(currency)
+        if index is None:
+            return {'offers': [], 'demands': []}
+        return self.loan_books[currency][index]
+
+    def _book_index(self, currency):
+        stamps = self._timestamps.get(currency)
+        if not stamps:
+            return None
+        return max(bisect_right(stamps, self.market_time()) - 1, 0)
+
+    def _urlopen(self, request):
+        if self.latency[1] > 0:
+            time.sleep(random.uniform(*self.latency))
+        if random.random() < self.failure_rate:
+            raise socket.timeout('timed out (simulated)')
+
+        url = urlparse.urlsplit(request.get_full_url())
+        if request.has_data():
+            params = dict(urlparse.parse_qsl(request.get_data()))
+        else:
+            params = dict(urlparse.parse_qsl(url.query))
+
+        with self._lock:
+            if random.random() < self.error_rate:
+                ret = {'error': 'Simulated error'}
+            elif url.path == '/public':
+                ret = self._public_command(params)
+            else:
+                ret = self._private_command(params)
+        return StringIO(json.dumps(ret))
+
+    def _public_command(self, params):
+        command = params['command']
+        if command == 'returnTicker':
+            return self.ticker
+        elif command == 'returnLoanOrders':
+            return self._return_loan_orders(params['currency'], int(params.get('limit') or 0))
+        elif command == 'return24hVolume':
+            return {}
+        return {'error': 'Invalid command.'}
+
+    def _private_command(self, params):
+        nonce = int(params['nonce'])
+        if nonce <= self._last_nonce:
+            return {'error': 'Nonce must be greater than ' + str(self._last_nonce) + '. You provided ' + str(nonce) +
+                             '.'}
+        self._last_nonce = nonce
+
+        self.match_offers()
+        self.expire_loans()
+        command = params['command']
+        if command == 'returnBalances':
+            return dict((cur, '%.8f' % amount) for cur, amount in self.exchange_balances.items())
+        elif command == 'returnAvailableAccountBalances':
+            lending = dict((cur, '%.8f' % amount) for cur, amount in self.lending_balances.items() if amount > 0)
+            return {'lending': lending} if lending else []
+        elif command == 'returnOpenLoanOffers':
+            return self._return_open_loan_offers()
+        elif command == 'returnActiveLoans':
+            return {'provided': [self._format_loan(loan) for loan in self.active_loans.values()], 'used': []}
+        elif command == 'createLoanOffer':
+            return self._create_loan_offer(params['currency'], float(params['amount']), int(params['duration']),
+                                          int(params['autoRenew']), float(params['lendingRate']))
+        elif command == 'cancelLoanOffer':
+            return self._cancel_loan_offer(params['orderNumber'])
+        elif command == 'transferBalance':
+            return self._transfer_balance(params['currency'], float(params['amount']), params['fromAccount'],
+                                         params['toAccount'])
+        elif command == 'toggleAutoRenew':
+            loan = self.active_loans.get(int(params['orderNumber']))
+            if loan is None:
+                return {'error': 'Invalid order number.'}
+            loan['autoRenew'] = 1 - loan['autoRenew']
+            return {'success': 1, 'message': loan['autoRenew']}
+        return {'error': 'Invalid command.'}
+
+    def _return_loan_orders(self, currency, limit=0):
+        book = self.loan_book(currency)
+        offers = list(book['offers'])
+        # our own offers are part of the book the bot sees
+        for offer in self.open_offers.values():
+            if offer['currency'] == currency:
+                offers.append({'rate': '%.8f' % offer['rate'], 'amount': '%.8f' % offer['amount'],
+                               'rangeMin': 2, 'rangeMax': offer['duration']})
+        offers.sort(key=lambda o: float(o['rate']))
+        demands = list(book['demands'])
+        if limit > 0:
+            offers = offers[:limit]
+            demands = demands[:limit]
+        return {'offers': offers, 'demands': demands}
+
+    def _return_open_loan_offers(self):
+        loan_offers = {}
+        for offer in sorted(self.open_offers.values(), key=lambda o: o['id']):
+            loan_offers.setdefault(offer['currency'], []).append({
+                'id': offer['id'], 'rate': '%.8f' % offer['rate'], 'amount': '%.8f' % offer['amount'],
+                'duration': offer['duration'], 'autoRenew': offer['autoRenew'], 'date': self._format_date(offer['date'])
+            })
+        return loan_offers if loan_offers else []
+
+    def _create_loan_offer(self, currency, amount, duration, auto_renew, rate):
+        # the bot offers balances as rounded to 8 decimals, which can be a fraction of a satoshi above the real one
+        if self.lending_balances.get(currency, 0.0) < amount - 0.000000005:
+            return {'error': 'Not enough ' + currency + ' available to offer.'}
+        self.lending_balances[currency] = max(self.lending_balances[currency] - amount, 0.0)
+        self.offers_created += 1
+        offer = {'id': next(self._ids), 'currency': currency, 'rate': rate, 'amount': amount, 'duration': duration,
+                 'autoRenew': auto_renew, 'date': self.market_time()}
+        self.open_offers[offer['id']] = offer
+        self._match_offer(offer)
+        return {'success': 1, 'message': 'Loan order placed.', 'orderID': offer['id']}
+
+    def _cancel_loan_offer(self, order_number):
+        offer = self.open_offers.pop(int(order_number), None)
+        if offer is None:
+            return {'error': 'Invalid order number, or you are not the person who placed the order.'}
+        self.lending_balances[offer['currency']] += offer['amount']
+        self.offers_cancelled += 1
+        return {'success': 1, 'message': 'Loan offer canceled.'}
+
+    def _transfer_balance(self, currency, amount, from_account, to_account):
+        accounts = {'exchange': self.exchange_balances, 'lending': self.lending_balances}
+        if from_account not in accounts or to_account not in accounts:
+            return {'error': 'Invalid account.'}
+        if accounts[from_account].get(currency, 0.0) < amount:
+            return {'error': 'Not enough ' + currency + '.'}
+        accounts[from_account][currency] -= amount
+        accounts[to_account][currency] = accounts[to_account].get(currency, 0.0) + amount
+        return {'success': 1, 'message': 'Transferred %.8f %s from %s to %s account.' % (amount, currency,
+                                                                                           from_account, to_account)}
+
+    def match_offers(self):
+        for offer in self.open_offers.values():
+            self._match_offer(offer)
+
+    def _match_offer(self, offer):
+        best_demand, lowest_offer = self._book_extremes(offer['currency'])
+        if best_demand >= offer['rate'] or lowest_offer > offer['rate']:
+            del self.open_offers[offer['id']]
+            self.active_loans[offer['id']] = dict(offer, date=self.market_time())
+            self.amount_lent[offer['currency']] = self.amount_lent.get(offer['currency'], 0.0) + offer['amount']
+            self.offers_filled += 1
+
+    def _book_extremes(self, currency):
+        index = self._book_index(currency)
+        cached = self._extremes.get(currency)
+        if cached is None or cached[0] != index:
+            book = self.loan_book(currency)
+            cached = (index, max([float(d['rate']) for d in book['demands']] or [0.0]),
+                      min([float(o['rate']) for o in book['offers']] or [0.0]))
+            self._extremes[currency] = cached
+        return cached[1], cached[2]
+
+    def accrued_interest(self, currency):
+        """Interest after fees that the active loans of currency have earned so far."""
+        now = self.market_time()
+        return sum(loan['amount'] * loan['rate'] * (now - loan['date']) / (24 * 60 * 60) * (1 - LENDING_FEE)
+                   for loan in self.active_loans.values() if loan['currency'] == currency)
+
+    def expire_loans(self):
+        now = self.market_time()
+        for loan in self.active_loans.values():
+            if now - loan['date'] >= loan['duration'] * 24 * 60 * 60:
+                del self.active_loans[loan['id']]
+                interest = loan['amount'] * loan['rate'] * loan['duration'] * (1 - LENDING_FEE)
+                self.earnings[loan['currency']] = self.earnings.get(loan['currency'], 0.0) + interest
+                if loan['autoRenew']:
+                    self.lending_balances[loan['currency']] += interest
+                    offer = dict(loan, id=next(self._ids), date=now)
+                    self.open_offers[offer['id']] = offer
+                else:
+                    self.lending_balances[loan['currency']] += loan['amount'] + interest
+
+    def _format_loan(self, loan):
+        return {'id': loan['id'], 'currency': loan['currency'], 'rate': '%.8f' % loan['rate'],
+                'amount': '%.8f' % loan['amount'], 'range': loan['duration'], 'autoRenew': loan['autoRenew'],
+                'date': self._format_date(loan['date']), 'fees': '%.8f' % (loan['amount'] * loan['rate'] * LENDING_FEE)}
+
+    def _format_date(self, market_time):
+        # dates are handed out in clock time, like every other timestamp the bot sees
+        return datetime.utcfromtimestamp(self.clock_start + (market_time - self.replay_start) / self.speed) \
+            .strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_balances(value):
+    """Parses 'BTC:1.5,LTC:20' into a dict of starting balances."""
+    balances = {}
+    for item in value.split(','):
+        if item.strip():
+            currency, amount = item.split(':')
+            balances[currency.strip().upper()] = float(amount)
+    return balances
+
+
+def create(Config, rate_limiter, nonces):
+    """Builds the simulator from the [SIMULATOR] section of the config."""
+    data_dir = Config.get('SIMULATOR', 'dataDir', 'market_data')
+    ticker = None
+    if os.path.exists(os.path.join(data_dir, 'ticker.json')):
+        with open(os.path.join(data_dir, 'ticker.json'), 'r') as f:
+            ticker = json.load(f)
+    return SimulatedPoloniex(load_loan_books(data_dir), parse_balances(Config.get('SIMULATOR', 'balances', 'BTC:1')),
+                             ticker=ticker,
+                             speed=float(Config.get('SIMULATOR', 'speed', 1, 0.001, 1000000)),
+                             latency=(float(Config.get('SIMULATOR', 'minLatency', 0, 0, 60)),
+                                      float(Config.get('SIMULATOR', 'maxLatency', 0, 0, 60))),
+                             error_rate=float(Config.get('SIMULATOR', 'errorRate', 0, 0, 1)),
+                             failure_rate=float(Config.get('SIMULATOR', 'failureRate', 0, 0, 1)),
+                             rate_limiter=rate_limiter, nonces=nonces)
@@ -0,0 +1,81 @@
+# coding=utf-8
+from bisect import bisect_right
+try:
+    import numpy
+    use_numpy = True
+except ImportError:
+    use_numpy = False
+
+PERCENT = 100 * 10 ** 8  # 100 percent, in satoshis of a percent
+MAX_THRESHOLD = 2 ** 62  # deeper than any book, keeps the thresholds inside numpy's int64
+
+
+def plan_spread(rates, amounts, active_bal, active_plus_lended, min_rate, spread_lend, gap_bottom, gap_top,
+                lower_sum=0, spread_steps=0, lent=0):
+    """
+    Works out the offers that spread active_bal over a loan book, the same ones as walking the book offer by offer.
+    Step s of spread_lend goes to the first offer above min_rate where the book up to and including it is deeper than
+    active_plus_lended * (gap_bottom + (gap_top - gap_bottom) * s / spread_lend) percent. Further steps go to the same
+    offer while the book up to it plus their shares of active_bal is still deeper than their gaps. The steps of one offer
+    make one offer of their shares, and the last step offers what is left of active_bal.
+
+    rates and amounts are the offers of the book in satoshis, sorted by rate as the exchange returns them, the gaps are
+    in satoshis of a percent. lower_sum, spread_steps and lent carry on from a walk of the book before these offers.
+    The depth of the book up to every offer is a cumulative sum and the first offer deep enough for each step is found
+    with one binary search, so only the offers that get steps are looked at. Uses numpy if it is installed.
+
+    Returns ([(amount, rate)], walked, spread_steps): the offers to make in satoshis, how many offers of the book the
+    walk went through and how many steps were placed, spread_lend once the whole balance is offered.
+    """
+    count = len(amounts)
+    if use_numpy and count > 0:
+        rates = numpy.asarray(rates, dtype=numpy.int64)
+        depths = numpy.cumsum(numpy.asarray(amounts, dtype=numpy.int64)) + lower_sum
+    else:
+        depths = []
+        for amount in amounts:
+            lower_sum += amount
+            depths.append(lower_sum)
+
+    # step s needs depth > active_plus_lended * (gap_bottom * spread_lend + gap_step * s) / (spread_lend * PERCENT)
+    gap_step = gap_top - gap_bottom
+    thresholds = [min(active_plus_lended * (gap_bottom * spread_lend + gap_step * step) // (spread_lend * PERCENT),
+                      MAX_THRESHOLD) for step in range(spread_steps, spread_lend)]
+    if use_numpy and count > 0:
+        first_above_min = int(numpy.searchsorted(rates, min_rate, side='right'))
+        first_deep_enough = numpy.searchsorted(depths, numpy.asarray(thresholds, dtype=numpy.int64), side='right')
+    else:
+        first_above_min = bisect_right(rates, min_rate)
+        first_deep_enough = [bisect_right(depths, threshold) for threshold in thresholds]
+
+    offers = []
+    walked = count if spread_steps < spread_lend else 0
+    start = first_above_min
+    first_step = spread_steps
+    while spread_steps < spread_lend:
+        index = max(int(first_deep_enough[spread_steps - first_step]), start)
+        if index >= count:
+            break
+        depth = int(depths[index]) * spread_lend  # times spread_lend, so each step adds active_bal
+        steps = 1
+        while spread_steps + steps < spread_lend and (depth + steps * active_bal) * PERCENT > active_plus_lended * (
+                gap_bottom * spread_lend + gap_step * (spread_steps + steps)):
+            steps += 1
+        spread_steps += steps
+        if spread_steps == spread_lend:
+            amount = active_bal - lent
+            walked = index + 1
+        else:
+            amount = divide_half_even(steps * active_bal, spread_lend)
+        lent += amount
+        offers.append((amount, int(rates[index])))
+        start = index + 1
+    return offers, walked, spread_steps
+
+
+def divide_half_even(dividend, divisor):
+    """dividend / divisor rounded to a whole number like Decimal.quantize rounds, half to even."""
+    quotient, remainder = divmod(dividend, divisor)
+    if remainder * 2 > divisor or remainder * 2 == divisor and quotient % 2 == 1:
+        quotient += 1
+    return quotient
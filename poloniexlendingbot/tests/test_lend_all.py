@@ -0,0 +1,176 @@
+# coding=utf-8
+"""
+Checks how lend_all replaces our open offers, with the exchange, the books and the other modules faked.
+Run from the poloniexlendingbot folder with: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from collections import OrderedDict
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+import Lending  # noqa: E402
+
+
+class FakeApi(object):
+    def __init__(self, lending, open_offers):
+        self.lending = OrderedDict(lending)  # lend_all goes through the currencies in this order
+        self.open_offers = open_offers
+        self.cancelled = []
+        self.created = []
+
+    def return_available_account_balances(self, account):
+        return {'lending': OrderedDict(self.lending)}
+
+    def return_open_loan_offers(self):
+        return self.open_offers
+
+    def cancel_loan_offer(self, currency, order_number):
+        self.cancelled.append((currency, order_number))
+        return {'success': 1, 'message': 'Loan offer canceled.'}
+
+    def create_loan_offer(self, currency, amount, days, auto_renew, rate):
+        self.created.append((currency, amount, days, rate))
+        return {'success': 1, 'message': 'Loan order placed.'}
+
+
+class FakeBooks(object):
+    """Serves books cut to the limit asked for, raising the ones that are exceptions."""
+    def __init__(self, books):
+        self.books = books
+        self.limits = []
+
+    def prefetch(self, limits):
+        pass
+
+    def get(self, currency, limit=0):
+        if isinstance(self.books[currency], Exception):
+            raise self.books[currency]
+        self.limits.append(limit)
+        book = self.books[currency]
+        return {'offers': book['offers'][:limit] if limit > 0 else book['offers'], 'demands': book['demands']}
+
+    def forget(self, currency):
+        pass
+
+
+class FakeLog(object):
+    def __init__(self):
+        self.messages = []
+        self.errors = []
+
+    def log(self, msg):
+        self.messages.append(msg)
+
+    def log_error(self, msg):
+        self.errors.append(msg)
+
+    def offer(self, amt, cur, rate, days, msg):
+        pass
+
+    def cancelOrders(self, cur, msg):
+        pass
+
+    def updateStatusValue(self, cur, key, value):
+        pass
+
+
+class FakeData(object):
+    @staticmethod
+    def get_total_lended():
+        return {}, Decimal(0)
+
+
+class FakeMaxToLend(object):
+    @staticmethod
+    def amount_to_lend(active_cur_test_balance, active_cur, lending_balance, low_rate):
+        return lending_balance
+
+
+def open_offer(number, rate, amount):
+    return {'id': number, 'rate': rate, 'amount': amount, 'duration': 2, 'autoRenew': 0, 'date': '2017-01-01 00:00:00'}
+
+
+def book(*offers):
+    return {'offers': [{'rate': rate, 'amount': amount, 'rangeMin': 2, 'rangeMax': 2} for rate, amount in offers],
+            'demands': []}
+
+
+class LendAllTest(unittest.TestCase):
+    settings = dict(spread_lend=1, gap_bottom=Decimal(0), gap_top=Decimal(0), min_loan_size=Decimal('0.001'),
+                    min_daily_rate=Decimal('0.00005'), max_daily_rate=Decimal('0.02'), xday_threshold=Decimal(0),
+                    xdays='2', dry_run=False, coin_cfg={}, hide_coins=True, keep_stuck_orders=True,
+                    offer_concurrency=1, offer_rate_tolerance=Decimal(0), offer_amount_tolerance=Decimal(0),
+                    Analysis=None, Data=FakeData, MaxToLend=FakeMaxToLend, defaultLoanOrdersRequestLimit=2,
+                    sleep_time_active=60, sleep_time_inactive=300)
+
+    def setUp(self):
+        names = list(self.settings) + ['api', 'log', 'loan_books', 'Config', 'own_offers', 'offer_batch',
+                                       'loanOrdersRequestLimit']
+        self.previous = dict((name, getattr(Lending, name)) for name in names)
+        for name, value in self.settings.items():
+            setattr(Lending, name, value)
+        Lending.Config = type('Config', (object,), {'has_option': staticmethod(lambda category, option: False)})
+        Lending.log = self.log = FakeLog()
+        Lending.loanOrdersRequestLimit = {}
+
+    def tearDown(self):
+        for name, value in self.previous.items():
+            setattr(Lending, name, value)
+
+    def lend_all(self, lending, open_offers, books):
+        Lending.api = self.api = FakeApi(lending, open_offers)
+        Lending.loan_books = FakeBooks(books)
+        Lending.lend_all()
+
+    def test_failed_currency_keeps_its_offers(self):
+        error = IOError('book unavailable')
+        books = {'BTC': book(('0.00100000', '1.0')), 'ETH': error, 'LTC': book(('0.00100000', '1.0'))}
+        open_offers = dict((cur, [open_offer(cur + '1', '0.00080000', '1.0')]) for cur in books)
+
+        with self.assertRaises(IOError) as raised:
+            self.lend_all([('BTC', '0'), ('ETH', '0'), ('LTC', '0')], open_offers, books)
+        self.assertIs(raised.exception, error)
+
+        # only BTC, which was done before ETH failed, has its offer replaced
+        self.assertEqual(self.api.cancelled, [('BTC', 'BTC1')])
+        self.assertEqual([offer[0] for offer in self.api.created], ['BTC'])
+
+    def test_replace_error_does_not_hide_lend_error(self):
+        def failing_create(currency, amount, days, auto_renew, rate):
+            raise ValueError('create failed')
+
+        Lending.api = self.api = FakeApi([('BTC', '1.0'), ('ETH', '1.0')], {})
+        self.api.create_loan_offer = failing_create
+        Lending.loan_books = FakeBooks({'BTC': book(('0.00100000', '1.0')), 'ETH': IOError('book unavailable')})
+        with self.assertRaises(IOError):
+            Lending.lend_all()
+        self.assertEqual(len(self.log.errors), 1)
+
+    def test_book_of_only_own_offers(self):
+        # the book holds nothing but our open offer, which is taken out before the spread walk
+        self.lend_all([('BTC', '0')], {'BTC': [open_offer('BTC1', '0.00080000', '1.0')]},
+                      {'BTC': book(('0.00080000', '1.0'))})
+        self.assertEqual(self.api.cancelled, [('BTC', 'BTC1')])
+        self.assertEqual(self.api.created, [('BTC', '1.00000000', '2', '0.01999900')])
+
+    def test_cut_off_book_is_walked_on(self):
+        # the balance is spread only once the book is three times as deep as the balance, past the first fetch
+        Lending.gap_bottom = Decimal(300)
+        books = {'BTC': book(*[('0.000%d0000' % (i + 1), '1.0') for i in range(6)])}
+        self.lend_all([('BTC', '1.0')], {}, books)
+        self.assertEqual(Lending.loan_books.limits, [2, 4])
+        self.assertEqual(self.api.created, [('BTC', '1.00000000', '2', '0.00039900')])
+        self.assertEqual(Lending.loanOrdersRequestLimit['BTC'], 8)
+        self.assertTrue(any('Not enough offers in response' in msg for msg in self.log.messages))
+
+    def test_whole_book_is_not_reported_cut_off(self):
+        Lending.gap_bottom = Decimal(300)
+        self.lend_all([('BTC', '1.0')], {}, {'BTC': book(('0.00010000', '1.0'))})
+        self.assertEqual(self.api.created, [('BTC', '1.00000000', '2', '0.01999900')])
+        self.assertFalse(any('Not enough offers in response' in msg for msg in self.log.messages))
+
+
+if __name__ == '__main__':
+    unittest.main()
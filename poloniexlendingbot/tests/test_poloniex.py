@@ -0,0 +1,49 @@
+# coding=utf-8
+"""
+Checks how the Poloniex api wrapper reads answers, with a fake exchange in place of urllib2.
+Run from the poloniexlendingbot folder with: python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+import Poloniex  # noqa: E402
+from RateLimiter import RequestScheduler  # noqa: E402
+
+
+class Response(object):
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return json.dumps(self.data)
+
+
+class FakePoloniex(Poloniex.Poloniex):
+    """Answers every request with the next of answers."""
+    def __init__(self, answers):
+        Poloniex.Poloniex.__init__(self, 'key', 'secret', RequestScheduler(1000, 1000))
+        self.answers = list(answers)
+        self.requests = []
+
+    def _urlopen(self, request):
+        self.requests.append(request)
+        return Response(self.answers.pop(0))
+
+
+class AvailableAccountBalancesTest(unittest.TestCase):
+    def test_empty_account(self):
+        # an empty dict comes back as a list, and an account without balances is left out
+        self.assertEqual(FakePoloniex([[]]).return_available_account_balances('lending'), {'lending': {}})
+        self.assertEqual(FakePoloniex([{'exchange': {'BTC': '1.0'}}]).return_available_account_balances('lending'),
+                         {'exchange': {'BTC': '1.0'}, 'lending': {}})
+
+    def test_balances(self):
+        balances = {'lending': {'BTC': '0.5', 'ETH': '2.0'}}
+        self.assertEqual(FakePoloniex([balances]).return_available_account_balances('lending'), balances)
+
+
+if __name__ == '__main__':
+    unittest.main()
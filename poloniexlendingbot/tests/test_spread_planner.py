@@ -0,0 +1,114 @@
+# coding=utf-8
+"""
+Checks plan_spread against the offer by offer spread walk it replaced, with numpy and with the bisect fallback.
+Run from the poloniexlendingbot folder with: python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+import SpreadPlanner  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def walk_offers(rates, amounts, active_bal, active_plus_lended, min_rate, spread_lend, gap_bottom, gap_top,
+                lower_sum=0, spread_steps=0, lent=0):
+    """The walk of SpreadWalker before plan_spread, returning the offers it made like plan_spread does."""
+    offers = []
+    walked = 0
+    gap_base = gap_bottom * spread_lend
+    gap_step = gap_top - gap_bottom
+    for rate, amount in zip(rates, amounts):
+        if spread_steps == spread_lend:
+            break
+        lower_sum += amount
+        upper_sum = lower_sum * spread_lend
+        steps = 0
+        while True:
+            if upper_sum * SpreadPlanner.PERCENT > active_plus_lended * (gap_base + gap_step * spread_steps) and \
+                    rate > min_rate:
+                spread_steps += 1
+                upper_sum += active_bal
+                steps += 1
+            else:
+                sum_diff = SpreadPlanner.divide_half_even(steps * active_bal, spread_lend)
+                if steps > 0:  # the walk offered nothing here, create_lend_offer dropped the empty offer
+                    offers.append((sum_diff, rate))
+                lent += sum_diff
+                break
+            if spread_steps == spread_lend:
+                offers.append((active_bal - lent, rate))
+                lent = active_bal
+                break
+        walked += 1
+    return offers, walked, spread_steps
+
+
+def random_plan(rnd):
+    """A random book in satoshis and the other arguments of plan_spread."""
+    count = rnd.randint(0, 80)
+    rate = rnd.randint(1000, 100000)
+    rates = []
+    for i in range(count):
+        rate += rnd.choice([0, 0, rnd.randint(1, 2000)])  # offers often share a rate
+        rates.append(rate)
+    amounts = [rnd.choice([1, rnd.randint(1, 10 ** 6), rnd.randint(1, 5 * 10 ** 8)]) for i in range(count)]
+    active_bal = rnd.randint(10 ** 5, 2 * 10 ** 9)
+    active_plus_lended = active_bal + rnd.choice([0, rnd.randint(0, 5 * 10 ** 8)])
+    min_rate = rnd.choice([0, rnd.randint(1000, 100000)])
+    spread_lend = rnd.randint(1, 20)
+    gap_bottom = rnd.choice([0, 10, 12.5, 50, 400]) * 10 ** 8
+    gap_top = rnd.choice([0, 100, 200, 333.3, 1000]) * 10 ** 8
+    return rates, amounts, active_bal, active_plus_lended, min_rate, spread_lend, int(gap_bottom), int(gap_top)
+
+
+class PlanSpreadTest(unittest.TestCase):
+    def setUp(self):
+        self.use_numpy = SpreadPlanner.use_numpy
+
+    def tearDown(self):
+        SpreadPlanner.use_numpy = self.use_numpy
+
+    def check_plans(self, as_array):
+        rnd = random.Random(25)
+        for trial in range(3000):
+            rates, amounts, active_bal, active_plus_lended, min_rate, spread_lend, gap_bottom, gap_top = \
+                random_plan(rnd)
+            args = (active_bal, active_plus_lended, min_rate, spread_lend, gap_bottom, gap_top)
+            self.assertEqual(SpreadPlanner.plan_spread(as_array(rates), as_array(amounts), *args),
+                             walk_offers(rates, amounts, *args))
+
+            # carry on from a walk of the first part of the book, like a book fetched again with a larger limit
+            split = rnd.randint(0, len(rates))
+            first = walk_offers(rates[:split], amounts[:split], *args)
+            carried = dict(lower_sum=sum(amounts[:first[1]]), spread_steps=first[2],
+                           lent=sum(amount for amount, rate in first[0]))
+            self.assertEqual(SpreadPlanner.plan_spread(as_array(rates[split:]), as_array(amounts[split:]), *args,
+                                                       **carried),
+                             walk_offers(rates[split:], amounts[split:], *args, **carried))
+
+    def test_bisect(self):
+        SpreadPlanner.use_numpy = False
+        self.check_plans(list)
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy(self):
+        SpreadPlanner.use_numpy = True
+        self.check_plans(lambda values: numpy.array(values, dtype=numpy.int64))
+
+    def test_whole_balance(self):
+        SpreadPlanner.use_numpy = False
+        offers, walked, spread_steps = SpreadPlanner.plan_spread([1000, 2000, 3000], [10 ** 8] * 3, 3 * 10 ** 8,
+                                                                 3 * 10 ** 8, 0, 3, 0, 100 * 10 ** 8)
+        self.assertEqual(spread_steps, 3)
+        self.assertEqual(sum(amount for amount, rate in offers), 3 * 10 ** 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
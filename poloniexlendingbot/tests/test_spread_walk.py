@@ -0,0 +1,150 @@
+# coding=utf-8
+"""
+Checks the satoshi spread walk of Lending against the Decimal walk it replaced, on random loan books.
+Run from the poloniexlendingbot folder with: python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules'))
+import Lending  # noqa: E402
+
+
+class Settings(object):
+    def __init__(self, spread_lend, gap_bottom, gap_top, min_loan_size, xday_threshold, xdays, max_daily_rate):
+        self.spread_lend = spread_lend
+        self.gap_bottom = gap_bottom
+        self.gap_top = gap_top
+        self.min_loan_size = min_loan_size
+        self.xday_threshold = xday_threshold
+        self.xdays = xdays
+        self.max_daily_rate = max_daily_rate
+
+
+class DecimalWalk(object):
+    """The spread walk and offer rounding of Lending before they moved to satoshis, offers kept as (amount, days, rate)."""
+    def __init__(self, settings, active_bal, active_plus_lended, min_rate):
+        self.settings = settings
+        self.active_bal = Decimal(active_bal)
+        self.active_plus_lended = active_plus_lended
+        self.min_rate = min_rate
+        self.lower_sum = Decimal(0)
+        self.spread_steps = 0
+        self.lent = Decimal(0)
+        self.spread_lend = int(settings.spread_lend)
+        while self.active_bal < (self.spread_lend * settings.min_loan_size):
+            self.spread_lend -= 1
+        self.step_pct = (settings.gap_top - settings.gap_bottom) / self.spread_lend
+        self.offers = []
+
+    def done(self):
+        return self.spread_steps == self.spread_lend
+
+    def walk(self, offers):
+        for offer in offers:
+            if self.done():
+                break
+            self.lower_sum += Decimal(offer['amount'])
+            upper_sum = self.lower_sum
+            while True:
+                sum_diff = upper_sum - self.lower_sum
+                gap_multiplier = self.settings.gap_bottom / 100 + (self.step_pct / 100 * self.spread_steps)
+                if upper_sum > self.active_plus_lended * gap_multiplier and Decimal(offer['rate']) > self.min_rate:
+                    self.spread_steps += 1
+                    upper_sum += self.active_bal / self.spread_lend
+                else:
+                    self.offer(sum_diff, offer['rate'])
+                    self.lent += sum_diff.quantize(Lending.SATOSHI)
+                    break
+                if self.done():
+                    self.offer(self.active_bal - self.lent, offer['rate'])
+                    break
+        return self.done()
+
+    def finish(self, rate):
+        self.offer(self.active_bal - self.lent, rate)
+        self.spread_steps = self.spread_lend
+
+    def offer(self, amt, rate):
+        days = '2'
+        if float(amt) > self.settings.min_loan_size:
+            if float(rate) > 0.0001:
+                rate = float(rate) - 0.000001
+            amt = "%.8f" % Decimal(amt)
+            if float(rate) > self.settings.xday_threshold:
+                days = self.settings.xdays
+            self.offers.append((amt, days, "%.8f" % float(rate)))
+
+
+def random_book(rnd):
+    base = rnd.uniform(0.00001, 0.001)
+    offers = [{'rate': '%.8f' % (base + i * rnd.uniform(0, 0.00002)), 'amount': '%.8f' % rnd.uniform(0.0001, 3)}
+              for i in range(rnd.randint(1, 60))]
+    offers.sort(key=lambda o: float(o['rate']))
+    return offers
+
+
+def random_settings(rnd):
+    return Settings(rnd.randint(1, 20), Decimal(rnd.choice(['0', '10', '12.5', '50'])),
+                    Decimal(rnd.choice(['100', '200', '333.3', '1000'])), Decimal('0.001'), Decimal('0.0005'), '60',
+                    Decimal('0.05'))
+
+
+class SpreadWalkTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = dict((name, getattr(Lending, name)) for name in [
+            'spread_lend', 'gap_bottom', 'gap_top', 'min_loan_size', 'xday_threshold', 'xdays', 'Config', 'dry_run',
+            'offer_batch'])
+        Lending.Config = type('Config', (object,), {'has_option': staticmethod(lambda category, option: False)})
+        Lending.dry_run = False
+
+    def tearDown(self):
+        for name, value in self.previous.items():
+            setattr(Lending, name, value)
+
+    def satoshi_walk(self, settings, offers, active_bal, active_plus_lended, min_rate):
+        for name in ['spread_lend', 'gap_bottom', 'gap_top', 'min_loan_size', 'xday_threshold', 'xdays']:
+            setattr(Lending, name, getattr(settings, name))
+        Lending.offer_batch = []
+        rates, amounts = Lending.parse_offers(offers)
+        walker = Lending.SpreadWalker('BTC', active_bal, active_plus_lended, min_rate)
+        if not walker.walk(rates, amounts):
+            walker.finish(Lending.to_satoshis(settings.max_daily_rate))
+        return [(amount, days, rate) for currency, amount, days, rate in Lending.offer_batch]
+
+    def test_matches_decimal_walk(self):
+        rnd = random.Random(24)
+        for trial in range(1000):
+            settings = random_settings(rnd)
+            offers = random_book(rnd)
+            active_bal = Decimal('%.8f' % rnd.uniform(0.002, 20))
+            active_plus_lended = active_bal + (Decimal('%.8f' % rnd.uniform(0, 5)) if rnd.random() < 0.5 else 0)
+            min_rate = Decimal('%.8f' % rnd.uniform(0.00003, 0.0005))
+
+            expected = DecimalWalk(settings, active_bal, active_plus_lended, min_rate)
+            if not expected.walk(offers):
+                expected.finish(settings.max_daily_rate)
+            offered = self.satoshi_walk(settings, offers, active_bal, active_plus_lended, min_rate)
+
+            self.assertEqual([(days, rate) for amount, days, rate in offered],
+                             [(days, rate) for amount, days, rate in expected.offers])
+            for (amount, days, rate), (expected_amount, expected_days, expected_rate) in zip(offered, expected.offers):
+                # the Decimal walk formatted amounts through float, which can be a satoshi off
+                self.assertLessEqual(abs(Lending.to_satoshis(amount) - Lending.to_satoshis(expected_amount)), 1)
+            self.assertLessEqual(sum(Lending.to_satoshis(amount) for amount, days, rate in offered),
+                                 Lending.to_satoshis(active_bal))
+
+    def test_satoshis(self):
+        self.assertEqual(Lending.to_satoshis('1.23456789'), 123456789)
+        self.assertEqual(Lending.to_satoshis(Decimal('0.000000019')), 1)
+        self.assertEqual(Lending.from_satoshis(123456789), '1.23456789')
+        self.assertEqual(Lending.from_satoshis(5), '0.00000005')
+        self.assertEqual(Lending.from_satoshis(-5), '-0.00000005')
+        self.assertEqual(Lending.from_satoshis(-123456789), '-1.23456789')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+from argparse import ArgumentParser
+
+from trading import ParameterSweep, load_candles, load_trade_history
+from trading.sweep import sweep_fields, report
+
+from backtest import parse_date
+import tradingbot
+
+
+# a comma separated list of values, or start:stop:step with stop included
+def parse_range(value):
+    if ':' in value:
+        start, stop, step = [float(v) for v in value.split(':')]
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 10) for i in range(count)]
+    return [float(v) for v in value.split(',')]
+
+
+# backtests every combination of the given settings on the pairs of config.cfg and prints the best ones per pair
+def main():
+    parser = ArgumentParser(description='Find the best pair settings on recorded candles')
+    for field, (key, scale) in sorted(sweep_fields.items()):
+        parser.add_argument('--' + key, help='values to try, as 1,2,3 or 1:3:0.5 (defaults to the config value)')
+    parser.add_argument('--pairs', help='comma separated pairs to sweep, defaults to all pairs in config.cfg')
+    parser.add_argument('--processes', type=int, help='number of processes, defaults to the number of cpus')
+    parser.add_argument('--top', type=int, default=10, help='number of results to show per pair')
+    parser.add_argument('--start', help='first day to trade (YYYY-MM-DD, UTC)')
+    parser.add_argument('--end', help='day to stop trading (YYYY-MM-DD, UTC)')
+    args = parser.parse_args()
+
+    tradingbot.load_config()
+    currencies = tradingbot.trade_currencies
+    if args.pairs:
+        currencies = [tc for tc in currencies if tc.currency_pair in args.pairs.split(',')]
+
+    ranges = {}
+    for field, (key, scale) in sweep_fields.items():
+        if getattr(args, key) is not None:
+            ranges[field] = parse_range(getattr(args, key))
+
+    sweep = ParameterSweep(load_candles(tradingbot.simulator_data_dir), tradingbot.simulator_balances, currencies,
+                           ranges, trade_history=load_trade_history(tradingbot.simulator_data_dir),
+                           processes=args.processes, start=parse_date(args.start), end=parse_date(args.end),
+                           update_interval=tradingbot.update_interval, fee=tradingbot.simulator_fee,
+                           spread=tradingbot.simulator_spread, order_timeout=tradingbot.order_timeout,
+                           history_max_orders=tradingbot.history_max_orders,
+                           history_max_age=tradingbot.history_max_age)
+    print(str(len(sweep.combinations()) * len(sweep.currencies)) + ' backtests on ' + str(sweep.processes) +
+          ' processes')
+    print(report(sweep.run(), args.top))
+
+
+if __name__ == '__main__':
+    main()
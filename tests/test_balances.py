@@ -0,0 +1,145 @@
+"""
+Checks that BalanceService downloads the balances once per ttl, takes what orders reserve off the shared balances and
+credits their fills, so that pairs with the same main currency can not spend the same balance twice.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import Poloniex, BalanceService, Order, OrderStatus, SimulatedClock, clock  # noqa: E402
+
+
+class BalancePoloniex(Poloniex):
+    def __init__(self, balances):
+        Poloniex.__init__(self, '', '')
+        self.balances = balances
+        self.downloads = 0
+
+    def returnBalances(self):
+        self.downloads += 1
+        return dict(self.balances)
+
+
+def trade(type, rate, amount, fee=0.0025):
+    return Order({'type': type, 'orderNumber': '1', 'rate': rate, 'amount': amount, 'total': rate * amount,
+                  'fee': fee}, 'BTC_LTC')
+
+
+class BalanceServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = SimulatedClock(1500000000)
+        self.previous_clock = clock.set_clock(self.clock)
+        self.poloniex = BalancePoloniex({'BTC': '1.0', 'LTC': '20.0'})
+
+    def tearDown(self):
+        clock.set_clock(self.previous_clock)
+
+    def test_snapshot_ttl(self):
+        balances = BalanceService(self.poloniex, ttl=60)
+        self.assertEqual(balances.snapshot(), {'BTC': 1.0, 'LTC': 20.0})
+        self.clock.advance(59)
+        self.assertEqual(balances.get('BTC'), 1.0)
+        self.assertEqual(balances.get('ETH'), 0.0)
+        self.assertEqual(self.poloniex.downloads, 1)
+
+        self.poloniex.balances['BTC'] = '0.5'
+        self.clock.advance(1)
+        self.assertEqual(balances.get('BTC'), 0.5)
+        self.assertEqual(self.poloniex.downloads, 2)
+
+        # without a ttl every call downloads
+        balances = BalanceService(self.poloniex)
+        balances.get('BTC')
+        balances.get('BTC')
+        self.assertEqual(self.poloniex.downloads, 4)
+
+    def test_snapshot_is_a_copy(self):
+        balances = BalanceService(self.poloniex, ttl=60)
+        balances.snapshot()['BTC'] = 0.0
+        self.assertEqual(balances.get('BTC'), 1.0)
+
+    def test_error(self):
+        self.poloniex.balances = {'error': 'Invalid API key/secret pair.'}
+        balances = BalanceService(self.poloniex, ttl=60)
+        with self.assertRaises(RuntimeError):
+            balances.snapshot()
+
+    def test_reserve(self):
+        balances = BalanceService(self.poloniex, ttl=60)
+        balances.reserve('BTC_LTC', 'buy', 0.01, 10)
+        self.assertIsNone(balances._balances)  # nothing to reserve from before the first snapshot
+
+        balances.snapshot()
+        balances.reserve('BTC_LTC', 'buy', 0.01, 10)
+        self.assertAlmostEqual(balances.get('BTC'), 0.9)
+        self.assertEqual(balances.get('LTC'), 20.0)
+
+        balances.reserve('BTC_LTC', 'sell', 0.01, 5)
+        self.assertAlmostEqual(balances.get('BTC'), 0.9)
+        self.assertEqual(balances.get('LTC'), 15.0)
+
+        # another pair with the same main currency sees what the first one reserved
+        balances.reserve('BTC_ETH', 'buy', 0.05, 2)
+        self.assertAlmostEqual(balances.get('BTC'), 0.8)
+        self.assertEqual(balances.get('ETH'), 0.0)
+
+        # the reservations last until the next download
+        self.clock.advance(60)
+        self.assertEqual(balances.get('BTC'), 1.0)
+        self.assertEqual(balances.get('LTC'), 20.0)
+
+    def test_apply_order(self):
+        balances = BalanceService(self.poloniex, ttl=60)
+        balances.snapshot()
+
+        balances.reserve('BTC_LTC', 'buy', 0.01, 10)
+        status = OrderStatus('1', 10, trades=[trade('buy', 0.01, 4), trade('buy', 0.01, 6)])
+        balances.apply_order('BTC_LTC', 'buy', status)
+        self.assertAlmostEqual(balances.get('BTC'), 0.9)
+        self.assertAlmostEqual(balances.get('LTC'), 20.0 + 10 * 0.9975)
+
+        balances.reserve('BTC_LTC', 'sell', 0.02, 5)
+        status = OrderStatus('2', 5, trades=[trade('sell', 0.02, 5, fee=0.0015)])
+        balances.apply_order('BTC_LTC', 'sell', status)
+        self.assertAlmostEqual(balances.get('BTC'), 0.9 + 0.1 * 0.9985)
+        self.assertAlmostEqual(balances.get('LTC'), 15.0 + 10 * 0.9975)
+
+    def test_invalidate(self):
+        balances = BalanceService(self.poloniex, ttl=60)
+        balances.snapshot()
+        balances.reserve('BTC_LTC', 'buy', 0.01, 10)
+        balances.invalidate()
+        balances.apply_order('BTC_LTC', 'buy', OrderStatus('1', 10, trades=[trade('buy', 0.01, 10)]))
+        self.assertEqual(balances.get('BTC'), 1.0)
+        self.assertEqual(balances.get('LTC'), 20.0)
+        self.assertEqual(self.poloniex.downloads, 2)
+
+    def test_threads_never_overspend(self):
+        balances = BalanceService(self.poloniex, ttl=60)
+        balances.snapshot()
+        bought = []
+        start = threading.Barrier(8)
+
+        def buy():
+            start.wait()
+            for i in range(50):
+                with balances.lock:
+                    if balances.get('BTC') >= 0.0625:
+                        balances.reserve('BTC_LTC', 'buy', 0.125, 0.5)
+                        bought.append(0.0625)
+
+        threads = [threading.Thread(target=buy) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(bought), 16)
+        self.assertEqual(balances.get('BTC'), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Checks that CandleStore only downloads the candles it does not have, and CandleEma over it against ema().
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import calendar
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import Poloniex, CandleStore, SimulatedClock, clock  # noqa: E402
+from trading.indicators import CandleEma, ema  # noqa: E402
+
+START = 1500000000 - 1500000000 % 300
+
+
+# 5 minute candles up to the clock, the newest one still open and changing until its period is over
+class ChartPoloniex(Poloniex):
+    def __init__(self, seed=1):
+        Poloniex.__init__(self, '', '')
+        self.rnd = random.Random(seed)
+        self.averages = {}
+        self.starts = []
+
+    def average(self, date):
+        if date not in self.averages or date + 300 > clock.time():
+            self.averages[date] = self.rnd.uniform(0.01, 0.02)
+        return self.averages[date]
+
+    def returnChartData(self, currencyPair, period=300, start=None, end=None):
+        first = calendar.timegm(start.timetuple())
+        self.starts.append(first)
+        dates = range(START - 16 * 3600, int(clock.time()) + 1, period)
+        candles = [{'date': date, 'weightedAverage': self.average(date)} for date in dates if date >= first]
+        return candles if len(candles) > 0 else [{'date': 0, 'weightedAverage': 0}]
+
+
+class CandleStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = SimulatedClock(START)
+        self.previous_clock = clock.set_clock(self.clock)
+        self.poloniex = ChartPoloniex()
+        self.candles = CandleStore(self.poloniex, 'BTC_LTC', period=300, hours=16)
+
+    def tearDown(self):
+        clock.set_clock(self.previous_clock)
+
+    def test_first_update_downloads_the_window(self):
+        self.assertEqual(self.candles.update(), 16 * 12 + 1)
+        self.assertEqual(self.poloniex.starts, [START - 16 * 3600])
+        self.assertEqual(self.candles.last_date(), START)
+
+    def test_later_updates_download_from_the_newest_candle(self):
+        self.candles.update()
+        self.clock.advance(600)
+        self.assertEqual(self.candles.update(), 2)
+        self.assertEqual(self.poloniex.starts[-1], START)
+        self.assertEqual(self.candles.last_date(), START + 600)
+
+        # nothing new: the open candle is downloaded again and updated in place
+        self.clock.advance(100)
+        self.assertEqual(self.candles.update(), 0)
+        self.assertEqual(self.candles.weighted_averages[-1], self.poloniex.averages[START + 600])
+
+    def test_old_candles_are_evicted(self):
+        self.candles.update()
+        self.clock.advance(3600)
+        self.candles.update()
+        self.assertEqual(len(self.candles), 16 * 12 + 1)
+        self.assertEqual(self.candles.dates[0], START + 3600 - 16 * 3600)
+        self.assertEqual(list(self.candles.dates), sorted(set(self.candles.dates)))
+
+    def test_no_candles(self):
+        self.poloniex.returnChartData = lambda **kwargs: [{'date': 0, 'weightedAverage': 0}]
+        self.assertEqual(self.candles.update(), 0)
+        self.assertEqual(len(self.candles), 0)
+
+    def test_error(self):
+        self.poloniex.returnChartData = lambda **kwargs: {'error': 'Invalid currency pair.'}
+        with self.assertRaises(RuntimeError):
+            self.candles.update()
+
+    def test_candle_ema(self):
+        emas = [CandleEma(2), CandleEma(4)]
+        for step in range(40):
+            self.candles.update()
+            values = list(self.candles.weighted_averages)
+            for divisor, candle_ema in zip([2, 4], emas):
+                self.assertAlmostEqual(candle_ema.update(self.candles), ema(values, int(len(values) / divisor)),
+                                       places=12)
+            self.clock.advance(self.poloniex.rnd.choice([60, 300, 900]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Checks when ConnectionPool sends a request again on a new connection, with connections that fail on demand.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import errno
+import os
+import socket
+import sys
+import unittest
+import zlib
+from http.client import RemoteDisconnected
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import connection_pool  # noqa: E402
+from trading.connection_pool import ConnectionPool  # noqa: E402
+
+
+class FakeResponse:
+    status = 200
+    will_close = False
+
+    def __init__(self, data, headers=None):
+        self.data = data
+        self.headers = headers if headers is not None else {}
+
+    def read(self):
+        return self.data
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+
+# a connection that fails with the errors it was given, on sending or on reading the response
+class FakeConnection:
+    sends = []  # (connection, method, path) of every request sent on any connection
+    created = 0
+
+    def __init__(self, host, timeout=None, send_error=None, response_error=None, response=None):
+        self.host = host
+        self.timeout = timeout
+        self.sock = None
+        self.send_error = send_error
+        self.response_error = response_error
+        self.response = response if response is not None else FakeResponse(b'{}')
+        self.closed = False
+        FakeConnection.created += 1
+
+    def request(self, method, path, body=None, headers=None):
+        if self.send_error is not None:
+            raise self.send_error
+        FakeConnection.sends.append((self, method, path))
+
+    def getresponse(self):
+        if self.response_error is not None:
+            raise self.response_error
+        return self.response
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.previous_connection = connection_pool.HTTPSConnection
+        connection_pool.HTTPSConnection = FakeConnection
+        FakeConnection.sends = []
+        FakeConnection.created = 0
+        self.pool = ConnectionPool('poloniex.com', size=2, timeout=5.0)
+
+    def tearDown(self):
+        connection_pool.HTTPSConnection = self.previous_connection
+
+    # an idle connection as if it had been used for an earlier request
+    def idle(self, **kwargs):
+        connection = FakeConnection('poloniex.com', **kwargs)
+        self.pool._idle.put(connection)
+        FakeConnection.created = 0
+        return connection
+
+    def test_read_timeout_is_not_sent_again(self):
+        stale = self.idle(response_error=socket.timeout('timed out'))
+        with self.assertRaises(socket.timeout):
+            self.pool.request('POST', '/tradingApi', b'command=buy')
+        self.assertEqual(len(FakeConnection.sends), 1)
+        self.assertEqual(FakeConnection.created, 0)
+        self.assertTrue(stale.closed)
+        self.assertTrue(self.pool._idle.empty())
+
+    def test_reset_while_reading_is_not_sent_again(self):
+        self.idle(response_error=ConnectionResetError(errno.ECONNRESET, 'reset'))
+        with self.assertRaises(ConnectionResetError):
+            self.pool.request('POST', '/tradingApi', b'command=buy')
+        self.assertEqual(len(FakeConnection.sends), 1)
+
+    def test_remote_disconnected_is_sent_again(self):
+        stale = self.idle(response_error=RemoteDisconnected('Remote end closed connection without response'))
+        status, data = self.pool.request('POST', '/tradingApi', b'command=buy')
+        self.assertEqual((status, data), (200, b'{}'))
+        self.assertEqual(len(FakeConnection.sends), 2)
+        self.assertEqual(FakeConnection.created, 1)
+        self.assertTrue(stale.closed)
+        self.assertIsNot(self.pool._idle.get_nowait(), stale)
+
+    def test_reset_while_sending_is_sent_again(self):
+        for error in [errno.ECONNRESET, errno.EPIPE, errno.ECONNREFUSED]:
+            FakeConnection.sends = []
+            self.idle(send_error=socket.error(error, os.strerror(error)))
+            self.assertEqual(self.pool.request('GET', '/public?command=returnTicker')[0], 200)
+            self.assertEqual(len(FakeConnection.sends), 1)
+            self.assertEqual(FakeConnection.created, 1)
+            self.pool.close()
+
+    def test_new_connection_is_not_sent_again(self):
+        connection_pool.HTTPSConnection = lambda host, timeout=None: FakeConnection(
+            host, timeout, response_error=RemoteDisconnected('Remote end closed connection without response'))
+        with self.assertRaises(RemoteDisconnected):
+            self.pool.request('POST', '/tradingApi', b'command=buy')
+        self.assertEqual(FakeConnection.created, 1)
+
+    def test_reuses_connections(self):
+        self.pool.request('GET', '/public?command=returnTicker')
+        self.pool.request('GET', '/public?command=returnTicker')
+        self.assertEqual(FakeConnection.created, 1)
+        self.assertIs(FakeConnection.sends[0][0], FakeConnection.sends[1][0])
+
+    def test_gzip(self):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        data = compressor.compress(b'{"BTC": "1.0"}') + compressor.flush()
+        self.idle(response=FakeResponse(data, {'Content-Encoding': 'gzip'}))
+        self.assertEqual(self.pool.request('POST', '/tradingApi', b'command=returnBalances'), (200, b'{"BTC": "1.0"}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Checks StreamingEma and CandleEma against ema() over the samples they are meant to cover.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import indicators  # noqa: E402
+from trading.indicators import StreamingEma, ema  # noqa: E402
+
+
+class StreamingEmaTest(unittest.TestCase):
+    def setUp(self):
+        self.use_numpy = indicators.use_numpy
+
+    def tearDown(self):
+        indicators.use_numpy = self.use_numpy
+
+    def check_pushes(self, max_samples, count=200, seed=3):
+        rnd = random.Random(seed)
+        streaming = StreamingEma(max_samples=max_samples)
+        data = []
+        for i in range(count):
+            value = rnd.uniform(0.01, 0.02)
+            data.append(value)
+            streaming.push(value)
+            if rnd.random() < 0.2:
+                data[-1] = rnd.uniform(0.01, 0.02)
+                streaming.replace_last(data[-1])
+            expected = data[-max_samples:] if max_samples > 0 else data
+            self.assertAlmostEqual(streaming.value(), ema(expected), places=12,
+                                   msg='max_samples %d after %d samples' % (max_samples, len(data)))
+        return streaming
+
+    def test_odd_max_samples(self):
+        for max_samples in [1, 3, 5, 7, 25]:
+            self.check_pushes(max_samples)
+
+    def test_even_max_samples(self):
+        for max_samples in [2, 4, 6, 26]:
+            self.check_pushes(max_samples)
+
+    def test_unbounded(self):
+        streaming = self.check_pushes(0, count=120)
+        self.assertEqual(len(streaming), 120)
+        self.assertEqual(streaming.window, 60)
+
+    def test_without_numpy(self):
+        indicators.use_numpy = False
+        self.check_pushes(5)
+        self.check_pushes(0, count=60)
+
+    def test_bound(self):
+        for max_samples in [5, 6]:
+            streaming = StreamingEma(max_samples=max_samples)
+            for i in range(max_samples * 3):
+                streaming.push(float(i))
+                self.assertLessEqual(len(streaming), max_samples)
+            self.assertEqual(streaming.window, max_samples // 2)
+
+    def test_warm_up(self):
+        rnd = random.Random(4)
+        data = [rnd.uniform(1, 2) for i in range(30)]
+        for max_samples in [0, 5, 8]:
+            streaming = StreamingEma(max_samples=max_samples)
+            streaming.warm_up(data[:20])
+            for value in data[20:]:
+                streaming.push(value)
+            expected = data[-max_samples:] if max_samples > 0 else data
+            self.assertAlmostEqual(streaming.value(), ema(expected), places=12)
+
+    def test_fixed_window(self):
+        rnd = random.Random(5)
+        streaming = StreamingEma(4)
+        data = []
+        for i in range(50):
+            data.append(rnd.uniform(1, 2))
+            streaming.push(data[-1])
+            if len(data) >= 8:
+                self.assertAlmostEqual(streaming.value(), ema(data, 4), places=12)
+
+
+if __name__ == '__main__':
+    unittest.main()
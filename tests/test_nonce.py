@@ -0,0 +1,94 @@
+"""
+Checks that NonceAllocator never hands out a nonce twice, across threads and restarts, and which private commands
+the api sends again when the exchange refuses their nonce.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import NonceAllocator, Poloniex, RequestScheduler  # noqa: E402
+
+
+# answers every private request with the error the exchange gives for a nonce that is too low
+class RefusingPoloniex(Poloniex):
+    def __init__(self):
+        Poloniex.__init__(self, 'key', 'secret', rate_limiter=RequestScheduler(1000, 1000))
+        self.commands = []
+
+    def _send(self, method, path, body=None, headers=None, timeout=None):
+        self.commands.append(dict(pair.split('=') for pair in body.decode().split('&'))['command'])
+        return 200, json.dumps({'error': 'Nonce must be greater than 1. You provided 0.'}).encode()
+
+
+class NonceAllocatorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'nonce')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_increasing(self):
+        nonces = NonceAllocator()
+        values = [nonces.next() for i in range(1000)]
+        self.assertEqual(values, sorted(set(values)))
+
+    def test_threads(self):
+        nonces = NonceAllocator(self.path, reserve=100)
+        values = []
+        lock = threading.Lock()
+
+        def allocate():
+            mine = [nonces.next() for i in range(500)]
+            with lock:
+                values.extend(mine)
+
+        threads = [threading.Thread(target=allocate) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(values)), 8 * 500)
+
+    def test_restart_continues_above_reserved(self):
+        nonces = NonceAllocator(self.path, reserve=10 ** 9)
+        last = max(nonces.next() for i in range(10))
+        with open(self.path) as file:
+            reserved = int(file.read())
+        self.assertGreaterEqual(reserved, last + 10 ** 9 - 10)
+
+        # a restart, even with the clock set back, starts above every nonce the last run may have used
+        restarted = NonceAllocator(self.path, reserve=10 ** 9)
+        self.assertGreater(restarted.next(), reserved)
+
+    def test_file_written_once_per_block(self):
+        nonces = NonceAllocator(self.path, reserve=10 ** 9)
+        nonces.next()
+        os.remove(self.path)
+        for i in range(100):
+            nonces.next()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+
+class NonceRetryTest(unittest.TestCase):
+    def test_reads_are_sent_again(self):
+        poloniex = RefusingPoloniex()
+        self.assertIn('error', poloniex.returnBalances())
+        self.assertEqual(poloniex.commands, ['returnBalances'] * 3)
+
+    def test_orders_are_sent_once(self):
+        poloniex = RefusingPoloniex()
+        self.assertIn('error', poloniex.buy('BTC_LTC', 0.01, 1.0))
+        self.assertIn('error', poloniex.cancel('BTC_LTC', '123'))
+        self.assertEqual(poloniex.commands, ['buy', 'cancelOrder'])
+
+
+if __name__ == '__main__':
+    unittest.main()
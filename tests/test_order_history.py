@@ -0,0 +1,122 @@
+"""
+Checks the cursor of OrderHistory: incremental downloads, no trade twice, and orders_since across evictions.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import calendar
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import Poloniex, OrderHistory, SimulatedClock, clock, logger  # noqa: E402
+
+
+# the account trade history of one pair, answering like the exchange with the trades since start, newest first
+class TradeHistoryPoloniex(Poloniex):
+    def __init__(self):
+        Poloniex.__init__(self, '', '')
+        self.trades = []
+        self.starts = []
+
+    def returnAccountTradeHistory(self, currencyPair, start):
+        start = calendar.timegm(start.timetuple())
+        self.starts.append(start)
+        return [trade for trade in reversed(self.trades) if trade['timestamp'] >= start]
+
+    def trade(self, order_number, type='buy', amount=1.0):
+        now = int(clock.time())
+        self.trades.append({'globalTradeID': len(self.trades) + 1, 'orderNumber': order_number, 'type': type,
+                            'rate': '0.01', 'amount': str(amount), 'total': str(amount * 0.01), 'fee': '0.0025',
+                            'date': datetime.utcfromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'), 'timestamp': now})
+
+
+class OrderHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = SimulatedClock(1500000000)
+        self.previous_clock = clock.set_clock(self.clock)
+        self.poloniex = TradeHistoryPoloniex()
+
+    def tearDown(self):
+        clock.set_clock(self.previous_clock)
+
+    def history(self, max_orders=0, max_age=0):
+        return OrderHistory(self.poloniex, 60, 'BTC_LTC', max_orders, max_age)
+
+    def test_downloads_from_the_newest_trade(self):
+        self.clock.advance(-1800)
+        self.poloniex.trade('1')
+        self.clock.advance(1800)
+        history = self.history()
+        self.assertEqual(self.poloniex.starts, [1500000000 - 3600])
+        self.assertEqual(history.total_count, 1)
+
+        self.clock.advance(60)
+        self.poloniex.trade('2')
+        self.poloniex.trade('2')
+        new_orders = history.update()
+        self.assertEqual(self.poloniex.starts[-1], 1500000000 - 1800)
+        self.assertEqual([order.number for order in new_orders], ['2', '2'])
+
+        # trades from the second of the newest one come back again, but are only counted once
+        self.assertEqual(history.update(), [])
+        self.assertEqual(self.poloniex.starts[-1], 1500000060)
+        self.assertEqual(history.total_count, 3)
+        self.assertEqual(len(history.get_order_trades('2')), 2)
+        self.assertEqual(history.get_order('2').number, '2')
+        self.assertIsNone(history.get_order('3'))
+
+    def test_orders_since(self):
+        history = self.history()
+        self.poloniex.trade('1')
+        self.poloniex.trade('2', 'sell')
+        history.update()
+        seen = history.total_count
+        self.assertEqual([order.number for order in history.orders_since(0)], ['1', '2'])
+        self.assertEqual(history.orders_since(seen), [])
+
+        self.clock.advance(1)
+        self.poloniex.trade('3')
+        history.update()
+        self.assertEqual([order.number for order in history.orders_since(seen)], ['3'])
+
+    def test_orders_since_after_eviction(self):
+        history = self.history(max_orders=3)
+        seen = 0
+        numbers = []
+        for i in range(10):
+            self.clock.advance(1)
+            self.poloniex.trade(str(i))
+            self.poloniex.trade(str(i))
+            history.update()
+            numbers.extend(order.number for order in history.orders_since(seen))
+            seen = history.total_count
+            self.assertLessEqual(len(history.orders), 3)
+        # every trade was handed out once, even though most were evicted right after
+        self.assertEqual(numbers, [str(i) for i in range(10) for j in range(2)])
+        self.assertEqual(history.evicted_count, 17)
+        self.assertEqual(history.get_order_trades('0'), [])
+
+    def test_max_age(self):
+        history = self.history(max_age=10)
+        self.poloniex.trade('1')
+        self.clock.advance(5 * 60)
+        self.poloniex.trade('2')
+        history.update()
+        self.clock.advance(6 * 60)
+        history.update()
+        self.assertEqual([order.number for order in history.orders], ['2'])
+        self.assertEqual(history.evicted_count, 1)
+
+    def test_error(self):
+        history = self.history()
+        self.poloniex.returnAccountTradeHistory = lambda currencyPair, start: {'error': 'Invalid API key'}
+        log_enabled, logger.enabled = logger.enabled, False
+        try:
+            self.assertEqual(history.update(), [])
+        finally:
+            logger.enabled = log_enabled
+
+
+if __name__ == '__main__':
+    unittest.main()
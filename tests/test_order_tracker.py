@@ -0,0 +1,114 @@
+"""
+Checks that OrderTracker follows orders that did not fill right away until they fill or their deadline passes.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import Poloniex, OrderTracker, OrderStatus, SimulatedClock, clock  # noqa: E402
+
+
+# an account trade history that the test fills by hand
+class TradeHistoryPoloniex(Poloniex):
+    def __init__(self):
+        Poloniex.__init__(self, '', '')
+        self.trades = []  # newest first, like the exchange returns them
+        self.downloads = 0
+
+    def returnAccountTradeHistory(self, currencyPair, start):
+        self.downloads += 1
+        return list(self.trades)
+
+    def fill(self, order_number, amount):
+        self.trades.insert(0, {'globalTradeID': len(self.trades) + 1, 'orderNumber': order_number, 'type': 'buy',
+                               'rate': '0.01', 'amount': str(amount), 'total': str(amount * 0.01), 'fee': '0.0025',
+                               'date': datetime.utcfromtimestamp(clock.time()).strftime('%Y-%m-%d %H:%M:%S')})
+
+
+class OrderTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = SimulatedClock(1500000000)
+        self.previous_clock = clock.set_clock(self.clock)
+        self.poloniex = TradeHistoryPoloniex()
+        self.tracker = OrderTracker(self.poloniex, 'BTC_LTC', timeout=30.0, initial_delay=0.5, max_delay=8.0)
+
+    def tearDown(self):
+        clock.set_clock(self.previous_clock)
+
+    # runs the polls the tracker asks for up to until, returns the times they ran at and what they returned
+    def poll_until(self, until):
+        polls = []
+        while self.tracker.next_poll() is not None and self.tracker.next_poll() <= until:
+            self.clock.set(max(self.tracker.next_poll(), self.clock.time()))
+            polls.append((self.clock.time() - 1500000000, self.tracker.poll()))
+        return polls
+
+    def test_expired_deadline(self):
+        self.tracker.track(self.tracker.check('1', 2.0))
+        polls = self.poll_until(1500000000 + 600)
+        # a backoff within the deadline instead of a single look at the next update
+        self.assertEqual([at for at, changed in polls], [0.5, 1.5, 3.5, 7.5, 15.5, 23.5, 30.0])
+        self.assertEqual([changed for at, changed in polls[:-1]], [[]] * 6)
+        previous, status = polls[-1][1][0]
+        self.assertTrue(status.is_pending())
+        self.assertFalse(self.tracker.is_open('1'))
+        self.assertIsNone(self.tracker.next_poll())
+        self.assertEqual(self.poloniex.downloads, 1 + 1 + 7)  # the first update, the check after placing and the polls
+
+    def test_partial_fill(self):
+        self.tracker.track(self.tracker.check('1', 2.0))
+        self.clock.set(1500000001)
+        self.poloniex.fill('1', 0.5)
+        polls = self.poll_until(1500000010)
+        self.assertEqual([at for at, changed in polls], [1.0, 2.0, 4.0, 8.0])
+        previous, status = polls[0][1][0]
+        self.assertTrue(previous.is_pending())
+        self.assertTrue(status.is_partial())
+        self.assertEqual(status.filled_amount, 0.5)
+        self.assertTrue(self.tracker.is_open('1'))
+
+        # only new fills are reported
+        self.assertEqual([changed for at, changed in polls[1:]], [[]] * 3)
+
+    def test_full_fill(self):
+        self.tracker.track(self.tracker.check('1', 2.0))
+        self.clock.set(1500000003)
+        self.poloniex.fill('1', 0.5)
+        self.poloniex.fill('1', 1.5)
+        polls = self.poll_until(1500000600)
+        self.assertEqual([at for at, changed in polls], [3.0])
+        previous, status = polls[-1][1][0]
+        self.assertTrue(status.is_filled())
+        self.assertEqual(len(status.trades), 2)
+        self.assertFalse(self.tracker.is_open('1'))
+        self.assertIsNone(self.tracker.next_poll())
+
+    def test_update_open_orders(self):
+        self.tracker.track(self.tracker.check('1', 2.0))
+        self.tracker.track(self.tracker.check('2', 1.0))
+        self.poloniex.fill('2', 1.0)
+        self.tracker.history.update()
+        changed = self.tracker.update_open_orders()
+        self.assertEqual([status.number for previous, status in changed], ['2'])
+        self.assertTrue(self.tracker.is_open('1'))
+
+        # an update after the deadline drops the order without waiting for a poll
+        self.clock.advance(31)
+        changed = self.tracker.update_open_orders()
+        self.assertEqual([status.number for previous, status in changed], ['1'])
+        self.assertFalse(self.tracker.is_open('1'))
+
+    def test_filled_orders_are_not_followed(self):
+        self.poloniex.fill('1', 2.0)
+        status = self.tracker.check('1', 2.0)
+        self.assertIsInstance(status, OrderStatus)
+        self.assertTrue(status.is_filled())
+        self.tracker.track(status)
+        self.assertFalse(self.tracker.is_open('1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
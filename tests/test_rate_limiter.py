@@ -0,0 +1,112 @@
+"""
+Checks the token buckets and the priority queue of RequestScheduler, with threads that wait on it at the same time.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import RequestScheduler, RequestPriority  # noqa: E402
+from trading.rate_limiter import TokenBucket  # noqa: E402
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_refill(self):
+        bucket = TokenBucket(10.0, capacity=2.0)
+        bucket.tokens = 0.0
+        bucket.refill(bucket.updated + 0.05)
+        self.assertAlmostEqual(bucket.tokens, 0.5, places=4)
+        self.assertAlmostEqual(bucket.delay(), 0.05, places=4)
+        bucket.refill(bucket.updated + 10)
+        self.assertEqual(bucket.tokens, 2.0)
+        self.assertEqual(bucket.delay(), 0.0)
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        scheduler = RequestScheduler(public_rate=20.0, private_rate=20.0)
+        start = time.time()
+        for i in range(30):
+            scheduler.acquire('public')
+        elapsed = time.time() - start
+        # a full bucket of 20 goes out at once, the other 10 at 20 per second
+        self.assertGreater(elapsed, 0.4)
+        self.assertLess(elapsed, 1.5)
+
+    def test_endpoints_have_their_own_bucket(self):
+        scheduler = RequestScheduler(public_rate=5.0, private_rate=5.0)
+        for i in range(5):
+            scheduler.acquire('public')
+        start = time.time()
+        scheduler.acquire('private', RequestPriority.account)
+        self.assertLess(time.time() - start, 0.05)
+
+    def test_priorities(self):
+        scheduler = RequestScheduler(public_rate=10.0, private_rate=10.0)
+        for i in range(10):
+            scheduler.acquire('private')  # empty the bucket
+
+        order = []
+        lock = threading.Lock()
+
+        def request(name, priority):
+            scheduler.acquire('private', priority)
+            with lock:
+                order.append(name)
+
+        # all of them queue up while the bucket is empty, the ones queued later go ahead by priority
+        first = threading.Thread(target=request, args=('first', RequestPriority.market_data))
+        first.start()
+        time.sleep(0.02)
+        threads = [threading.Thread(target=request, args=(name, priority)) for name, priority in [
+            ('market data', RequestPriority.market_data), ('account', RequestPriority.account),
+            ('order', RequestPriority.order)]]
+        for thread in threads:
+            thread.start()
+        for thread in [first] + threads:
+            thread.join()
+        self.assertEqual(order, ['order', 'account', 'first', 'market data'])
+
+    def test_concurrent_rate(self):
+        scheduler = RequestScheduler(public_rate=50.0, private_rate=50.0)
+        times = []
+        lock = threading.Lock()
+
+        def requests():
+            for i in range(15):
+                scheduler.acquire('public')
+                with lock:
+                    times.append(time.time())
+
+        start = time.time()
+        threads = [threading.Thread(target=requests) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 120 requests: 50 from the full bucket and 70 at 50 per second
+        self.assertEqual(len(times), 120)
+        self.assertGreater(max(times) - start, 1.2)
+        # never more than the bucket and what refilled in any second
+        times.sort()
+        for i in range(len(times)):
+            in_second = len([t for t in times[i:] if t - times[i] < 1.0])
+            self.assertLessEqual(in_second, 50 + 50 + 1)
+
+    def test_metrics(self):
+        scheduler = RequestScheduler(public_rate=10.0, private_rate=10.0)
+        for i in range(12):
+            scheduler.acquire('public')
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics['public']['requests'], 12)
+        self.assertEqual(metrics['private']['requests'], 0)
+        self.assertEqual(metrics['public']['queue_depth'], 0)
+        self.assertGreater(metrics['public']['max_wait'], 0.05)
+        self.assertIn('public 12', scheduler.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
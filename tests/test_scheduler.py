@@ -0,0 +1,161 @@
+"""
+Checks that UpdateScheduler runs the algorithms side by side within max_concurrent, runs their polls between their
+updates, and that algorithms sharing a BalanceService never spend the same balance twice while they do.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import Poloniex, BalanceService, ITradeAlgorithm, TradeCurrency, UpdateScheduler, clock, logger  # noqa: E402
+from trading import scheduler as scheduler_module  # noqa: E402
+
+
+class BalancePoloniex(Poloniex):
+    def __init__(self, btc):
+        Poloniex.__init__(self, '', '')
+        self.btc = btc
+        self.lock = threading.Lock()
+
+    def returnBalances(self):
+        with self.lock:
+            return {'BTC': str(self.btc), 'LTC': '0'}
+
+    def spend(self, amount):
+        with self.lock:
+            self.btc -= amount
+
+
+# an algorithm that buys with part of the shared BTC balance on every update and asks for a few polls in between
+class BuyingAlgorithm(ITradeAlgorithm):
+    running = 0
+    most_running = 0
+    counter_lock = threading.Lock()
+
+    def __init__(self, poloniex, pair, balances, polls=2):
+        currency = TradeCurrency(pair, 0.1, 0.1, 0.05, 0.05, 0.01, 0.0001, 0.0001, 60, 0, 0)
+        ITradeAlgorithm.__init__(self, poloniex, currency, balances=balances)
+        self.polls = polls
+        self.updates = 0
+        self.polled = 0
+        self.next_poll_time = None
+        self.busy = False
+        self.overlaps = 0
+        self.spent = 0.0
+
+    def enter(self):
+        if self.busy:
+            self.overlaps += 1
+        self.busy = True
+        with BuyingAlgorithm.counter_lock:
+            BuyingAlgorithm.running += 1
+            BuyingAlgorithm.most_running = max(BuyingAlgorithm.most_running, BuyingAlgorithm.running)
+
+    def leave(self):
+        with BuyingAlgorithm.counter_lock:
+            BuyingAlgorithm.running -= 1
+        self.busy = False
+
+    def update(self):
+        self.enter()
+        try:
+            self.updates += 1
+            # the same check and reserve as MyTradeAlgorithm.buy, the order itself is sent outside of the lock
+            with self.balances.lock:
+                enough = self.balances.get('BTC') >= 0.3
+                if enough:
+                    self.balances.reserve(self.currency.currency_pair, 'buy', 1.0, 0.3)
+            time.sleep(0.005)
+            if enough:
+                self.poloniex.spend(0.3)
+                self.spent += 0.3
+            self.next_poll_time = clock.time() + 0.001 if self.polls > 0 else None
+        finally:
+            self.leave()
+
+    def poll(self):
+        self.enter()
+        try:
+            self.polled += 1
+            time.sleep(0.002)
+            self.next_poll_time = clock.time() + 0.001 if self.polled % self.polls != 0 else None
+        finally:
+            self.leave()
+
+    def next_poll(self):
+        return self.next_poll_time
+
+
+class NoDelay:
+    @staticmethod
+    def randint(a, b):
+        return 0
+
+
+class UpdateSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.previous_random = scheduler_module.random
+        scheduler_module.random = NoDelay
+        self.log_enabled, logger.enabled = logger.enabled, False
+        BuyingAlgorithm.running = 0
+        BuyingAlgorithm.most_running = 0
+
+    def tearDown(self):
+        scheduler_module.random = self.previous_random
+        logger.enabled = self.log_enabled
+
+    # runs the scheduler for seconds, it runs until it is stopped otherwise
+    def run_for(self, scheduler, seconds):
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=scheduler.max_concurrent)
+        try:
+            loop.run_until_complete(asyncio.wait_for(scheduler._run_all(loop, executor), seconds))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            executor.shutdown(wait=True)
+            loop.close()
+
+    def test_concurrency_and_shared_balances(self):
+        poloniex = BalancePoloniex(btc=1.0)
+        balances = BalanceService(poloniex, ttl=60)
+        scheduler = UpdateScheduler(0.01, max_concurrent=3)
+        algorithms = [BuyingAlgorithm(poloniex, pair, balances) for pair in ['BTC_LTC', 'BTC_ETH', 'BTC_XMR',
+                                                                               'BTC_DASH', 'BTC_ZEC']]
+        for algorithm in algorithms:
+            scheduler.add(algorithm)
+        self.run_for(scheduler, 0.5)
+
+        self.assertLessEqual(BuyingAlgorithm.most_running, 3)
+        self.assertGreater(BuyingAlgorithm.most_running, 1)
+        for algorithm in algorithms:
+            self.assertGreater(algorithm.updates, 2)
+            self.assertGreater(algorithm.polled, 2)
+            self.assertEqual(algorithm.overlaps, 0)
+        # three buys of 0.3 fit in 1 BTC, the reservations keep the others from spending it again
+        self.assertAlmostEqual(sum(algorithm.spent for algorithm in algorithms), 0.9)
+        self.assertGreaterEqual(poloniex.btc, 0)
+
+    def test_failed_update_does_not_stop_the_loop(self):
+        poloniex = BalancePoloniex(btc=1.0)
+        algorithm = BuyingAlgorithm(poloniex, 'BTC_LTC', BalanceService(poloniex), polls=0)
+        calls = []
+
+        def failing_update():
+            calls.append(1)
+            raise RuntimeError('Connection reset')
+
+        algorithm.update = failing_update
+        scheduler = UpdateScheduler(0.01, max_concurrent=1)
+        scheduler.add(algorithm)
+        self.run_for(scheduler, 0.2)
+        self.assertGreater(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
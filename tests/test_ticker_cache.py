@@ -0,0 +1,89 @@
+"""
+Checks that TickerCache shares one returnTicker download between algorithms until it is ttl seconds old.
+Run from the repository root with: python3 -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trading import Poloniex, TickerCache, SimulatedClock, clock  # noqa: E402
+
+
+class TickerPoloniex(Poloniex):
+    def __init__(self, delay=0.0):
+        Poloniex.__init__(self, '', '')
+        self.delay = delay
+        self.downloads = 0
+        self.error = None
+
+    def returnTicker(self):
+        time.sleep(self.delay)
+        self.downloads += 1
+        if self.error is not None:
+            return {'error': self.error}
+        return {'BTC_LTC': {'highestBid': str(0.01 * self.downloads), 'lowestAsk': '0.011'}}
+
+
+class TickerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = SimulatedClock(1500000000)
+        self.previous_clock = clock.set_clock(self.clock)
+        self.poloniex = TickerPoloniex()
+        self.cache = TickerCache(self.poloniex, ttl=30.0)
+
+    def tearDown(self):
+        clock.set_clock(self.previous_clock)
+
+    def test_shared_until_ttl(self):
+        first = self.cache.snapshot()
+        self.clock.advance(29)
+        self.assertIs(self.cache.snapshot(), first)
+        self.assertEqual(self.poloniex.downloads, 1)
+
+        self.clock.advance(1)
+        second = self.cache.snapshot()
+        self.assertIsNot(second, first)
+        self.assertEqual(self.poloniex.downloads, 2)
+        self.assertEqual(second.get_pair('BTC_LTC')['highestBid'], '0.02')
+
+    def test_invalidate(self):
+        self.cache.snapshot()
+        self.cache.invalidate()
+        self.cache.snapshot()
+        self.assertEqual(self.poloniex.downloads, 2)
+
+    def test_age(self):
+        snapshot = self.cache.snapshot()
+        self.clock.advance(10)
+        self.assertEqual(snapshot.age(), 10)
+        self.assertTrue(snapshot.is_stale(5))
+        self.assertFalse(snapshot.is_stale(15))
+        self.assertFalse(snapshot.is_stale(0))  # 0 turns the check off
+        with self.assertRaises(RuntimeError):
+            snapshot.get_pair('BTC_XMR')
+
+    def test_error_is_not_cached(self):
+        self.poloniex.error = 'Internal error'
+        with self.assertRaises(RuntimeError):
+            self.cache.snapshot()
+        self.poloniex.error = None
+        self.assertIn('BTC_LTC', self.cache.snapshot().ticker)
+        self.assertEqual(self.poloniex.downloads, 2)
+
+    def test_threads_share_one_download(self):
+        self.poloniex.delay = 0.05
+        snapshots = []
+        threads = [threading.Thread(target=lambda: snapshots.append(self.cache.snapshot())) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.poloniex.downloads, 1)
+        self.assertEqual(len(set(id(snapshot) for snapshot in snapshots)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
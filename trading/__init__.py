@@ -1,9 +1,21 @@
+from trading.clock import Clock, SimulatedClock
 from trading.api import Poloniex
+from trading.nonce import NonceAllocator
+from trading.rate_limiter import RequestScheduler, RequestPriority
 from trading.order import Order
 from trading.order_history import OrderHistory
+from trading.order_tracker import OrderTracker, OrderStatus, OrderState
 from trading.trade import Trade
+from trading.balances import BalanceService
+from trading.ticker_cache import TickerCache, TickerSnapshot
+from trading.chart_data import CandleStore
 from trading.trade_algorithms import ITradeAlgorithm, MyTradeAlgorithm
 from trading.trade_currency import TradeCurrency
+from trading.scheduler import UpdateScheduler
+from trading.shared_candles import CandleColumns, SharedCandles
+from trading.simulator import SimulatedPoloniex, load_candles, load_trade_history
+from trading.backtest import Backtest, BacktestResult
+from trading.sweep import ParameterSweep, SweepResult
 from trading.logger import log
 
-__all__ = ['Poloniex', 'Order', 'OrderHistory', 'Trade', 'ITradeAlgorithm', 'MyTradeAlgorithm', 'TradeCurrency', 'log']
+__all__ = ['Clock', 'SimulatedClock', 'Poloniex', 'NonceAllocator', 'RequestScheduler', 'RequestPriority', 'Order', 'OrderHistory', 'OrderTracker', 'OrderStatus', 'OrderState', 'Trade', 'BalanceService', 'TickerCache', 'TickerSnapshot', 'CandleStore', 'ITradeAlgorithm', 'MyTradeAlgorithm', 'TradeCurrency', 'UpdateScheduler', 'CandleColumns', 'SharedCandles', 'SimulatedPoloniex', 'load_candles', 'load_trade_history', 'Backtest', 'BacktestResult', 'ParameterSweep', 'SweepResult', 'log']
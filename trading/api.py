@@ -4,13 +4,15 @@
 
 try:
     # For Python 3.0 and later
-    from urllib.request import urlopen, Request
     from urllib.parse import urlencode
 except ImportError:
-    # Fall back to Python 2's urllib2
-    from urllib2 import urlopen, Request
+    # Fall back to Python 2's urllib
     from urllib import urlencode
 
+from trading.connection_pool import ConnectionPool
+from trading.rate_limiter import RequestScheduler, RequestPriority
+from trading.nonce import NonceAllocator
+
 import json
 import time, datetime
 from datetime import date, datetime
@@ -26,12 +28,26 @@ def createTimeStamp(datestr, format="%Y-%m-%d %H:%M:%S"):
 
     return None
 
+# orders are placed before the balance and trade history downloads that are waiting for the private rate limit
+order_commands = ['buy', 'sell', 'cancelOrder', 'moveOrder']
+
+# how often a return... command is sent when the exchange answers that its nonce was too low, which happens when a
+# request with a higher nonce from another thread got there first. Orders and withdrawals are never sent again: the
+# bot cannot tell that answer apart from one to a request the exchange did act on, so it is returned like any error
+# and the next update sees in the trade history what became of the order.
+nonce_attempts = 3
+
+
 class Poloniex:
-    def __init__(self, APIKey, Secret, parseJson=True):
+    def __init__(self, APIKey, Secret, parseJson=True, pool_size=4, timeout=30.0, rate_limiter=None, nonces=None):
         self.APIKey = APIKey
         self.Secret = Secret
 
         self.parseJson = parseJson
+        self.timeout = timeout
+        self._pool = ConnectionPool('poloniex.com', pool_size, timeout)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RequestScheduler()
+        self.nonces = nonces if nonces is not None else NonceAllocator()
  
     def post_process(self, before):
         after = before
@@ -46,17 +62,15 @@ class Poloniex:
                            
         return after
  
-    def api(self, type, params):
+    def api(self, type, params, timeout=None):
         try:
             params = dict((k,v) for k,v in params.iteritems() if v is not None)
         except AttributeError:
             params = dict((k,v) for k,v in params.items() if v is not None)
 
         if 'public' == type:
-            uri = 'https://poloniex.com/public?' + urlencode(params)
-
-            ret = urlopen(Request(uri))
-            # jsonRet = json.loads(ret.read())
+            self.rate_limiter.acquire('public', RequestPriority.market_data)
+            status, body = self._send('GET', '/public?' + urlencode(params), timeout=timeout)
 
         if 'private' == type:
             post_data = urlencode(params)
@@ -64,27 +78,46 @@ class Poloniex:
             sign = hmac.new(self.Secret.encode(), post_data.encode(), hashlib.sha512).hexdigest()
             headers = {
                 'Sign': sign,
-                'Key': self.APIKey
+                'Key': self.APIKey,
+                'Content-Type': 'application/x-www-form-urlencoded'
             }
             
-            ret = urlopen(Request('https://poloniex.com/tradingApi', post_data.encode(), headers))
+            priority = RequestPriority.order if params['command'] in order_commands else RequestPriority.account
+            self.rate_limiter.acquire('private', priority)
+            status, body = self._send('POST', '/tradingApi', post_data.encode(), headers, timeout=timeout)
             # jsonRet = json.loads(ret.read())
             # return self.post_process(jsonRet)
-        
+
+        # errors are usually reported in a json body, anything else is a server problem
+        if status >= 400 and not body.lstrip().startswith(b'{'):
+            raise RuntimeError('HTTP Error ' + str(status) + ' for ' + str(params.get('command')))
+
         if self.parseJson:
-            return json.loads(ret.read().decode('utf-8'))
+            return json.loads(body.decode('utf-8'))
         else:
-            return ret.read()
+            return body
+
+    # the only place that talks to the exchange, returns the http status and the raw body
+    def _send(self, method, path, body=None, headers=None, timeout=None):
+        return self._pool.request(method, path, body, headers, timeout=timeout)
 
     def _private(self, command, params={}):
+        params = dict(params)
         params['command'] = command
-        params['nonce'] = int(time.time()*1000)
 
-        return self.api('private', params)
+        attempts = nonce_attempts if command.startswith('return') else 1
+        for attempt in range(attempts):
+            params['nonce'] = self.nonces.next()
+            ret = self.api('private', params)
+            if not self.parseJson or not isinstance(ret, dict) or 'Nonce must be greater' not in str(ret.get('error')):
+                break
+
+        return ret
 
     def _public(self, command, params={}):
+        params = dict(params)
         params['command'] = command
-        
+
         return self.api('public', params)
 
     def returnTicker(self):
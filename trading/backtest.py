@@ -0,0 +1,234 @@
+from trading import clock, logger
+from trading.clock import SimulatedClock
+from trading.simulator import SimulatedPoloniex
+from trading.ticker_cache import TickerCache
+from trading.balances import BalanceService
+from trading.trade_currency import TradeCurrency
+from trading.trade_algorithms import MyTradeAlgorithm
+from datetime import datetime
+import time
+
+
+# A SimulatedPoloniex that is called directly instead of through requests: no url encoding, signing, json, rate
+# limiting or nonces, which would take far longer than the simulated exchange itself. The lending bot's backtest
+# (poloniexlendingbot/modules/Backtest.py) does the same for the same reason.
+class DirectSimulatedPoloniex(SimulatedPoloniex):
+    def _public(self, command, params={}):
+        params = dict((k, v) for k, v in params.items() if v is not None)
+        params['command'] = command
+        with self._lock:
+            return self._public_command(params)
+
+    def _private(self, command, params={}):
+        params = dict((k, v) for k, v in params.items() if v is not None)
+        params['command'] = command
+        with self._lock:
+            params['nonce'] = self._last_nonce + 1
+            return self._private_command(params)
+
+
+class PairResult:
+    currency_pair = ''
+    buys = 0
+    sells = 0
+    volume = 0.0    # main currency
+    fees = 0.0      # main currency
+
+    def __init__(self, currency_pair):
+        self.currency_pair = currency_pair
+        self.buys = 0
+        self.sells = 0
+        self.volume = 0.0
+        self.fees = 0.0
+
+    def trades(self):
+        return self.buys + self.sells
+
+
+class BacktestResult:
+    value_currency = ''
+
+    def __init__(self, value_currency, start_time, end_time):
+        self.value_currency = value_currency
+        self.start_time = start_time
+        self.end_time = end_time
+        self.cycles = 0
+        self.errors = 0
+        self.last_error = None      # the message of the last error
+        self.elapsed = 0.0          # wall clock seconds the backtest took
+        self.start_balances = {}
+        self.end_balances = {}
+        self.start_value = 0.0      # the starting balances at the starting prices
+        self.end_value = 0.0        # the final balances at the final prices
+        self.hold_value = 0.0       # the starting balances at the final prices
+        self.fees = 0.0             # at the final prices
+        self.pairs = {}             # currency pair -> PairResult
+
+    def pnl(self):
+        return self.end_value - self.start_value
+
+    def pnl_percent(self):
+        return self.pnl() / self.start_value if self.start_value > 0 else 0.0
+
+    # how much better or worse than doing nothing
+    def excess_return(self):
+        return self.end_value - self.hold_value
+
+    def fee_drag(self):
+        return self.fees / self.start_value if self.start_value > 0 else 0.0
+
+    def trades(self):
+        return sum(pair.trades() for pair in self.pairs.values())
+
+    def cycles_per_second(self):
+        return self.cycles / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self):
+        c = self.value_currency
+        lines = ['Backtest from ' + datetime.utcfromtimestamp(self.start_time).strftime('%Y-%m-%d %H:%M') +
+                 ' to ' + datetime.utcfromtimestamp(self.end_time).strftime('%Y-%m-%d %H:%M') + ' UTC',
+                 '{0} cycles in {1:.1f} seconds ({2:.0f} cycles per second), {3} errors'.format(
+                     self.cycles, self.elapsed, self.cycles_per_second(), self.errors),
+                 'Start value:  {0:.8f} {1}'.format(self.start_value, c),
+                 'End value:    {0:.8f} {1}'.format(self.end_value, c),
+                 'Hold value:   {0:.8f} {1}'.format(self.hold_value, c),
+                 'PnL:          {0:.8f} {1} ({2:.2f}%)'.format(self.pnl(), c, self.pnl_percent() * 100),
+                 'Fees:         {0:.8f} {1} ({2:.2f}% of the start value)'.format(self.fees, c, self.fee_drag() * 100),
+                 '',
+                 '{0:<12} {1:>6} {2:>6} {3:>16} {4:>16}'.format('pair', 'buys', 'sells', 'volume', 'fees')]
+        for currency_pair in sorted(self.pairs):
+            pair = self.pairs[currency_pair]
+            lines.append('{0:<12} {1:>6} {2:>6} {3:>16.8f} {4:>16.8f}'.format(
+                currency_pair, pair.buys, pair.sells, pair.volume, pair.fees))
+        return '\n'.join(lines)
+
+
+# Runs MyTradeAlgorithm over recorded candles with a simulated clock and account. Every cycle moves the clock
+# update_interval seconds ahead and updates each pair once, then runs the polls they ask for until the next cycle,
+# like the bot does with its timers. The log is turned off while it runs.
+class Backtest:
+    update_interval = 0.0
+    value_currency = 'BTC'
+
+    def __init__(self, candles, balances, currencies, trade_history=None, update_interval=600, fee=0.0025,
+                 spread=0.002, order_timeout=30.0, history_max_orders=10000, history_max_age=0, value_currency='BTC',
+                 warm_up=16 * 60 * 60, period=300):
+        for currency in currencies:
+            assert isinstance(currency, TradeCurrency)
+        self.candles = candles
+        self.balances = balances
+        self.currencies = [currency for currency in currencies if currency.currency_pair in candles]
+        self.trade_history = trade_history
+        self.update_interval = update_interval
+        self.fee = fee
+        self.spread = spread
+        self.order_timeout = order_timeout
+        self.history_max_orders = history_max_orders
+        self.history_max_age = history_max_age
+        self.value_currency = value_currency
+        self.warm_up = warm_up
+        self.period = period
+
+        self.first_date = min(int(c[0]['date']) for c in candles.values() if len(c) > 0)
+        self.last_date = max(int(c[-1]['date']) for c in candles.values() if len(c) > 0) + period
+
+    # errors are counted instead of ending the run, like the bot logs them and carries on
+    @staticmethod
+    def step(result, function):
+        try:
+            function()
+        except Exception as e:
+            result.errors += 1
+            result.last_error = str(e)
+
+    # start and end are timestamps, by default the whole recording after the warm up
+    def run(self, start=None, end=None):
+        start = max(start if start is not None else 0, self.first_date + self.warm_up)
+        end = min(end if end is not None else self.last_date, self.last_date)
+
+        simulated_clock = SimulatedClock(start)
+        previous_clock = clock.set_clock(simulated_clock)
+        log_enabled = logger.enabled
+        logger.enabled = False
+        try:
+            poloniex = DirectSimulatedPoloniex(self.candles, self.balances, fee=self.fee, spread=self.spread,
+                                               warm_up=start - self.first_date, period=self.period,
+                                               clock=simulated_clock, trade_history=self.trade_history)
+            ticker_cache = TickerCache(poloniex, ttl=self.update_interval / 2.0)
+            balances = BalanceService(poloniex, ttl=self.update_interval)
+            algorithms = [MyTradeAlgorithm(poloniex, TradeCurrency.from_tc(currency), ticker_cache=ticker_cache,
+                                           balances=balances, order_timeout=self.order_timeout,
+                                           history_max_orders=self.history_max_orders,
+                                           history_max_age=self.history_max_age)
+                          for currency in self.currencies]
+
+            result = BacktestResult(self.value_currency, start, end)
+            result.start_balances = dict(poloniex.balances)
+            result.start_value = self.value(poloniex, result.start_balances)
+            recorded_trades = len(poloniex.trades)
+
+            wall_start = time.perf_counter()
+            cycle_start = start
+            while cycle_start < end:
+                simulated_clock.set(cycle_start)
+                for algorithm in algorithms:
+                    self.step(result, algorithm.update)
+
+                # the polls the algorithms ask for before the next cycle, like UpdateScheduler runs them
+                while True:
+                    polls = [algorithm.next_poll() for algorithm in algorithms]
+                    next_poll = min((poll for poll in polls if poll is not None), default=None)
+                    if next_poll is None or next_poll >= cycle_start + self.update_interval:
+                        break
+                    simulated_clock.set(max(next_poll, simulated_clock.time()))
+                    for algorithm, poll in zip(algorithms, polls):
+                        if poll is not None and poll <= simulated_clock.time():
+                            self.step(result, algorithm.poll)
+                result.cycles += 1
+                cycle_start += self.update_interval
+            result.elapsed = time.perf_counter() - wall_start
+
+            simulated_clock.set(end)
+            poloniex.match_orders()
+            result.end_balances = dict(poloniex.balances)
+            for order in poloniex.open_orders.values():
+                # an open order still holds what it may spend
+                main, alt = order['currencyPair'].split('_')
+                if order['type'] == 'buy':
+                    result.end_balances[main] += order['rate'] * order['amount']
+                else:
+                    result.end_balances[alt] += order['amount']
+            result.end_value = self.value(poloniex, result.end_balances)
+            result.hold_value = self.value(poloniex, result.start_balances)
+
+            for trade in poloniex.trades[recorded_trades:]:
+                pair = result.pairs.setdefault(trade['currencyPair'], PairResult(trade['currencyPair']))
+                if trade['type'] == 'buy':
+                    pair.buys += 1
+                else:
+                    pair.sells += 1
+                pair.volume += float(trade['total'])
+                pair.fees += float(trade['total']) * float(trade['fee'])
+                result.fees += float(trade['total']) * float(trade['fee']) * \
+                    self.price(poloniex, trade['currencyPair'].split('_')[0])
+            return result
+        finally:
+            clock.set_clock(previous_clock)
+            logger.enabled = log_enabled
+
+    # the worth of the balances in value_currency at the current prices, currencies without a price count as nothing
+    def value(self, poloniex, balances):
+        return sum(amount * self.price(poloniex, currency) for currency, amount in balances.items() if amount != 0)
+
+    # the price of one unit of currency in value_currency, directly or through BTC
+    def price(self, poloniex, currency, value_currency=None):
+        value_currency = self.value_currency if value_currency is None else value_currency
+        if currency == value_currency:
+            return 1.0
+        if value_currency + '_' + currency in poloniex.candles:
+            return float(poloniex.candle(value_currency + '_' + currency)['close'])
+        if currency + '_' + value_currency in poloniex.candles:
+            return 1.0 / float(poloniex.candle(currency + '_' + value_currency)['close'])
+        if 'BTC' not in [currency, value_currency]:
+            return self.price(poloniex, currency, 'BTC') * self.price(poloniex, 'BTC', value_currency)
+        return 0.0
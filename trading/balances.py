@@ -0,0 +1,69 @@
+from trading import Poloniex, OrderStatus
+from trading import clock
+import threading
+
+
+# one returnBalances response shared by every algorithm for ttl seconds. Orders placed in between are applied to
+# the shared balances in place, so pairs with the same main currency keep seeing the same numbers.
+class BalanceService:
+    poloniex = None
+    ttl = 0.0
+
+    def __init__(self, poloniex, ttl=0.0):
+        assert isinstance(poloniex, Poloniex)
+        self.poloniex = poloniex
+        self.ttl = ttl
+
+        # held by an algorithm while it checks the balances and reserves what its next order spends, never while the
+        # order is sent
+        self.lock = threading.RLock()
+        self._balances = None
+        self._timestamp = 0.0
+
+    def snapshot(self):
+        with self.lock:
+            if self._balances is None or clock.time() - self._timestamp >= self.ttl:
+                balances = self.poloniex.returnBalances()
+                if 'error' in balances:
+                    raise RuntimeError(balances['error'])
+                self._balances = dict((currency, float(amount)) for currency, amount in balances.items())
+                self._timestamp = clock.time()
+
+            return dict(self._balances)
+
+    def get(self, currency):
+        return self.snapshot().get(currency, 0.0)
+
+    # returnBalances only reports what is available: an open order holds its whole amount, so take it off before the
+    # order is sent and other pairs can not spend it as well
+    def reserve(self, currency_pair, type, rate, amount):
+        main, alt = currency_pair.split('_')
+
+        with self.lock:
+            if self._balances is None:
+                return
+
+            if type == 'buy':
+                self._balances[main] = self._balances.get(main, 0.0) - rate * amount
+            else:
+                self._balances[alt] = self._balances.get(alt, 0.0) - amount
+
+    # fills of a reserved order credit the other currency minus the fee
+    def apply_order(self, currency_pair, type, status):
+        assert isinstance(status, OrderStatus)
+        main, alt = currency_pair.split('_')
+
+        with self.lock:
+            if self._balances is None:
+                return
+
+            if type == 'buy':
+                for trade in status.trades:
+                    self._balances[alt] = self._balances.get(alt, 0.0) + abs(trade.amount) * (1 - trade.fee)
+            else:
+                for trade in status.trades:
+                    self._balances[main] = self._balances.get(main, 0.0) + abs(trade.total) * (1 - trade.fee)
+
+    def invalidate(self):
+        with self.lock:
+            self._balances = None
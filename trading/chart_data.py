@@ -0,0 +1,64 @@
+from trading import Poloniex
+from array import array
+from bisect import bisect_left
+from trading import clock
+from datetime import datetime
+
+
+# keeps the last few hours of candles for one pair and only downloads the candles it does not have yet
+class CandleStore:
+    poloniex = None
+    currency_pair = ''
+    period = 300
+    window = 0
+
+    def __init__(self, poloniex, currency_pair='BTC_LTC', period=300, hours=16):
+        assert isinstance(poloniex, Poloniex)
+        self.poloniex = poloniex
+        self.currency_pair = currency_pair
+        self.period = period
+        self.window = int(hours * 60 * 60)
+
+        # parallel arrays, oldest candle first
+        self.dates = array('q')
+        self.weighted_averages = array('d')
+
+    def __len__(self):
+        return len(self.dates)
+
+    def last_date(self):
+        return self.dates[-1] if len(self.dates) > 0 else 0
+
+    def update(self):
+        now = clock.time()
+        if len(self.dates) == 0:
+            start = now - self.window
+        else:
+            # the newest candle may still have been open when it was downloaded, so fetch it again
+            start = self.last_date()
+
+        chart_data = self.poloniex.returnChartData(currencyPair=self.currency_pair, period=self.period,
+                                                   start=datetime.utcfromtimestamp(start))
+        if 'error' in chart_data:
+            raise RuntimeError(chart_data['error'])
+
+        new_candles = 0
+        for data in chart_data:
+            date = int(data['date'])
+            if date == 0:  # returned when there are no candles in the requested range
+                continue
+            elif date > self.last_date():
+                self.dates.append(date)
+                self.weighted_averages.append(float(data['weightedAverage']))
+                new_candles += 1
+            elif date == self.last_date():
+                self.weighted_averages[-1] = float(data['weightedAverage'])
+
+        self.evict(now)
+        return new_candles
+
+    def evict(self, now):
+        expired = bisect_left(self.dates, int(now - self.window))
+        if expired > 0:
+            del self.dates[:expired]
+            del self.weighted_averages[:expired]
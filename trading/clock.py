@@ -0,0 +1,62 @@
+from datetime import datetime
+import time as _time
+
+
+# the time source of the bot: the wall clock, unless a backtest has swapped in a SimulatedClock
+class Clock:
+    def time(self):
+        return _time.time()
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+
+# a clock that only moves when it is told to, sleeping simply moves it forward
+class SimulatedClock(Clock):
+    current = 0.0
+
+    def __init__(self, current=0.0):
+        self.current = float(current)
+
+    def time(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.current += max(seconds, 0.0)
+
+    def advance(self, seconds):
+        self.current += seconds
+
+    def set(self, current):
+        self.current = float(current)
+
+
+_clock = Clock()
+
+
+def get_clock():
+    return _clock
+
+
+# returns the clock that was in use, so that it can be put back
+def set_clock(clock):
+    global _clock
+    assert isinstance(clock, Clock)
+    previous = _clock
+    _clock = clock
+    return previous
+
+
+def time():
+    return _clock.time()
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+
+def now():
+    return _clock.now()
@@ -0,0 +1,111 @@
+try:
+    # For Python 3.0 and later
+    from http.client import HTTPSConnection, BadStatusLine, RemoteDisconnected
+    from queue import LifoQueue, Empty
+except ImportError:
+    # Fall back to Python 2's httplib
+    from httplib import HTTPSConnection, BadStatusLine
+    from Queue import LifoQueue, Empty
+    RemoteDisconnected = BadStatusLine
+
+import errno
+import socket
+import threading
+import zlib
+
+
+# errors of sending on a connection that the server has already closed, the request did not reach it
+unsent_errors = (errno.ECONNREFUSED, errno.ECONNRESET, errno.ECONNABORTED, errno.EPIPE)
+
+
+# a reused connection turned out to be closed by the server before the request reached it
+class StaleConnectionError(Exception):
+    pass
+
+
+# keep-alive HTTPS connections to one host, so that only the first request on a connection pays for the TCP and TLS
+# handshake. At most size requests are in flight at the same time.
+# A request on a reused connection is sent again on a new one only when it cannot have reached the server: the
+# connection was refused or reset while sending, or the server closed the idle connection without answering a single
+# byte. Anything else, like a read timeout, may come after the server acted on the request, and an order must not be
+# placed twice, so the error is raised.
+class ConnectionPool:
+    host = ''
+    size = 0
+    timeout = 0.0
+
+    def __init__(self, host, size=4, timeout=30.0):
+        self.host = host
+        self.size = max(int(size), 1)
+        self.timeout = timeout
+
+        self._idle = LifoQueue()    # reuse the most recent connection, it is the least likely to have been dropped
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def request(self, method, path, body=None, headers=None, timeout=None):
+        headers = dict(headers) if headers is not None else {}
+        headers['Accept-Encoding'] = 'gzip'
+        timeout = self.timeout if timeout is None else timeout
+
+        with self._slots:
+            connection, reused = self._get()
+            while True:
+                try:
+                    response = self._send(connection, method, path, body, headers, timeout, reused)
+                    break
+                except StaleConnectionError:
+                    connection.close()
+                    connection, reused = HTTPSConnection(self.host, timeout=timeout), False
+                except Exception:
+                    connection.close()
+                    raise
+
+            try:
+                data = response.read()
+            except Exception:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._idle.put(connection)
+
+        if response.getheader('Content-Encoding', '') == 'gzip':
+            data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+        return response.status, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+    def _get(self):
+        try:
+            return self._idle.get_nowait(), True
+        except Empty:
+            return HTTPSConnection(self.host, timeout=self.timeout), False
+
+    # raises StaleConnectionError instead of the error when a reused connection failed before the request reached
+    # the server
+    @staticmethod
+    def _send(connection, method, path, body, headers, timeout, reused):
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        try:
+            connection.request(method, path, body, headers)
+        except socket.error as e:
+            if reused and e.errno in unsent_errors:
+                raise StaleConnectionError()
+            raise
+
+        try:
+            return connection.getresponse()
+        except BadStatusLine as e:
+            # an empty status line, not a single byte came back
+            if reused and (isinstance(e, RemoteDisconnected) or e.line in ('', "''")):
+                raise StaleConnectionError()
+            raise
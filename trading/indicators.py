@@ -0,0 +1,176 @@
+from bisect import bisect_left
+from collections import deque
+
+try:
+    import numpy
+    use_numpy = True
+except ImportError:
+    numpy = None
+    use_numpy = False
+
+
+def sma(data, window):
+    if len(data) < window:
+        return None
+    return sum(data[-window:]) / float(window)
+
+
+def ema(data, window=-1):
+    if len(data) == 0:
+        return 0
+    elif len(data) == 1:
+        return data[0]
+
+    if window < 0:
+        window = int(len(data) / 2)
+
+    c = 2.0 / (window + 1)
+    current_ema = sma(data[-window * 2:-window], window)
+    for value in data[-window:]:
+        current_ema = (c * value) + ((1 - c) * current_ema)
+    return current_ema
+
+
+# Incremental version of ema(). ema() seeds with the sma of the window before the last one and then runs the
+# recursion over the last window, so its result only depends on the last 2 * window samples:
+#   ema = c * sum(decay^k * x[-1 - k] for k < window) + decay^window * sum(x[-2 * window:-window]) / window
+# Both sums slide in O(1) per sample. A window of -1 follows the sample count like ema() does. Every change of the
+# window changes all the weights, so the sums are only rebuilt when value() is asked for after one. Once max_samples
+# are held the window stays fixed at max_samples // 2, which is the window ema() takes over the last max_samples.
+class StreamingEma:
+    window = -1
+    max_samples = 0
+
+    def __init__(self, window=-1, max_samples=0):
+        self.auto_window = window < 0
+        self.window = window
+        self.max_samples = max_samples
+        self.reset(window)
+
+    def reset(self, window=None):
+        if window is not None:
+            self.auto_window = window < 0
+            self.window = window
+        self._samples = deque() if self.auto_window else deque(maxlen=max(self.window * 2, 1))
+        self._weighted_sum = 0.0   # sum(decay^k * x[-1 - k]) over the last window
+        self._seed_sum = 0.0       # sum of the window before the last one
+        self._pushes = 0
+        self._ready = False
+        self._stale = True         # the sums have to be rebuilt before they are used
+
+    def __len__(self):
+        return len(self._samples)
+
+    def warm_up(self, values):
+        if self.auto_window:
+            if self.max_samples > 0:
+                values = values[-self.max_samples:]
+            self.window = len(values) // 2
+            self._samples = deque(values)
+            self._freeze_window()
+        else:
+            self._samples.clear()
+            self._samples.extend(values[-self.window * 2:])
+        self._stale = True
+
+    def push(self, value):
+        window = (len(self._samples) + 1) // 2 if self.auto_window else self.window
+        if window == self.window and self._ready and not self._stale and len(self._samples) >= 2 * window:
+            self._slide(value)
+        else:
+            self._samples.append(value)
+            self.window = window
+            self._stale = True
+        self._freeze_window()
+
+    # moves both sums one sample on, for a window that did not change
+    def _slide(self, value):
+        w = self.window
+        decay = 1 - 2.0 / (w + 1)
+        leaving_weighted = self._samples[-w]
+        leaving_seed = self._samples[-2 * w]
+        self._samples.append(value)
+        self._weighted_sum = value + decay * self._weighted_sum - decay ** w * leaving_weighted
+        self._seed_sum += leaving_weighted - leaving_seed
+
+        # resync now and then so rounding errors from the subtractions cannot add up
+        self._pushes += 1
+        if self._pushes >= 2 * w:
+            self._stale = True
+
+    def replace_last(self, value):
+        if len(self._samples) == 0:
+            self.push(value)
+            return
+        previous = self._samples[-1]
+        self._samples[-1] = value
+        if self._ready and not self._stale:
+            self._weighted_sum += value - previous
+        else:
+            self._stale = True
+
+    def value(self):
+        if self._stale:
+            self._rebuild()
+        if not self._ready:
+            return ema(list(self._samples), self.window)
+        w = self.window
+        c = 2.0 / (w + 1)
+        return c * self._weighted_sum + (1 - c) ** w * (self._seed_sum / float(w))
+
+    def _freeze_window(self):
+        if self.auto_window and 0 < self.max_samples <= len(self._samples):
+            self.auto_window = False
+            self.window = self.max_samples // 2
+            self._samples = deque(self._samples, maxlen=max(self.window * 2, 1))
+            self._stale = True
+
+    def _rebuild(self):
+        self._pushes = 0
+        self._stale = False
+        w = self.window
+        self._ready = w > 0 and len(self._samples) >= 2 * w
+        if not self._ready:
+            return
+
+        decay = 1 - 2.0 / (w + 1)
+        samples = list(self._samples)
+        if use_numpy:
+            recent = numpy.asarray(samples[-w:], dtype=float)[::-1]
+            self._weighted_sum = float(numpy.dot(decay ** numpy.arange(w), recent))
+        else:
+            weighted_sum = 0.0
+            for value in samples[-w:]:
+                weighted_sum = decay * weighted_sum + value
+            self._weighted_sum = weighted_sum
+        self._seed_sum = sum(samples[-2 * w:-w])
+
+
+# StreamingEma over a CandleStore whose window is a fraction of the number of candles held
+class CandleEma(StreamingEma):
+    divisor = 1
+    last_date = 0
+
+    def __init__(self, divisor):
+        StreamingEma.__init__(self, 0)
+        self.divisor = divisor
+        self.last_date = 0
+
+    def update(self, candles):
+        dates = candles.dates
+        values = candles.weighted_averages
+        window = int(len(candles) / self.divisor)
+
+        if window != self.window or len(dates) == 0 or self.last_date < dates[0]:
+            self.reset(window)
+            self.warm_up(values)
+        else:
+            i = bisect_left(dates, self.last_date)
+            if i < len(dates) and dates[i] == self.last_date:
+                self.replace_last(values[i])
+                i += 1
+            for j in range(i, len(dates)):
+                self.push(values[j])
+
+        self.last_date = candles.last_date()
+        return self.value()
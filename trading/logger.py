@@ -1,4 +1,11 @@
+# a backtest turns the log off, writing it would take longer than the simulation
+enabled = True
+
+
 def log(msg, preserve_line=False):
+    if not enabled:
+        return
+
     end = '\n' if preserve_line else ''
     start = '\r'  # '\n' if preserve_line else '\r'
     print(start + str(msg), end=end)
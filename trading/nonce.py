@@ -0,0 +1,42 @@
+import os
+import threading
+import time
+
+
+# Hands out strictly increasing nonces to any number of threads or asyncio tasks; the lock is never held across an
+# await or a request, so it cannot stall the event loop. With a path the allocator persists a high-water mark that is
+# a block of nonces ahead of the last one handed out, so a restarted bot never reuses a nonce without writing the
+# file on every call.
+class NonceAllocator:
+    path = None
+    reserve = 0
+
+    def __init__(self, path=None, reserve=10000):
+        self.path = path
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._last = 0
+        self._reserved = 0
+
+        if path is not None and os.path.exists(path):
+            with open(path, 'r') as file:
+                content = file.read().strip()
+            if content:
+                self._last = self._reserved = int(content)
+
+    def next(self):
+        with self._lock:
+            nonce = max(self._last + 1, int(time.time() * 1000))
+            self._last = nonce
+
+            if self.path is not None and nonce >= self._reserved:
+                self._reserved = nonce + self.reserve
+                self._persist(self._reserved)
+
+            return nonce
+
+    def _persist(self, value):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(str(value))
+        os.replace(temp_path, self.path)
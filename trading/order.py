@@ -1,19 +1,20 @@
+import calendar
+import time
+
+
 class Order:
-    number = ''
-    rate = 0.0
-    total = 0.0     # BTC
-    amount = 0.0    # LTC
-    currency_pair = 'BTC_LTC'
-    fee = 0.0
+    # histories hold one Order per trade for weeks, so keep the instances small
+    __slots__ = ('number', 'rate', 'total', 'amount', 'currency_pair', 'fee', 'date')
 
     def __init__(self, order, currency_pair):
         assert isinstance(order, dict)
         self.number = order['orderNumber']
         self.rate = float(order['rate'])
-        self.total = float(order['total'])
-        self.amount = float(order['amount'])
+        self.total = float(order['total'])      # BTC
+        self.amount = float(order['amount'])    # LTC
         self.fee = float(order['fee'])
         self.currency_pair = currency_pair
+        self.date = calendar.timegm(time.strptime(order['date'], '%Y-%m-%d %H:%M:%S')) if 'date' in order else 0
 
         if order['type'] == 'buy':
             self.total *= -1
@@ -1,37 +1,94 @@
-from trading import Poloniex, Order
+from trading import Poloniex, Order, clock
 from trading.logger import log
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime
+from itertools import islice
+import calendar
 
 
+# a cursor over the account trade history of one pair: the first update downloads the last few minutes of trades,
+# every later update only downloads the trades that happened since the newest one it has seen.
+# max_orders and max_age (in minutes) bound how many trades are kept, 0 keeps everything.
 class OrderHistory:
     poloniex = None
-    orders = []
     currency_pair = ''
     minutes = 0
+    max_orders = 0
+    max_age = 0
 
-    def __init__(self, poloniex, minutes, currency_pair='BTC_LTC'):
+    def __init__(self, poloniex, minutes, currency_pair='BTC_LTC', max_orders=0, max_age=0):
         assert isinstance(poloniex, Poloniex)
         self.poloniex = poloniex
         self.minutes = max(minutes, 5)
         self.currency_pair = currency_pair
+        self.max_orders = max_orders
+        self.max_age = max_age
+
+        self.orders = deque()   # oldest trade first
+        self.total_count = 0    # trades appended since the history was created
+        self.evicted_count = 0  # trades dropped from the front because of max_orders or max_age
+        self._by_number = {}    # order number -> trades of that order, oldest first
+        self._last_trade_id = 0
+        self._last_date = None
         self.update()
 
     def update(self):
-        self.orders.clear()
-        start = datetime.now() - timedelta(minutes=self.minutes)
+        if self._last_date is None:
+            start = datetime.utcfromtimestamp(clock.time() - self.minutes * 60)
+        else:
+            # trades from the same second as the newest one may not have been returned yet
+            start = datetime.utcfromtimestamp(self._last_date)
+
         history = self.poloniex.returnAccountTradeHistory(self.currency_pair, start)
         if 'error' in history:
             log(history['error'], True)
-        else:
-            for order in history:
-                self.orders.insert(0, Order(order, self.currency_pair))
+            return []
+
+        new_orders = []
+        for trade in reversed(history):  # the newest trade is returned first
+            trade_id = int(trade.get('globalTradeID', trade.get('tradeID', 0)))
+            if trade_id != 0 and trade_id <= self._last_trade_id:
+                continue
+
+            order = Order(trade, self.currency_pair)
+            self.orders.append(order)
+            self._by_number.setdefault(order.number, []).append(order)
+            new_orders.append(order)
+
+            self._last_trade_id = max(self._last_trade_id, trade_id)
+            if order.date != 0:
+                self._last_date = order.date
+
+        if self._last_date is None:
+            self._last_date = calendar.timegm(start.timetuple())
+
+        self.total_count += len(new_orders)
+        self.evict()
+        return new_orders
+
+    def evict(self):
+        oldest_date = clock.time() - self.max_age * 60 if self.max_age > 0 else 0
+        while len(self.orders) > 0 and (0 < self.max_orders < len(self.orders) or self.orders[0].date < oldest_date):
+            order = self.orders.popleft()
+            trades = self._by_number[order.number]
+            trades.remove(order)
+            if len(trades) == 0:
+                del self._by_number[order.number]
+            self.evicted_count += 1
+
+    # the trades appended after the history had seen count trades in total (as far as they are still kept)
+    def orders_since(self, count):
+        return list(islice(self.orders, max(count - self.evicted_count, 0), None))
 
     def get_order(self, order_number):
         assert isinstance(order_number, str)
-        for order in self.orders:
-            assert isinstance(order, Order)
-            if order.number == order_number:
-                return order
+        trades = self._by_number.get(order_number)
+        if trades:
+            return trades[0]
 
         return None
         # raise IndexError('The order with the specified number does not exist')
+
+    def get_order_trades(self, order_number):
+        assert isinstance(order_number, str)
+        return list(self._by_number.get(order_number, []))
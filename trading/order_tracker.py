@@ -0,0 +1,154 @@
+from trading import Poloniex, Order, OrderHistory, clock
+from enum import Enum
+
+
+class OrderState(Enum):
+    pending = 0
+    partial = 1
+    filled = 2
+
+
+class OrderStatus:
+    number = ''
+    amount = 0.0
+    filled_amount = 0.0
+    order = None
+    trades = []
+    state = OrderState.pending
+
+    def __init__(self, number, amount, order=None, trades=None):
+        self.number = number
+        self.amount = abs(amount)
+        self.order = order
+        self.trades = trades if trades is not None else []
+        self.filled_amount = abs(order.amount) if order is not None else 0.0
+
+        if self.filled_amount <= 0.0:
+            self.state = OrderState.pending
+        elif self.filled_amount < self.amount - 0.00000001:
+            self.state = OrderState.partial
+        else:
+            self.state = OrderState.filled
+
+    def is_pending(self):
+        return self.state == OrderState.pending
+
+    def is_partial(self):
+        return self.state == OrderState.partial
+
+    def is_filled(self):
+        return self.state == OrderState.filled
+
+
+# an order that is followed by an OrderTracker until it fills or its deadline passes
+class FollowedOrder:
+    status = None
+    deadline = 0.0
+    next_check = 0.0
+    delay = 0.0
+
+    def __init__(self, status, deadline, next_check, delay):
+        self.status = status
+        self.deadline = deadline
+        self.next_check = next_check
+        self.delay = delay
+
+
+# looks placed orders up by number in a single trade history that is reused between checks. Orders that were not
+# filled when they were placed are followed until they fill or timeout seconds have passed, they stay open on the
+# exchange either way. Every update of the history looks them up, and poll() downloads it between updates: first
+# after initial_delay seconds, then after twice the delay of the last check up to max_delay, and a last time at
+# the deadline. That way an order placed in one update cycle is followed within its timeout, however long the
+# cycle is.
+class OrderTracker:
+    history = None
+    timeout = 0.0
+    initial_delay = 0.0
+    max_delay = 0.0
+
+    def __init__(self, poloniex, currency_pair='BTC_LTC', minutes=60, timeout=30.0, history=None, initial_delay=0.5,
+                 max_delay=8.0):
+        assert isinstance(poloniex, Poloniex)
+        self.history = history if history is not None else OrderHistory(poloniex, minutes, currency_pair)
+        assert isinstance(self.history, OrderHistory)
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.open_orders = {}  # order number -> FollowedOrder
+
+    # update=False looks the order up in the history as it is, without downloading the trades since the last check
+    def check(self, order_number, amount, update=True):
+        assert isinstance(order_number, str)
+        if update:
+            self.history.update()
+
+        # a partially filled order shows up as one trade per fill
+        combined = None
+        trades = self.history.get_order_trades(order_number)
+        for order in trades:
+            assert isinstance(order, Order)
+            combined = Order.from_currency_pair(order.type(), order.currency_pair).combine(order) \
+                if combined is None else combined.combine(order)
+
+        if combined is not None:
+            combined.number = order_number
+        return OrderStatus(order_number, amount, combined, trades)
+
+    # follow an order that is not filled yet
+    def track(self, status):
+        assert isinstance(status, OrderStatus)
+        if not status.is_filled():
+            now = clock.time()
+            deadline = now + self.timeout
+            self.open_orders[status.number] = FollowedOrder(status, deadline, min(now + self.initial_delay, deadline),
+                                                            self.initial_delay)
+
+    # looks the followed orders up in the history as it is, returns [(previous status, status)] of the orders that
+    # were filled further since the last look or are no longer followed because they filled or their deadline passed
+    def update_open_orders(self):
+        return self._look_up(list(self.open_orders))
+
+    # when the next followed order is due to be checked by poll(), None if no order is followed
+    def next_poll(self):
+        if len(self.open_orders) == 0:
+            return None
+        return min(followed.next_check for followed in self.open_orders.values())
+
+    # downloads the history if a followed order is due to be checked and looks the due orders up in it, returns
+    # what update_open_orders() returns for them
+    def poll(self):
+        now = clock.time()
+        due = [order_number for order_number, followed in self.open_orders.items() if followed.next_check <= now]
+        if len(due) == 0:
+            return []
+
+        # schedule the next checks first, a failed download must not be retried right away
+        for order_number in due:
+            followed = self.open_orders[order_number]
+            followed.delay = min(followed.delay * 2, self.max_delay)
+            followed.next_check = min(now + followed.delay, followed.deadline)
+            if followed.next_check <= now:
+                followed.next_check = now + followed.delay
+
+        self.history.update()
+        return self._look_up(due)
+
+    def _look_up(self, order_numbers):
+        changed = []
+        now = clock.time()
+        for order_number in order_numbers:
+            followed = self.open_orders[order_number]
+            previous = followed.status
+            status = self.check(order_number, previous.amount, update=False)
+            if status.is_filled() or now >= followed.deadline:
+                del self.open_orders[order_number]
+                changed.append((previous, status))
+            else:
+                followed.status = status
+                if status.filled_amount > previous.filled_amount:
+                    changed.append((previous, status))
+
+        return changed
+
+    def is_open(self, order_number):
+        return order_number in self.open_orders
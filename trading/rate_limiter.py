@@ -0,0 +1,87 @@
+from enum import Enum
+import heapq
+import itertools
+import threading
+import time
+
+
+class RequestPriority(Enum):
+    order = 0           # placing and cancelling orders
+    account = 1         # balances, open orders and trade history
+    market_data = 2     # ticker, chart data and order books
+
+
+class TokenBucket:
+    rate = 0.0
+    capacity = 0.0
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(self.rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.time()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # seconds until one token is available
+    def delay(self):
+        return max(1.0 - self.tokens, 0.0) / self.rate
+
+
+# Every request takes a token from the bucket of its endpoint (public or private) before it is sent. Requests that
+# have to wait are queued by priority, so orders and cancels go out before market data that was queued earlier.
+class RequestScheduler:
+    def __init__(self, public_rate=6.0, private_rate=6.0):
+        self._buckets = {'public': TokenBucket(public_rate), 'private': TokenBucket(private_rate)}
+        self._queues = {'public': [], 'private': []}
+        self._stats = {'public': [0, 0.0, 0.0], 'private': [0, 0.0, 0.0]}  # requests, total wait, longest wait
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+
+    # blocks until the request may be sent, returns how long it waited
+    def acquire(self, endpoint, priority=RequestPriority.market_data):
+        bucket = self._buckets[endpoint]
+        queue = self._queues[endpoint]
+        start = time.time()
+
+        with self._condition:
+            ticket = (priority.value, next(self._tickets))
+            heapq.heappush(queue, ticket)
+            while True:
+                bucket.refill(time.time())
+                if queue[0] == ticket and bucket.tokens >= 1.0:
+                    heapq.heappop(queue)
+                    bucket.tokens -= 1.0
+                    break
+                self._condition.wait(bucket.delay() if queue[0] == ticket else None)
+            # the next request in line may be able to go as well
+            self._condition.notify_all()
+
+            waited = time.time() - start
+            stats = self._stats[endpoint]
+            stats[0] += 1
+            stats[1] += waited
+            stats[2] = max(stats[2], waited)
+            return waited
+
+    def metrics(self):
+        with self._condition:
+            metrics = {}
+            for endpoint, (requests, total_wait, max_wait) in self._stats.items():
+                metrics[endpoint] = {
+                    'queue_depth': len(self._queues[endpoint]),
+                    'requests': requests,
+                    'average_wait': total_wait / requests if requests > 0 else 0.0,
+                    'max_wait': max_wait
+                }
+            return metrics
+
+    # a line for the log: the requests sent per endpoint, how long they waited and how many are waiting now
+    def summary(self):
+        metrics = self.metrics()
+        return 'Requests: ' + ', '.join(
+            '{0} {1} (waited {2:.2f}s on average, {3:.2f}s at most, {4} queued)'.format(
+                endpoint, m['requests'], m['average_wait'], m['max_wait'], m['queue_depth'])
+            for endpoint, m in sorted(metrics.items()))
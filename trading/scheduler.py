@@ -0,0 +1,77 @@
+from trading.trade_algorithms import ITradeAlgorithm
+from trading.rate_limiter import RequestScheduler
+from trading import clock
+from trading.logger import log
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import random
+
+
+# runs the update of every algorithm on its own timer; updates are mostly waiting on the network, so up to
+# max_concurrent of them run at the same time on a thread pool. Between two updates the polls an algorithm asks for
+# with next_poll() run on the same timer, so they never overlap with an update of the same algorithm. With a
+# rate_limiter, how long requests had to wait for it is logged every update_interval.
+class UpdateScheduler:
+    update_interval = 0.0
+    max_concurrent = 1
+
+    def __init__(self, update_interval, max_concurrent=4, rate_limiter=None):
+        self.update_interval = update_interval
+        self.max_concurrent = max(int(max_concurrent), 1)
+        self.rate_limiter = rate_limiter
+        assert rate_limiter is None or isinstance(rate_limiter, RequestScheduler)
+        self.algorithms = []
+
+    def add(self, algorithm):
+        assert isinstance(algorithm, ITradeAlgorithm)
+        self.algorithms.append(algorithm)
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrent)
+        try:
+            loop.run_until_complete(self._run_all(loop, executor))
+        finally:
+            executor.shutdown(wait=False)
+            loop.close()
+
+    async def _run_all(self, loop, executor):
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        # stagger the first updates like the timers used to
+        tasks = []
+        delay = 0
+        for algorithm in self.algorithms:
+            tasks.append(self._update_loop(loop, executor, semaphore, algorithm, delay))
+            delay += random.randint(1, 10)
+        if self.rate_limiter is not None:
+            tasks.append(self._report_loop())
+
+        await asyncio.gather(*tasks)
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.update_interval)
+            log(self.rate_limiter.summary())
+
+    async def _update_loop(self, loop, executor, semaphore, algorithm, delay):
+        await asyncio.sleep(delay)
+        while True:
+            await self._run(loop, executor, semaphore, algorithm.update)
+            next_update = clock.time() + self.update_interval + random.randint(1, 10)
+
+            while True:
+                next_poll = algorithm.next_poll()
+                if next_poll is None or next_poll >= next_update:
+                    break
+                await asyncio.sleep(max(next_poll - clock.time(), 0))
+                await self._run(loop, executor, semaphore, algorithm.poll)
+
+            await asyncio.sleep(max(next_update - clock.time(), 0))
+
+    async def _run(self, loop, executor, semaphore, function):
+        async with semaphore:
+            try:
+                await loop.run_in_executor(executor, function)
+            except Exception as e:
+                log('An error occurred: ' + str(e.args), True)
@@ -0,0 +1,82 @@
+from array import array
+import mmap
+import os
+
+# the columns of a returnChartData candle, the date is an int64 and everything else a float64
+candle_fields = ('date', 'high', 'low', 'open', 'close', 'volume', 'quoteVolume', 'weightedAverage')
+
+
+# a read-only sequence of candle dicts that are built on access from column arrays, so that a recording can live in
+# memory shared between processes instead of as one dict per candle in each of them
+class CandleColumns:
+    def __init__(self, columns):
+        assert set(columns) == set(candle_fields)
+        self.columns = columns
+        self.dates = columns['date']
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._candle(i) for i in range(*index.indices(len(self)))]
+        return self._candle(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._candle(i)
+
+    def _candle(self, i):
+        return dict((field, self.columns[field][i]) for field in candle_fields)
+
+
+# Writes candles as returned by load_candles to one file, column after column for each pair, and returns the index
+# {pair: (offset, count)} that SharedCandles needs to find them again
+def write_candles(path, candles):
+    index = {}
+    offset = 0
+    with open(path, 'wb') as file:
+        for currency_pair in sorted(candles):
+            pair_candles = candles[currency_pair]
+            for field in candle_fields:
+                if field == 'date':
+                    column = array('q', (int(c['date']) for c in pair_candles))
+                else:
+                    column = array('d', (float(c[field]) for c in pair_candles))
+                file.write(column.tobytes())
+            index[currency_pair] = (offset, len(pair_candles))
+            offset += len(pair_candles) * 8 * len(candle_fields)
+    return index
+
+
+# The candles of a file written by write_candles, memory-mapped read-only. Every process that opens the same file
+# shares the pages with the others.
+class SharedCandles:
+    path = ''
+
+    def __init__(self, path, index):
+        self.path = path
+        self.index = index
+        self._map = None
+        self._view = memoryview(b'')
+        if os.path.getsize(path) > 0:  # an empty file cannot be mapped
+            with open(path, 'rb') as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+
+    def pairs(self):
+        return sorted(self.index)
+
+    def get(self, currency_pair):
+        offset, count = self.index[currency_pair]
+        columns = {}
+        for field in candle_fields:
+            column = self._view[offset:offset + count * 8]
+            columns[field] = column.cast('q' if field == 'date' else 'd')
+            offset += count * 8
+        return CandleColumns(columns)
+
+    # a dict like load_candles returns, for the given pairs or all of them
+    def candles(self, currency_pairs=None):
+        currency_pairs = self.pairs() if currency_pairs is None else currency_pairs
+        return dict((currency_pair, self.get(currency_pair)) for currency_pair in currency_pairs)
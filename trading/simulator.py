@@ -0,0 +1,283 @@
+from trading.api import Poloniex
+from trading import clock as default_clock
+from trading.shared_candles import CandleColumns
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import calendar
+import itertools
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+try:
+    # For Python 3.0 and later
+    from urllib.parse import urlsplit, parse_qsl
+except ImportError:
+    # Fall back to Python 2's urlparse
+    from urlparse import urlsplit, parse_qsl
+
+
+# Loads recorded 5 minute candles, one returnChartData response per pair saved as <data_dir>/<PAIR>.json
+def load_candles(data_dir):
+    candles = {}
+    for file_name in sorted(os.listdir(data_dir)):
+        if file_name.endswith('.json'):
+            with open(os.path.join(data_dir, file_name), 'r') as file:
+                chart_data = [c for c in json.load(file) if int(c['date']) != 0]
+            candles[file_name[:-len('.json')]] = sorted(chart_data, key=lambda c: int(c['date']))
+    return candles
+
+
+# Loads recorded account trades, one returnTradeHistory response per pair saved as <data_dir>/trades/<PAIR>.json
+def load_trade_history(data_dir):
+    trade_history = {}
+    trades_dir = os.path.join(data_dir, 'trades')
+    if os.path.isdir(trades_dir):
+        for file_name in sorted(os.listdir(trades_dir)):
+            if file_name.endswith('.json'):
+                with open(os.path.join(trades_dir, file_name), 'r') as file:
+                    trade_history[file_name[:-len('.json')]] = json.load(file)
+    return trade_history
+
+
+# An in-process stand-in for poloniex.com. It replaces only the transport of the Poloniex client, so rate limiting,
+# nonces and json handling run exactly like they do against the exchange.
+#
+# The recorded candles are replayed against the clock: the replay starts `warm_up` seconds into the recording (so the
+# bot finds some history) at the moment the simulator is created and runs `speed` times faster than the clock. Every
+# timestamp the simulator hands out is in clock time. Only candles that have closed are visible. Orders fill against
+# the ticker of the last closed candle: a buy fills at the ask once its rate reaches it, a sell at the bid, both paying
+# `fee` in the currency they receive. trade_history optionally holds recorded account trades per pair
+# (returnTradeHistory responses) that the account starts with.
+class SimulatedPoloniex(Poloniex):
+    def __init__(self, candles, balances, fee=0.0025, spread=0.002, speed=1.0, warm_up=16 * 60 * 60, period=300,
+                 latency=(0.0, 0.0), error_rate=0.0, failure_rate=0.0, clock=None, rate_limiter=None, nonces=None,
+                 trade_history=None):
+        Poloniex.__init__(self, 'simulator', 'simulator', rate_limiter=rate_limiter, nonces=nonces)
+        self.candles = candles
+        self.balances = dict((currency, float(amount)) for currency, amount in balances.items())
+        for currency_pair in candles:
+            for currency in currency_pair.split('_'):
+                self.balances.setdefault(currency, 0.0)
+        self.fee = fee
+        self.spread = spread
+        self.speed = speed
+        self.latency = latency
+        self.error_rate = error_rate
+        self.failure_rate = failure_rate
+        self.period = period
+        self.clock = clock if clock is not None else default_clock
+
+        self._dates = dict((pair, pair_candles.dates if isinstance(pair_candles, CandleColumns) else
+                            [int(c['date']) for c in pair_candles]) for pair, pair_candles in candles.items())
+        first_date = min(dates[0] for dates in self._dates.values() if len(dates) > 0)
+        self.replay_start = first_date + warm_up
+        self.clock_start = self.clock.time()
+
+        self.open_orders = {}   # order number -> order dict
+        self.trades = []        # every fill, oldest first
+        self._pair_trades = {}  # currency pair -> (fill times, fills), oldest first
+        self.fees_paid = {}     # currency -> fees
+        self._order_numbers = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self._last_nonce = 0
+        self._matched_candle = None
+        self._lock = threading.RLock()
+
+        for currency_pair, trades in (trade_history or {}).items():
+            for trade in sorted(trades, key=lambda t: (t['date'], int(t.get('globalTradeID', t.get('tradeID', 0))))):
+                timestamp = self.clock_time(calendar.timegm(time.strptime(trade['date'], '%Y-%m-%d %H:%M:%S')))
+                self._add_trade(dict(trade, date=self._format_date(timestamp), currencyPair=currency_pair,
+                                     globalTradeID=next(self._trade_ids)), timestamp)
+
+    # recorded time that the replay has reached
+    def market_time(self):
+        return self.replay_start + (self.clock.time() - self.clock_start) * self.speed
+
+    # clock time at which a recorded timestamp is replayed
+    def clock_time(self, date):
+        return self.clock_start + (date - self.replay_start) / self.speed
+
+    # the last candle that has closed
+    def candle(self, currency_pair):
+        dates = self._dates.get(currency_pair)
+        if not dates:
+            return None
+        index = bisect_right(dates, self.market_time() - self.period) - 1
+        return self.candles[currency_pair][max(index, 0)]
+
+    def bid_ask(self, currency_pair):
+        price = float(self.candle(currency_pair)['close'])
+        return price * (1 - self.spread / 2), price * (1 + self.spread / 2)
+
+    def _send(self, method, path, body=None, headers=None, timeout=None):
+        if self.latency[1] > 0:
+            time.sleep(random.uniform(*self.latency))
+        if random.random() < self.failure_rate:
+            raise socket.timeout('timed out (simulated)')
+
+        url = urlsplit(path)
+        params = dict(parse_qsl(url.query if method == 'GET' else body.decode('utf-8')))
+
+        with self._lock:
+            if random.random() < self.error_rate:
+                ret = {'error': 'Simulated error'}
+            elif method == 'GET':
+                ret = self._public_command(params)
+            else:
+                ret = self._private_command(params)
+
+        return 200, json.dumps(ret).encode('utf-8')
+
+    def _public_command(self, params):
+        command = params['command']
+        if command == 'returnTicker':
+            return self.return_ticker()
+        elif command == 'returnChartData':
+            return self.return_chart_data(params['currencyPair'], float(params.get('start', 0)),
+                                          float(params.get('end', self.clock.time())))
+        elif command == 'returnOrderBook':
+            bid, ask = self.bid_ask(params['currencyPair'])
+            return {'asks': [['%.8f' % ask, 1000000.0]], 'bids': [['%.8f' % bid, 1000000.0]], 'isFrozen': '0'}
+        elif command == 'return24hVolume':
+            return {}
+        return {'error': 'Invalid command.'}
+
+    def _private_command(self, params):
+        nonce = int(params['nonce'])
+        if nonce <= self._last_nonce:
+            return {'error': 'Nonce must be greater than ' + str(self._last_nonce) + '. You provided ' + str(nonce) + '.'}
+        self._last_nonce = nonce
+
+        self.match_orders()
+        command = params['command']
+        if command == 'returnBalances':
+            return dict((currency, '%.8f' % amount) for currency, amount in self.balances.items())
+        elif command == 'returnOpenOrders':
+            return [self._format_order(order) for order in self.open_orders.values()
+                    if order['currencyPair'] == params['currencyPair']]
+        elif command == 'returnTradeHistory':
+            timestamps, trades = self._pair_trades.get(params['currencyPair'], ([], []))
+            first = bisect_left(timestamps, float(params.get('start', 0)))
+            return [dict(trade) for trade in reversed(trades[first:])]
+        elif command in ['buy', 'sell']:
+            return self.place_order(command, params['currencyPair'], float(params['rate']), float(params['amount']))
+        elif command == 'cancelOrder':
+            return self.cancel_order(params['orderNumber'])
+        return {'error': 'Invalid command.'}
+
+    def return_ticker(self):
+        ticker = {}
+        for currency_pair in self.candles:
+            candle = self.candle(currency_pair)
+            if candle is not None:
+                bid, ask = self.bid_ask(currency_pair)
+                ticker[currency_pair] = {'last': '%.8f' % float(candle['close']), 'lowestAsk': '%.8f' % ask,
+                                         'highestBid': '%.8f' % bid, 'percentChange': '0.0',
+                                         'baseVolume': str(candle['volume']), 'quoteVolume': str(candle['quoteVolume'])}
+        return ticker
+
+    def return_chart_data(self, currency_pair, start, end):
+        dates = self._dates.get(currency_pair, [])
+        first = bisect_right(dates, self.replay_start + (start - self.clock_start) * self.speed - 1)
+        last = bisect_right(dates, min(self.replay_start + (end - self.clock_start) * self.speed,
+                                       self.market_time() - self.period))
+
+        chart_data = []
+        for candle in self.candles[currency_pair][first:last] if currency_pair in self.candles else []:
+            candle = dict(candle)
+            candle['date'] = int(self.clock_time(int(candle['date'])))
+            chart_data.append(candle)
+        return chart_data if chart_data else [{'date': 0, 'high': 0, 'low': 0, 'open': 0, 'close': 0, 'volume': 0,
+                                               'quoteVolume': 0, 'weightedAverage': 0}]
+
+    def place_order(self, type, currency_pair, rate, amount):
+        main, alt = currency_pair.split('_')
+        if type == 'buy' and self.balances.get(main, 0.0) < rate * amount:
+            return {'error': 'Not enough ' + main + '.'}
+        if type == 'sell' and self.balances.get(alt, 0.0) < amount:
+            return {'error': 'Not enough ' + alt + '.'}
+        if currency_pair not in self.candles:
+            return {'error': 'Invalid currency pair.'}
+
+        # the order holds what it may spend
+        if type == 'buy':
+            self.balances[main] -= rate * amount
+        else:
+            self.balances[alt] -= amount
+
+        order = {'orderNumber': str(next(self._order_numbers)), 'type': type, 'currencyPair': currency_pair,
+                 'rate': rate, 'amount': amount, 'date': self.clock.time()}
+        self.open_orders[order['orderNumber']] = order
+        resulting_trades = self._match_order(order)
+        return {'orderNumber': order['orderNumber'], 'resultingTrades': resulting_trades}
+
+    def cancel_order(self, order_number):
+        order = self.open_orders.pop(str(order_number), None)
+        if order is None:
+            return {'success': 0, 'error': 'Invalid order number, or you are not the person who placed the order.'}
+
+        main, alt = order['currencyPair'].split('_')
+        if order['type'] == 'buy':
+            self.balances[main] += order['rate'] * order['amount']
+        else:
+            self.balances[alt] += order['amount']
+        return {'success': 1}
+
+    # new orders are matched when they are placed, resting ones only need another look once a candle has closed
+    def match_orders(self):
+        candle_number = int(self.market_time() // self.period)
+        if candle_number == self._matched_candle:
+            return
+        self._matched_candle = candle_number
+        for order in list(self.open_orders.values()):
+            self._match_order(order)
+
+    def _match_order(self, order):
+        bid, ask = self.bid_ask(order['currencyPair'])
+        if order['type'] == 'buy' and order['rate'] >= ask:
+            return [self._fill(order, ask)]
+        if order['type'] == 'sell' and order['rate'] <= bid:
+            return [self._fill(order, bid)]
+        return []
+
+    def _fill(self, order, rate):
+        main, alt = order['currencyPair'].split('_')
+        amount = order['amount']
+        total = rate * amount
+        del self.open_orders[order['orderNumber']]
+
+        if order['type'] == 'buy':
+            self.balances[main] += (order['rate'] - rate) * amount  # hand back what the order held beyond the fill
+            self.balances[alt] = self.balances.get(alt, 0.0) + amount * (1 - self.fee)
+            self.fees_paid[alt] = self.fees_paid.get(alt, 0.0) + amount * self.fee
+        else:
+            self.balances[main] = self.balances.get(main, 0.0) + total * (1 - self.fee)
+            self.fees_paid[main] = self.fees_paid.get(main, 0.0) + total * self.fee
+
+        now = self.clock.time()
+        trade = {'globalTradeID': next(self._trade_ids), 'tradeID': str(len(self.trades) + 1),
+                 'date': self._format_date(now), 'rate': '%.8f' % rate, 'amount': '%.8f' % amount,
+                 'total': '%.8f' % total, 'fee': '%.8f' % self.fee, 'orderNumber': order['orderNumber'],
+                 'type': order['type'], 'category': 'exchange', 'currencyPair': order['currencyPair']}
+        self._add_trade(trade, now)
+        return {'tradeID': trade['tradeID'], 'date': trade['date'], 'rate': trade['rate'], 'amount': trade['amount'],
+                'total': trade['total'], 'type': trade['type']}
+
+    def _add_trade(self, trade, timestamp):
+        self.trades.append(trade)
+        timestamps, trades = self._pair_trades.setdefault(trade['currencyPair'], ([], []))
+        timestamps.append(timestamp)
+        trades.append(trade)
+
+    @staticmethod
+    def _format_date(timestamp):
+        return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+    @staticmethod
+    def _format_order(order):
+        return {'orderNumber': order['orderNumber'], 'type': order['type'], 'rate': '%.8f' % order['rate'],
+                'amount': '%.8f' % order['amount'], 'total': '%.8f' % (order['rate'] * order['amount'])}
@@ -0,0 +1,136 @@
+from trading.backtest import Backtest
+from trading.shared_candles import SharedCandles, write_candles
+from trading.trade_currency import TradeCurrency
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import tempfile
+
+# the TradeCurrency fields a sweep can vary: their key in config.cfg and what the config value is divided by
+sweep_fields = {
+    'main_percent': ('main_percent', 100.0),
+    'alt_percent': ('alt_percent', 100.0),
+    'min_buy_profit': ('min_buy_profit', 100.0),
+    'min_sell_profit': ('min_sell_profit', 100.0),
+    'new_order_threshold': ('new_order_threshold', 100.0),
+    'trading_history_in_minutes': ('trading_history', 1.0),
+}
+
+
+class SweepResult:
+    currency_pair = ''
+    settings = None     # TradeCurrency field -> value in config.cfg units
+    pnl_percent = 0.0
+    excess_percent = 0.0
+    fee_drag = 0.0
+    trades = 0
+    errors = 0
+
+    def __init__(self, currency_pair, settings, result):
+        self.currency_pair = currency_pair
+        self.settings = settings
+        self.pnl_percent = result.pnl_percent() * 100
+        self.excess_percent = result.excess_return() / result.start_value * 100 if result.start_value > 0 else 0.0
+        self.fee_drag = result.fee_drag() * 100
+        self.trades = result.trades()
+        self.errors = result.errors
+
+    def config_section(self):
+        lines = ['[' + self.currency_pair + ']',
+                 '# {0:.2f}% PnL, {1:+.2f}% against holding, {2} trades, {3:.2f}% fees'.format(
+                     self.pnl_percent, self.excess_percent, self.trades, self.fee_drag)]
+        for field in sorted(self.settings):
+            lines.append(sweep_fields[field][0] + ' = ' + '{0:g}'.format(self.settings[field]))
+        return '\n'.join(lines)
+
+
+# Backtests every combination of the given settings on every pair, spread over a pool of processes. ranges maps
+# TradeCurrency fields to the values to try in config.cfg units (percent, minutes), the other fields keep the values of
+# each pair's TradeCurrency. The candles are written once to a file that every worker memory-maps, so the recording is
+# neither copied nor pickled per worker or per backtest.
+class ParameterSweep:
+    processes = 0
+
+    def __init__(self, candles, balances, currencies, ranges, trade_history=None, processes=None, start=None,
+                 end=None, **backtest_options):
+        for field in ranges:
+            if field not in sweep_fields:
+                raise ValueError('Cannot sweep ' + field)
+        for currency in currencies:
+            assert isinstance(currency, TradeCurrency)
+        self.candles = candles
+        self.balances = balances
+        self.currencies = [currency for currency in currencies if currency.currency_pair in candles]
+        self.ranges = ranges
+        self.trade_history = trade_history if trade_history is not None else {}
+        self.processes = processes if processes is not None else os.cpu_count()
+        self.start = start
+        self.end = end
+        self.backtest_options = backtest_options
+
+    def combinations(self):
+        fields = sorted(self.ranges)
+        return [dict(zip(fields, values)) for values in itertools.product(*[self.ranges[f] for f in fields])]
+
+    # returns the SweepResults of every pair, best first
+    def run(self):
+        tasks = [(currency, settings) for currency in self.currencies for settings in self.combinations()]
+
+        descriptor, path = tempfile.mkstemp(suffix='.candles')
+        os.close(descriptor)
+        try:
+            index = write_candles(path, dict((c.currency_pair, self.candles[c.currency_pair]) for c in self.currencies))
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                     initargs=(path, index, self.balances, self.trade_history, self.start, self.end,
+                                               self.backtest_options)) as executor:
+                results = list(executor.map(_run_task, tasks, chunksize=max(len(tasks) // (self.processes * 4), 1)))
+        finally:
+            os.remove(path)
+
+        return sorted(results, key=lambda r: (r.currency_pair, -r.pnl_percent))
+
+
+def report(results, top=10):
+    lines = []
+    for currency_pair, pair_results in itertools.groupby(results, key=lambda r: r.currency_pair):
+        pair_results = list(pair_results)[:top]
+        fields = sorted(pair_results[0].settings)
+        lines.append(currency_pair)
+        lines.append('{0:>4} {1:>9} {2:>9} {3:>7} {4:>7} '.format('rank', 'pnl %', 'vs hold', 'trades', 'fees %') +
+                     ' '.join('{0:>19}'.format(sweep_fields[f][0]) for f in fields))
+        for rank, result in enumerate(pair_results, 1):
+            lines.append('{0:>4} {1:>9.2f} {2:>+9.2f} {3:>7} {4:>7.2f} '.format(
+                rank, result.pnl_percent, result.excess_percent, result.trades, result.fee_drag) +
+                ' '.join('{0:>19g}'.format(result.settings[f]) for f in fields))
+        lines.append('')
+        lines.append(pair_results[0].config_section())
+        lines.append('')
+    return '\n'.join(lines)
+
+
+# set by _init_worker in each process of the pool
+_worker = {}
+
+
+def _init_worker(path, index, balances, trade_history, start, end, backtest_options):
+    _worker['candles'] = SharedCandles(path, index)
+    _worker['balances'] = balances
+    _worker['trade_history'] = trade_history
+    _worker['start'] = start
+    _worker['end'] = end
+    _worker['backtest_options'] = backtest_options
+
+
+def _run_task(task):
+    currency, settings = task
+    currency = TradeCurrency.from_tc(currency)
+    for field, value in settings.items():
+        setattr(currency, field, value / sweep_fields[field][1])
+
+    currency_pair = currency.currency_pair
+    main, alt = currency_pair.split('_')
+    balances = dict((c, amount) for c, amount in _worker['balances'].items() if c in [main, alt])
+    trade_history = dict((p, trades) for p, trades in _worker['trade_history'].items() if p == currency_pair)
+    backtest = Backtest(_worker['candles'].candles([currency_pair]), balances, [currency],
+                        trade_history=trade_history, value_currency=main, **_worker['backtest_options'])
+    return SweepResult(currency_pair, settings, backtest.run(_worker['start'], _worker['end']))
@@ -0,0 +1,50 @@
+from trading import Poloniex, clock
+import threading
+
+
+class TickerSnapshot:
+    ticker = None
+    timestamp = 0.0
+
+    def __init__(self, ticker, timestamp):
+        assert isinstance(ticker, dict)
+        self.ticker = ticker
+        self.timestamp = timestamp
+
+    def age(self):
+        return clock.time() - self.timestamp
+
+    def is_stale(self, max_age):
+        return max_age > 0 and self.age() > max_age
+
+    def get_pair(self, currency_pair):
+        if currency_pair not in self.ticker:
+            raise RuntimeError('The ticker does not contain ' + currency_pair)
+        return self.ticker[currency_pair]
+
+
+# one returnTicker response shared by every algorithm; it is only downloaded again once it is older than ttl seconds
+class TickerCache:
+    poloniex = None
+    ttl = 0.0
+
+    def __init__(self, poloniex, ttl=30.0):
+        assert isinstance(poloniex, Poloniex)
+        self.poloniex = poloniex
+        self.ttl = ttl
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            if self._snapshot is None or self._snapshot.age() >= self.ttl:
+                ticker = self.poloniex.returnTicker()
+                if 'error' in ticker:
+                    raise RuntimeError(ticker['error'])
+                self._snapshot = TickerSnapshot(ticker, clock.time())
+
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
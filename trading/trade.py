@@ -1,6 +1,4 @@
-from trading import Poloniex, OrderHistory
-from trading.logger import log
-import time
+from trading import Poloniex, OrderTracker
 
 
 class Trade:
@@ -11,41 +9,41 @@ class Trade:
         self.buy_order = buy
         self.sell_order = sell
 
-    def buy(self, poloniex, rate, amount, currency_pair='BTC_LTC'):
+    # returns the OrderStatus of the new order right after it is placed, the tracker can follow it from there
+    def buy(self, poloniex, rate, amount, currency_pair='BTC_LTC', tracker=None):
         assert isinstance(poloniex, Poloniex)
 
         order = poloniex.buy(currencyPair=currency_pair, rate=rate, amount=amount)
         if 'error' in order:
             raise RuntimeError(order['error'])
         else:
-            order_number = order['orderNumber']
+            if tracker is None:
+                tracker = OrderTracker(poloniex, currency_pair, minutes=60)
+            assert isinstance(tracker, OrderTracker)
 
-            # wait until the trade propagates before returning.
-            order = None
-            while order is None:
-                time.sleep(1)
-                order = OrderHistory(poloniex, minutes=60, currency_pair=currency_pair).get_order(order_number)
+            # fills that happen later show up in the tracker's history
+            status = tracker.check(str(order['orderNumber']), amount)
 
-            self.buy_order = order
-            return self.buy_order
+            self.buy_order = status.order
+            return status
 
-    def sell(self, poloniex, rate, amount, currency_pair='BTC_LTC'):
+    # returns the OrderStatus of the new order right after it is placed, the tracker can follow it from there
+    def sell(self, poloniex, rate, amount, currency_pair='BTC_LTC', tracker=None):
         assert isinstance(poloniex, Poloniex)
 
         order = poloniex.sell(currencyPair=currency_pair, rate=rate, amount=amount)
         if 'error' in order:
             raise RuntimeError(order['error'])
         else:
-            order_number = order['orderNumber']
+            if tracker is None:
+                tracker = OrderTracker(poloniex, currency_pair, minutes=15)
+            assert isinstance(tracker, OrderTracker)
 
-            # wait until the trade propagates before returning.
-            order = None
-            while order is None:
-                time.sleep(1)
-                order = OrderHistory(poloniex, minutes=15, currency_pair=currency_pair).get_order(order_number)
+            # fills that happen later show up in the tracker's history
+            status = tracker.check(str(order['orderNumber']), amount)
 
-            self.sell_order = order
-            return self.sell_order
+            self.sell_order = status.order
+            return status
 
     def complete(self):
         return self.buy_order is not None and self.sell_order is not None
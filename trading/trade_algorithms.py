@@ -1,9 +1,10 @@
-from trading import Poloniex, Trade, Order, OrderHistory
+from trading import Poloniex, Trade, Order, OrderHistory, OrderTracker, OrderStatus, BalanceService, TickerCache, \
+    CandleStore, clock
 from trading.trade_currency import TradeCurrency
+from trading.indicators import StreamingEma, CandleEma, sma, ema
 from trading.logger import log
 import random
 import time
-from datetime import datetime, timedelta
 from enum import Enum
 
 
@@ -11,12 +12,17 @@ class TradeResult(Enum):
     none = 0
     success = 1
     failure = 2
+    pending = 3
 
 
 class ITradeAlgorithm:
     poloniex = None
     currency = None
-    start_time = datetime.now()
+    ticker_cache = None
+    max_ticker_age = 0.0
+    balances = None
+    candles = None
+    start_time = clock.now()
     highest_bid = 0.0
     lowest_ask = 0.0
     ema1 = 0.0
@@ -24,12 +30,17 @@ class ITradeAlgorithm:
     main_balance = 0.0
     alt_balance = 0.0
 
-    def __init__(self, poloniex, currency):
+    def __init__(self, poloniex, currency, ticker_cache=None, max_ticker_age=0.0, balances=None):
         assert isinstance(poloniex, Poloniex)
         assert isinstance(currency, TradeCurrency)
         self.poloniex = poloniex
         self.currency = currency
-        self.start_time = datetime.now()
+        self.ticker_cache = ticker_cache if ticker_cache is not None else TickerCache(poloniex)
+        self.max_ticker_age = max_ticker_age
+        self.balances = balances if balances is not None else BalanceService(poloniex)
+        assert isinstance(self.balances, BalanceService)
+        self.candles = CandleStore(poloniex, currency.currency_pair, period=300, hours=16)
+        self.start_time = clock.now()
 
         cp_split = currency.currency_pair.split('_')
         self.currency_main = cp_split[0]
@@ -38,6 +49,14 @@ class ITradeAlgorithm:
     def update(self):
         raise NotImplementedError()
 
+    # follows up on work of the last update before the next one is due, at the time next_poll() returns (None when
+    # there is nothing to follow up on)
+    def poll(self):
+        pass
+
+    def next_poll(self):
+        return None
+
 
 class MyTradeAlgorithm(ITradeAlgorithm):
     # combined_order = None
@@ -45,73 +64,114 @@ class MyTradeAlgorithm(ITradeAlgorithm):
     combined_sell = None
     last_trade_type = TradeResult.none
 
+    def __init__(self, poloniex, currency, ticker_cache=None, max_ticker_age=0.0, balances=None, order_timeout=30.0,
+                 history_max_orders=0, history_max_age=0):
+        ITradeAlgorithm.__init__(self, poloniex, currency, ticker_cache, max_ticker_age, balances)
+        self.order_timeout = order_timeout
+        self.history_max_orders = history_max_orders
+        self.history_max_age = history_max_age
+        self.history = None
+        self.order_tracker = None
+        self.orders_seen = 0
+        self.candle_ema1 = CandleEma(2)
+        self.candle_ema2 = CandleEma(4)
+        self.buy_rate_ema = StreamingEma(max_samples=history_max_orders)
+        self.sell_rate_ema = StreamingEma(max_samples=history_max_orders)
+
     def update(self):
-            self.update_balances()
             self.update_trade_history()
+            self.update_open_orders()
             self.update_chart_data()
-
+            self.update_balances()
             self.last_trade_type = self.trade_when_profitable()
 
     def update_trade_history(self):
-        time_diff = datetime.now() - self.start_time
-        minutes = self.currency.trading_history_in_minutes + (time_diff.total_seconds() / 60.0)
-        history = OrderHistory(self.poloniex, minutes, self.currency.currency_pair)
+        # the history is created on the first update so that it is anchored at the start of the bot
+        if self.history is None:
+            self.history = OrderHistory(self.poloniex, self.currency.trading_history_in_minutes, self.currency.currency_pair,
+                                        self.history_max_orders, self.history_max_age)
+            self.order_tracker = OrderTracker(self.poloniex, self.currency.currency_pair, timeout=self.order_timeout,
+                                              history=self.history)
+        else:
+            self.history.update()
 
-        self.combine_buy_sell_orders(history.orders)
+        # orders placed by this algorithm may already have been pulled in by the order tracker
+        self.combine_buy_sell_orders(self.history.orders_since(self.orders_seen))
+        self.orders_seen = self.history.total_count
 
+    # combines the orders that are new since the last update into the running buy and sell totals
     def combine_buy_sell_orders(self, orders):
-        buy_order_rates = []
-        sell_order_rates = []
-
-        for i, order in enumerate(orders):
+        for order in orders:
             if order.is_buy():
-                buy_order_rates.append(order.rate)
-                self.combined_buy = order if self.combined_buy is None else self.combined_buy.combine(order)
+                self.buy_rate_ema.push(order.rate)
+                if self.combined_buy is None:
+                    self.combined_buy = Order.from_currency_pair('buy', self.currency.currency_pair)
+                self.combined_buy.combine(order)
             else:
-                sell_order_rates.append(order.rate)
-                self.combined_sell = order if self.combined_sell is None else self.combined_sell.combine(order)
+                self.sell_rate_ema.push(order.rate)
+                if self.combined_sell is None:
+                    self.combined_sell = Order.from_currency_pair('sell', self.currency.currency_pair)
+                self.combined_sell.combine(order)
 
         # assign more weight to recent trades
         if self.combined_buy is not None:
-            self.combined_buy.rate = self.ema(buy_order_rates)
+            self.combined_buy.rate = self.buy_rate_ema.value()
         elif self.currency.initial_buy_rate > 0:
             log(self.currency.currency_pair + ': No previous buys. Using initial rate of ' + str(self.currency.initial_buy_rate) + ' ' + self.currency_main)
             self.combined_buy = Order.from_currency_pair('buy', self.currency.currency_pair)
             self.combined_buy.rate = self.currency.initial_buy_rate
 
         if self.combined_sell is not None:
-            self.combined_sell.rate = self.ema(sell_order_rates)
+            self.combined_sell.rate = self.sell_rate_ema.value()
         elif self.currency.initial_sell_rate > 0:
             log(self.currency.currency_pair + ': No previous sells. Using initial rate of ' + str(self.currency.initial_sell_rate))
             self.combined_sell = Order.from_currency_pair('sell', self.currency.currency_pair)
             self.combined_sell.rate = self.currency.initial_sell_rate
 
+    # orders that were not filled when they were placed are resolved from the trade history downloaded above
+    def update_open_orders(self):
+        self.follow_orders(self.order_tracker.update_open_orders())
+
+    # between updates the order tracker downloads the trade history on its own while it follows orders
+    def poll(self):
+        if self.order_tracker is not None:
+            self.follow_orders(self.order_tracker.poll())
+
+    def next_poll(self):
+        return self.order_tracker.next_poll() if self.order_tracker is not None else None
+
+    def follow_orders(self, changed):
+        for previous, status in changed:
+            if status.filled_amount > previous.filled_amount:
+                # the shared balances only know about the fills there were when the order was placed
+                self.balances.invalidate()
+
+            if status.is_filled():
+                log(self.currency.currency_pair + ': Order ' + status.number + ' has been filled', True)
+            elif not self.order_tracker.is_open(status.number):
+                log(self.currency.currency_pair + ': No longer following order ' + status.number +
+                    ', it stays open on the exchange', True)
+            else:
+                self.log_order_status(status)
+
     def update_chart_data(self):
-        ticker = self.poloniex.returnTicker()
-        if 'error' in ticker:
-            raise RuntimeError(ticker['error'])
+        snapshot = self.ticker_cache.snapshot()
+        if snapshot.is_stale(self.max_ticker_age):
+            raise RuntimeError('The ticker for ' + self.currency.currency_pair + ' is ' + "{0:.0f}".format(
+                snapshot.age()) + ' seconds old')
         else:
-            self.highest_bid = float(ticker[self.currency.currency_pair]['highestBid'])
-            self.lowest_ask = float(ticker[self.currency.currency_pair]['lowestAsk'])
-
-            start = datetime.now() - timedelta(hours=16)
-            chart_data = self.poloniex.returnChartData(currencyPair=self.currency.currency_pair, period=300, start=start)
-
-            ma = []
-            for data in chart_data:
-                ma.append(data['weightedAverage'])
+            ticker = snapshot.get_pair(self.currency.currency_pair)
+            self.highest_bid = float(ticker['highestBid'])
+            self.lowest_ask = float(ticker['lowestAsk'])
 
-            self.ema1 = self.ema(ma, int(len(ma) / 2))
-            self.ema2 = self.ema(ma, int(len(ma) / 4))
+            self.candles.update()
+            self.ema1 = self.candle_ema1.update(self.candles)
+            self.ema2 = self.candle_ema2.update(self.candles)
 
     def update_balances(self):
-        balances = self.poloniex.returnBalances()
-
-        if 'error' in balances:
-            raise RuntimeError(balances['error'])
-        else:
-            self.main_balance = float(balances[self.currency_main])
-            self.alt_balance = float(balances[self.currency_alt])
+        balances = self.balances.snapshot()
+        self.main_balance = balances[self.currency_main]
+        self.alt_balance = balances[self.currency_alt]
 
     def open_new_position(self):
         can_sell, can_buy = self.can_buy_or_sell()
@@ -214,14 +274,32 @@ class MyTradeAlgorithm(ITradeAlgorithm):
         return main_amount, amount
 
     def sell(self, amount, profit_percent):
-        if (self.alt_balance - amount) >= self.currency.min_alt and amount > 0:
+        # pairs that share a currency share its balance, which may have been spent since it was read
+        with self.balances.lock:
+            self.update_balances()
+            enough = (self.alt_balance - amount) >= self.currency.min_alt and amount > 0
+            if enough:
+                self.balances.reserve(self.currency.currency_pair, 'sell', self.highest_bid, amount)
+
+        if enough:
             log('Selling ' + str(amount) + ' ' + self.currency_alt + ' at a rate of ' + str(self.highest_bid) + ' ' + self.currency_main, True)
-            order = Trade().sell(self.poloniex, self.highest_bid, amount, self.currency.currency_pair)
-            if order is not None:
-                assert isinstance(order, Order)
-                log(str(datetime.now()) + ' - Sold ' + str(order.amount) + ' ' + self.currency_alt + ' for ' + str(
+            try:
+                status = Trade().sell(self.poloniex, self.highest_bid, amount, self.currency.currency_pair, self.order_tracker)
+            except Exception:
+                # the order may or may not have been placed
+                self.balances.invalidate()
+                raise
+            assert isinstance(status, OrderStatus)
+            self.balances.apply_order(self.currency.currency_pair, 'sell', status)
+            if status.order is not None:
+                order = status.order
+                log(str(clock.now()) + ' - Sold ' + str(order.amount) + ' ' + self.currency_alt + ' for ' + str(
                     order.total) + ' ' + self.currency_main + ' at ' + str(order.rate) + ' ' + self.currency_main + ' for a ' + "{0:.2f}".format(profit_percent * 100) + '% profit', True)
-                return TradeResult.success
+            self.log_order_status(status)
+            if not status.is_filled():
+                self.order_tracker.track(status)
+                return TradeResult.pending
+            return TradeResult.success
         elif self.last_trade_type != TradeResult.failure:
             if self.last_trade_type != TradeResult.failure:
                 log('Not enough funds in your ' + self.currency_alt + ' account! You need at least ' + str(self.currency.min_alt) + ' ' + self.currency_alt, True)
@@ -229,20 +307,46 @@ class MyTradeAlgorithm(ITradeAlgorithm):
         return TradeResult.failure
 
     def buy(self, main_amount, amount, profit_percent):
-        if (self.main_balance - main_amount) >= self.currency.min_main:
+        # pairs that share a currency share its balance, which may have been spent since it was read
+        with self.balances.lock:
+            self.update_balances()
+            enough = (self.main_balance - main_amount) >= self.currency.min_main
+            if enough:
+                self.balances.reserve(self.currency.currency_pair, 'buy', self.lowest_ask, amount)
+
+        if enough:
             log('Buying ' + str(amount) + ' ' + self.currency_alt + ' at a rate of ' + str(self.lowest_ask) + ' ' + self.currency_main, True)
-            order = Trade().buy(self.poloniex, self.lowest_ask, amount, self.currency.currency_pair)
-            if order is not None:
-                assert isinstance(order, Order)
-                log(str(datetime.now()) + ' - Bought ' + str(order.amount) + ' ' + self.currency_alt + ' for ' + str(
+            try:
+                status = Trade().buy(self.poloniex, self.lowest_ask, amount, self.currency.currency_pair, self.order_tracker)
+            except Exception:
+                # the order may or may not have been placed
+                self.balances.invalidate()
+                raise
+            assert isinstance(status, OrderStatus)
+            self.balances.apply_order(self.currency.currency_pair, 'buy', status)
+            if status.order is not None:
+                order = status.order
+                log(str(clock.now()) + ' - Bought ' + str(order.amount) + ' ' + self.currency_alt + ' for ' + str(
                     order.total) + ' ' + self.currency_main + ' at ' + str(order.rate) + ' ' + self.currency_main + ' for a ' + "{0:.2f}".format(profit_percent * 100) + '% profit', True)
-                return TradeResult.success
+            self.log_order_status(status)
+            if not status.is_filled():
+                self.order_tracker.track(status)
+                return TradeResult.pending
+            return TradeResult.success
         elif self.last_trade_type != TradeResult.failure:
             if self.last_trade_type != TradeResult.failure:
                 log('Not enough funds in your ' + self.currency_main + ' account! You need at least ' + str(self.currency.min_main) + ' ' + self.currency_main, True)
 
         return TradeResult.failure
 
+    # orders that are not filled yet stay open and show up in the trade history once they fill
+    def log_order_status(self, status):
+        if status.is_pending():
+            log(self.currency.currency_pair + ': Order ' + status.number + ' has not been filled yet', True)
+        elif status.is_partial():
+            log(self.currency.currency_pair + ': Order ' + status.number + ' is partially filled (' + str(
+                status.filled_amount) + ' of ' + str(status.amount) + ' ' + self.currency_alt + ')', True)
+
     def can_buy_or_sell(self):
         can_buy = False
         can_sell = False
@@ -259,21 +363,7 @@ class MyTradeAlgorithm(ITradeAlgorithm):
 
     @staticmethod
     def sma(data, window):
-        if len(data) < window:
-            return None
-        return sum(data[-window:]) / float(window)
+        return sma(data, window)
 
     def ema(self, data, window=-1):
-        if len(data) == 0:
-            return 0
-        elif len(data) == 1:
-            return data[0]
-
-        if window < 0:
-            window = int(len(data) / 2)
-
-        c = 2.0 / (window + 1)
-        current_ema = self.sma(data[-window * 2:-window], window)
-        for value in data[-window:]:
-            current_ema = (c * value) + ((1 - c) * current_ema)
-        return current_ema
+        return ema(data, window)
@@ -1,24 +1,39 @@
-import threading
-from threading import Timer
-import random
-import time
-
 from datetime import datetime
 
 from configparser import ConfigParser
 
-from trading import Poloniex, ITradeAlgorithm, MyTradeAlgorithm, TradeCurrency, log
+from trading import Poloniex, SimulatedPoloniex, load_candles, NonceAllocator, RequestScheduler, MyTradeAlgorithm, BalanceService, TickerCache, TradeCurrency, UpdateScheduler, log
 
 
 api_key = ''
 api_secret = ''
+nonce_file = None
 
 update_interval = 0
+connection_pool_size = 0
+request_timeout = 0
+public_request_rate = 0
+private_request_rate = 0
+balance_ttl = 0
+ticker_ttl = 0
+max_ticker_age = 0
+order_timeout = 0
+history_max_orders = 0
+history_max_age = 0
+max_concurrent_updates = 0
+
+simulator = False
+simulator_data_dir = ''
+simulator_balances = {}
+simulator_fee = 0
+simulator_spread = 0
+simulator_speed = 0
+simulator_latency = (0, 0)
+simulator_error_rate = 0
+simulator_failure_rate = 0
 
 trade_currencies = []
 
-lock = threading.Lock()
-
 main_percent = 'main_percent'
 alt_percent = 'alt_percent'
 min_buy_profit = 'min_buy_profit'
@@ -67,16 +82,46 @@ def load_custom(cfg, dft_tc, pair):
     return tc
 
 
-def load_config():
-    global api_key, api_secret, update_interval, trade_currencies
+def load_config(file_name='config.cfg'):
+    global api_key, api_secret, nonce_file, update_interval, connection_pool_size, request_timeout, public_request_rate, \
+        private_request_rate, balance_ttl, ticker_ttl, max_ticker_age, order_timeout, history_max_orders, \
+        history_max_age, max_concurrent_updates, simulator, simulator_data_dir, simulator_balances, simulator_fee, \
+        simulator_spread, simulator_speed, simulator_latency, simulator_error_rate, simulator_failure_rate, \
+        trade_currencies
 
     cfg = ConfigParser()
-    cfg.read('config.cfg')
+    cfg.read(file_name)
 
     api_key = cfg['API']['key']
     api_secret = cfg['API']['secret']
+    nonce_file = cfg['API']['nonce_file'] if 'nonce_file' in cfg['API'] else None
 
     update_interval = float(cfg['PROCESS']['update_interval']) * 60
+    connection_pool_size = int(cfg['PROCESS']['connection_pool_size']) if 'connection_pool_size' in cfg['PROCESS'] else 4
+    request_timeout = float(cfg['PROCESS']['request_timeout']) if 'request_timeout' in cfg['PROCESS'] else 30.0
+    public_request_rate = float(cfg['PROCESS']['public_request_rate']) if 'public_request_rate' in cfg['PROCESS'] else 6.0
+    private_request_rate = float(cfg['PROCESS']['private_request_rate']) if 'private_request_rate' in cfg['PROCESS'] else 6.0
+    balance_ttl = float(cfg['PROCESS']['balance_ttl']) if 'balance_ttl' in cfg['PROCESS'] else update_interval
+    ticker_ttl = float(cfg['PROCESS']['ticker_ttl']) if 'ticker_ttl' in cfg['PROCESS'] else 30.0
+    max_ticker_age = float(cfg['PROCESS']['max_ticker_age']) if 'max_ticker_age' in cfg['PROCESS'] else 120.0
+    order_timeout = float(cfg['PROCESS']['order_timeout']) if 'order_timeout' in cfg['PROCESS'] else 30.0
+    history_max_orders = int(cfg['PROCESS']['history_max_orders']) if 'history_max_orders' in cfg['PROCESS'] else 10000
+    history_max_age = float(cfg['PROCESS']['history_max_age']) if 'history_max_age' in cfg['PROCESS'] else 0
+    max_concurrent_updates = int(cfg['PROCESS']['max_concurrent_updates']) if 'max_concurrent_updates' in cfg['PROCESS'] else 4
+
+    if 'SIMULATOR' in cfg:
+        sim = cfg['SIMULATOR']
+        simulator = sim.getboolean('enabled', False)
+        simulator_data_dir = sim['data_dir'] if 'data_dir' in sim else 'market_data'
+        simulator_balances = dict((item.split(':')[0].strip(), float(item.split(':')[1]))
+                                  for item in sim['balances'].split(',')) if 'balances' in sim else {'BTC': 1.0}
+        simulator_fee = float(sim['fee']) / 100.0 if 'fee' in sim else 0.0025
+        simulator_spread = float(sim['spread']) / 100.0 if 'spread' in sim else 0.002
+        simulator_speed = float(sim['speed']) if 'speed' in sim else 1.0
+        simulator_latency = (float(sim['min_latency']) if 'min_latency' in sim else 0.0,
+                             float(sim['max_latency']) if 'max_latency' in sim else 0.0)
+        simulator_error_rate = float(sim['error_rate']) if 'error_rate' in sim else 0.0
+        simulator_failure_rate = float(sim['failure_rate']) if 'failure_rate' in sim else 0.0
 
     btc_pairs = cfg['CURRENCY']['btc_pairs'].split(',') if 'btc_pairs' in cfg['CURRENCY'] else []
     usdt_pairs = cfg['CURRENCY']['usdt_pairs'].split(',') if 'usdt_pairs' in cfg['CURRENCY'] else []
@@ -91,30 +136,32 @@ def load_config():
         trade_currencies.append(load_custom(cfg, dft_tc_usdt, pair))
 
 
-def update_loop(algorithm):
-    with lock:
-        assert isinstance(algorithm, ITradeAlgorithm)
-        try:
-            algorithm.update()
-        except Exception as e:
-            log('An error occurred: ' + str(e.args), True)
-
-        loop = Timer(update_interval + random.randint(1, 10), update_loop, [algorithm])
-        loop.start()
-
-
 def main():
     try:
         load_config()
 
-        poloniex = Poloniex(api_key, api_secret)
+        rate_limiter = RequestScheduler(public_request_rate, private_request_rate)
+        if simulator:
+            poloniex = SimulatedPoloniex(load_candles(simulator_data_dir), simulator_balances, fee=simulator_fee,
+                                         spread=simulator_spread, speed=simulator_speed, latency=simulator_latency,
+                                         error_rate=simulator_error_rate, failure_rate=simulator_failure_rate,
+                                         rate_limiter=rate_limiter)
+        else:
+            poloniex = Poloniex(api_key, api_secret, pool_size=connection_pool_size, timeout=request_timeout,
+                                rate_limiter=rate_limiter, nonces=NonceAllocator(nonce_file))
+        ticker_cache = TickerCache(poloniex, ticker_ttl)
+        balances = BalanceService(poloniex, balance_ttl)
+        scheduler = UpdateScheduler(update_interval, max_concurrent_updates, rate_limiter)
         log('\n\n\n\n' + str(datetime.now()), True)
         log('Welcome to the Poloniex trading bot!', True)
 
         for currency in trade_currencies:
-            algorithm = MyTradeAlgorithm(poloniex, currency)
-            update_loop(algorithm)
-            time.sleep(random.randint(1, 10))
+            algorithm = MyTradeAlgorithm(poloniex, currency, ticker_cache=ticker_cache, max_ticker_age=max_ticker_age,
+                                         balances=balances, order_timeout=order_timeout,
+                                         history_max_orders=history_max_orders, history_max_age=history_max_age)
+            scheduler.add(algorithm)
+
+        scheduler.run()
     except KeyboardInterrupt:
         quit()
 